@@ -46,6 +46,20 @@ non_printer_files = [
     'utils.py',
     'all.py',
     'latest.py',
+    'capture.py',
+    'layout.py',
+    'snapfile.py',
+    'export.py',
+    'triage.py',
+    'fleet.py',
+    'rawdata.py',
+    'table.py',
+    'lookup.py',
+    'filtering.py',
+    'stats.py',
+    'buckets.py',
+    'memusage.py',
+    'sample.py',
     None ][:-1]
 non_printer_files
 
@@ -59,6 +73,31 @@ latest_printer_files = [
     None ][:-1]
 
 #
-# Import everything from the utils module into the top-level package namespace.
+# The gdb API is only available when running inside gdb. Outside of it, only
+# the modules that do not use it (e.g. snapfile) can be imported.
 #
-from .utils import *
+try:
+    import gdb
+    have_gdb = True
+except ImportError:
+    have_gdb = False
+
+if have_gdb:
+    #
+    # Import everything from the utils module into the top-level package namespace.
+    #
+    from .utils import *
+
+    #
+    # Import the commands working on raw container memory.
+    #
+    from . import capture
+    from . import export
+    from . import triage
+    from . import table
+    from . import lookup
+    from . import filtering
+    from . import stats
+    from . import buckets
+    from . import memusage
+    from . import sample
@@ -0,0 +1,136 @@
+#
+# buckets.py
+#
+# Hash distribution of hashed containers: load factor, empty buckets, chain
+# length histogram, and the longest chains.
+#
+# Works with container printers providing hash_buckets() (see utils.py):
+# multi_index hashed indexes and intrusive unordered sets. The bucket array is
+# read with a single memory read, and the empty buckets are found with
+# vectorized pointer comparisons (with numpy, if available). Only the chains
+# of the other buckets are then followed, one node at a time.
+#
+
+import heapq
+
+from boost import *
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def occupied_buckets(b):
+    """
+    Return the list of (bucket index, first pointer) pairs of the non-empty
+    buckets of Hash_Buckets `b`.
+    """
+    if numpy == None:
+        return [(i, head) for i, head in enumerate(b.heads()) if not b.is_empty(i, head)]
+    ptr_size = gdb.lookup_type('void').pointer().sizeof
+    buf = read_memory(b.addr, b.count * b.bucket_size)
+    heads = numpy.ndarray(shape=(b.count,), dtype='<u%d' % ptr_size, buffer=buf,
+                          offset=b.next_offset, strides=(b.bucket_size,))
+    addrs = numpy.arange(b.count, dtype=heads.dtype) * heads.dtype.type(b.bucket_size) \
+        + heads.dtype.type(b.addr)
+    idx = numpy.nonzero((heads != 0) & (heads != addrs))[0]
+    return list(zip(idx.tolist(), heads[idx].tolist()))
+
+class Hash_Report(object):
+    """
+    Hash distribution of a hashed container.
+
+    Attributes:
+      `bucket_count`, `elem_count`, `empty_count`: numbers of buckets,
+        elements, and empty buckets
+      `histogram`: dict from chain length to number of buckets
+      `longest`: list of (length, bucket index, element addresses) triples,
+        longest first
+    """
+    def __init__(self, b, top=5, max_elems=None):
+        self.bucket_count = b.count
+        occupied = occupied_buckets(b)
+        self.empty_count = b.count - len(occupied)
+        self.histogram = dict()
+        if self.empty_count > 0:
+            self.histogram[0] = self.empty_count
+        self.elem_count = 0
+        self.longest = list()
+        for i, head in occupied:
+            chain = list(b.chain(i, head))
+            self.elem_count += len(chain)
+            if max_elems != None and self.elem_count > max_elems:
+                message('buckets: bucket chains do not match the element count')
+                raise gdb.error
+            self.histogram[len(chain)] = self.histogram.get(len(chain), 0) + 1
+            if top > 0:
+                entry = (len(chain), -i, [b.value_addr(n) for n in chain])
+                if len(self.longest) < top:
+                    heapq.heappush(self.longest, entry)
+                elif entry > self.longest[0]:
+                    heapq.heapreplace(self.longest, entry)
+        self.longest = [(l, -i, addrs) for l, i, addrs in sorted(self.longest, reverse=True)]
+
+    def load_factor(self):
+        return float(self.elem_count) / self.bucket_count if self.bucket_count > 0 else 0.0
+
+    def lines(self, max_addrs=None):
+        res = list()
+        res.append('buckets: %d, elements: %d, load factor: %.3f' % (
+            self.bucket_count, self.elem_count, self.load_factor()))
+        if self.bucket_count > 0:
+            res.append('empty buckets: %d (%.1f%%)' % (
+                self.empty_count, 100.0 * self.empty_count / self.bucket_count))
+        res.append('chain lengths:')
+        for length in sorted(self.histogram):
+            res.append('  %4d: %d' % (length, self.histogram[length]))
+        if len(self.longest) > 0:
+            res.append('longest chains:')
+        for length, i, addrs in self.longest:
+            s = ', '.join([hex(a) for a in addrs[:max_addrs]])
+            if max_addrs != None and len(addrs) > max_addrs:
+                s += ', ...'
+            res.append('  bucket %d: %d elements: %s' % (i, length, s))
+        return res
+
+def hash_report(value, top=5):
+    """
+    Compute the Hash_Report of hashed container `value`.
+    """
+    p = gdb.default_visualizer(value)
+    b = p.hash_buckets() if p != None and hasattr(p, 'hash_buckets') else None
+    if b == None:
+        message('buckets: not a supported hashed container: ' + str(value.type))
+        raise gdb.error
+    return Hash_Report(b, top, elem_count(p))
+
+class buckets_cmd(gdb.Command):
+    """
+    Print the hash distribution of a hashed container.
+
+    Usage: boost-buckets <expr> [--top <n>]
+
+    Prints the load factor, the ratio of empty buckets, the histogram of the
+    chain lengths, and the <n> longest chains (default: 5), with the
+    addresses of their elements (up to the "print elements" limit).
+    Supports multi_index hashed indexes and intrusive unordered sets.
+    """
+    def __init__(self):
+        super(buckets_cmd, self).__init__('boost-buckets', gdb.COMMAND_DATA)
+
+    def invoke(self, arg, from_tty):
+        argv = gdb.string_to_argv(arg)
+        top = 5
+        if '--top' in argv:
+            i = argv.index('--top')
+            if i + 1 >= len(argv):
+                raise gdb.GdbError('boost-buckets: --top needs a value')
+            top = int(argv[i + 1])
+            argv = argv[:i] + argv[i + 2:]
+        if len(argv) != 1:
+            raise gdb.GdbError('usage: boost-buckets <expr> [--top <n>]')
+        report = hash_report(parse_and_eval(argv[0]), top)
+        max_addrs = gdb.parameter('print elements') or None
+        gdb.write('\n'.join(report.lines(max_addrs)) + '\n')
+
+_buckets = buckets_cmd()
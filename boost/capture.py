@@ -0,0 +1,223 @@
+#
+# capture.py
+#
+# Minimal-pause capture of container contents.
+#
+# The capture walks the structure of a container while the inferior is
+# stopped, and copies the raw bytes of its elements into a python-side
+# snapshot. Nothing is decoded or formatted during the capture, so the
+# inferior can be resumed right after. The elements are decoded from the
+# snapshot later on, e.g. with boost-capture-show.
+#
+
+import time
+
+from boost import *
+from boost import layout
+from boost import rawdata
+from boost import snapfile
+
+#
+# Captured snapshots, by name.
+#
+snapshots = dict()
+
+class Snapshot(object):
+    """
+    Raw copy of the elements of a container.
+
+    Attributes:
+      `expr`: expression that was captured
+      `type_name`: type name of the container
+      `addr`: address of the container object
+      `elem_type`: gdb.Type of the elements
+      `elem_size`: size of one element, in bytes
+      `addrs`: list of element addresses, in printing order
+      `data`: bytes of all elements, concatenated in printing order
+      `torn`: True if the container was seen changing during the capture
+      `pause`: time spent capturing, in seconds
+    """
+    def __init__(self, expr, value, elem_type):
+        self.expr = expr
+        self.type_name = str(get_basic_type(value.type))
+        self.addr = intptr(value.address) if value.address != None else None
+        self.elem_type = elem_type
+        self.elem_size = elem_type.sizeof
+        self.addrs = list()
+        self.data = bytes()
+        self.torn = False
+        self.pause = 0.0
+
+    def __len__(self):
+        return len(self.addrs)
+
+    def elem_bytes(self, i):
+        return self.data[i * self.elem_size:(i + 1) * self.elem_size]
+
+    def elem_value(self, i):
+        """
+        Decode element `i` as a non-inferior gdb.Value.
+        """
+        return value_from_bytes(self.elem_bytes(i), self.elem_type)
+
+    def children(self):
+        for i in xrange(len(self.addrs)):
+            yield ('[%d @%s]' % (i, hex(self.addrs[i])), self.elem_value(i))
+
+def _read_header(value):
+    if value.address == None:
+        return None
+    return read_memory(value.address, value.type.sizeof)
+
+def capture(expr, max_elements=None):
+    """
+    Capture the container obtained by evaluating `expr`.
+
+    While the walk is in progress, only pointers are followed and raw element
+    bytes are copied. In non-stop mode, the container object (holding the
+    header and size fields) is read before and after the walk, and the
+    snapshot is flagged as torn if they differ.
+
+    Returns a Snapshot object.
+    """
+    start = time.time()
+    value = parse_and_eval(expr)
+    p = gdb.default_visualizer(value)
+    if p == None or not hasattr(p, 'elem_addrs') or not hasattr(p, 'elem_type'):
+        message('capture: no container printer for type: ' + str(value.type))
+        raise gdb.error
+    check_torn = bool(gdb.parameter('non-stop'))
+    if check_torn:
+        header_before = _read_header(value)
+    snap = Snapshot(expr, value, p.elem_type)
+    chunks = list()
+    try:
+        if hasattr(p, 'segments'):
+            # contiguous storage: one read per segment
+            for seg_start, seg_count in p.segments():
+                if max_elements != None:
+                    seg_count = max(0, min(seg_count, max_elements - len(snap.addrs)))
+                chunks.append(read_memory(seg_start, seg_count * snap.elem_size))
+                snap.addrs.extend(addrs_from_segments([(seg_start, seg_count)], snap.elem_size))
+        else:
+            for addr in p.elem_addrs():
+                if max_elements != None and len(snap.addrs) >= max_elements:
+                    break
+                chunks.append(read_memory(addr, snap.elem_size))
+                snap.addrs.append(addr)
+    except gdb.MemoryError:
+        # a node vanished under our feet
+        if not check_torn:
+            raise
+        snap.torn = True
+    if check_torn and _read_header(value) != header_before:
+        snap.torn = True
+    snap.data = bytes().join(chunks)
+    snap.pause = time.time() - start
+    return snap
+
+def save_snapshot(snap, path):
+    """
+    Save Snapshot `snap` to file `path`, in the format described in snapfile.py.
+    """
+    header = dict()
+    header['expr'] = snap.expr
+    header['type'] = snap.type_name
+    header['addr'] = snap.addr
+    header['torn'] = snap.torn
+    header['elem_type'] = str(snap.elem_type)
+    header['elem_size'] = snap.elem_size
+    header['layout'] = layout.type_layout(snap.elem_type)
+    descr = rawdata.layout_descr(header['layout'])
+    if descr != None and header['layout']['size'] == snap.elem_size:
+        header['descr'] = descr
+    snapfile.write(path, header, snap.data, snap.addrs)
+
+class capture_cmd(gdb.Command):
+    """
+    Capture the raw elements of a container, to be decoded later.
+
+    Usage: boost-capture [-c] <name> <expr>
+
+    The snapshot is saved as `boost.capture.snapshots[<name>]`.
+    With -c, the inferior is resumed in the background right after the capture.
+    """
+    def __init__(self):
+        super(capture_cmd, self).__init__('boost-capture', gdb.COMMAND_DATA)
+
+    def invoke(self, arg, from_tty):
+        argv = gdb.string_to_argv(arg)
+        resume = False
+        if len(argv) > 0 and argv[0] == '-c':
+            resume = True
+            argv = argv[1:]
+        if len(argv) < 2:
+            raise gdb.GdbError('usage: boost-capture [-c] <name> <expr>')
+        name = argv[0]
+        snap = capture(' '.join(argv[1:]))
+        snapshots[name] = snap
+        if resume:
+            gdb.execute('continue &', from_tty)
+        message('captured ' + str(len(snap)) + ' elements of ' + snap.type_name
+                + ' in %.3f ms' % (snap.pause * 1000.0)
+                + (' (TORN: container changed during capture)' if snap.torn else ''))
+
+class capture_show_cmd(gdb.Command):
+    """
+    Decode and print the elements of a captured snapshot.
+
+    Usage: boost-capture-show <name> [<count>]
+    """
+    def __init__(self):
+        super(capture_show_cmd, self).__init__('boost-capture-show', gdb.COMMAND_DATA)
+
+    def invoke(self, arg, from_tty):
+        argv = gdb.string_to_argv(arg)
+        if len(argv) < 1 or argv[0] not in snapshots:
+            raise gdb.GdbError('usage: boost-capture-show <name> [<count>]; known snapshots: '
+                               + ', '.join(sorted(snapshots.keys())))
+        snap = snapshots[argv[0]]
+        count = len(snap)
+        if len(argv) > 1:
+            count = min(count, int(argv[1]))
+        gdb.write('%s = %s with %d elements%s\n' % (
+            snap.expr, snap.type_name, len(snap), ' (torn)' if snap.torn else ''))
+        i = 0
+        for label, val in snap.children():
+            if i >= count:
+                break
+            gdb.write('  %s = %s\n' % (label, str(val)))
+            i += 1
+
+class snapshot_cmd(gdb.Command):
+    """
+    Save container snapshots to files that can be loaded without gdb.
+
+    Usage:
+      boost-snapshot save <expr> <file>
+      boost-snapshot save-capture <name> <file>
+
+    The first form captures the container <expr> and saves it. The second form
+    saves a snapshot previously taken with boost-capture. To load the files,
+    see boost/snapfile.py.
+    """
+    def __init__(self):
+        super(snapshot_cmd, self).__init__('boost-snapshot', gdb.COMMAND_DATA)
+
+    def invoke(self, arg, from_tty):
+        argv = gdb.string_to_argv(arg)
+        if len(argv) < 3 or argv[0] not in ['save', 'save-capture']:
+            raise gdb.GdbError('usage: boost-snapshot (save <expr> | save-capture <name>) <file>')
+        path = argv[-1]
+        if argv[0] == 'save':
+            snap = capture(' '.join(argv[1:-1]))
+        else:
+            if argv[1] not in snapshots:
+                raise gdb.GdbError('boost-snapshot: no such capture: ' + argv[1])
+            snap = snapshots[argv[1]]
+        save_snapshot(snap, path)
+        message('saved ' + str(len(snap)) + ' elements of ' + snap.type_name + ' to ' + path)
+
+_capture = capture_cmd()
+_capture_show = capture_show_cmd()
+_snapshot = snapshot_cmd()
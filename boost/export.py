@@ -0,0 +1,164 @@
+#
+# export.py
+#
+# Streaming export of container contents to a file.
+#
+# Elements are obtained from the children() iterator of the container printer
+# and written out in chunks of options['export_chunk_size'] records, so memory
+# use does not depend on the container size.
+#
+# With several jobs, gdb only reads the raw element bytes, and the elements
+# are decoded and formatted by a pool of worker processes (see rawdata.py).
+# This is used if the element type can be formatted from raw bytes alone,
+# exactly as gdb prints it (no pointers, no fields with their own printer),
+# otherwise the export falls back to the printer. The workers are forked from
+# gdb, which has threads of its own; a forked child only gets the forking
+# thread, so this is opt-in (--jobs), and the workers use no gdb state.
+#
+
+import csv
+import json
+import time
+
+from boost import *
+from boost import layout
+from boost import rawdata
+
+formats = ['ndjson', 'csv']
+
+def printer_records(p):
+    """
+    Generate (index, label, value) triples from printer `p`. For printers with
+    display hint 'map', children come in key/value pairs, and the label is
+    replaced by the key.
+    """
+    it = iter(p.children())
+    is_map = hasattr(p, 'display_hint') and p.display_hint() == 'map'
+    i = 0
+    while True:
+        try:
+            label, val = next(it)
+            if is_map:
+                label = str(val)
+                _, val = next(it)
+        except StopIteration:
+            return
+        yield (i, label, str(val))
+        i += 1
+
+def parallel_records(p, jobs, chunk_elems):
+    """
+    Like printer_records(), but the elements are formatted from raw bytes by
+    `jobs` worker processes. Returns None if that is not possible for `p`.
+    """
+    if not hasattr(p, 'elem_type') or not hasattr(p, 'elem_addrs'):
+        return None
+    lay = layout.type_layout(p.elem_type)
+    fields = None
+    if hasattr(p, 'display_hint') and p.display_hint() == 'map':
+        fields = ['first', 'second']
+        fls = [rawdata.field_layout(lay, f) for f in fields]
+        if None in fls or not all([rawdata.can_format(fl[1], printed=True) for fl in fls]):
+            return None
+    elif not rawdata.can_format(lay, printed=True):
+        return None
+    def gen():
+        pool = rawdata.Format_Pool(jobs)
+        i = 0
+        try:
+            for res in pool.imap(lay, read_elem_chunks(p, chunk_elems), fields):
+                for r in res:
+                    if fields != None:
+                        yield (i, r[0], r[1])
+                    else:
+                        yield (i, '[%d]' % i, r)
+                    i += 1
+        finally:
+            pool.close()
+    return gen()
+
+def export(expr, path, fmt='ndjson', jobs=1):
+    """
+    Export the elements of the container obtained by evaluating `expr` to
+    file `path`, one record per element, using `jobs` formatting processes.
+
+    Returns the number of records written.
+    """
+    assert fmt in formats
+    value = parse_and_eval(expr)
+    p = full_printer(gdb.default_visualizer(value))
+    if p == None or not hasattr(p, 'children'):
+        message('export: no container printer for type: ' + str(value.type))
+        raise gdb.error
+    is_map = hasattr(p, 'display_hint') and p.display_hint() == 'map'
+    label_name = 'key' if is_map else 'label'
+    chunk_size = options['export_chunk_size']
+    records = None
+    if jobs > 1:
+        records = parallel_records(p, jobs, chunk_size)
+    if records == None:
+        records = printer_records(p)
+    start = last_report = time.time()
+    count = 0
+    with open(path, 'w') as f:
+        if fmt == 'csv':
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(['index', label_name, 'value'])
+        chunk = list()
+        for rec in records:
+            chunk.append(rec)
+            if len(chunk) < chunk_size:
+                continue
+            _write_chunk(f, fmt, label_name, chunk)
+            count += len(chunk)
+            chunk = list()
+            if time.time() - last_report >= 1.0:
+                last_report = time.time()
+                message('export: %d records written (%.0f/s)' % (count, count / (last_report - start)))
+        _write_chunk(f, fmt, label_name, chunk)
+        count += len(chunk)
+    return count
+
+def _write_chunk(f, fmt, label_name, chunk):
+    if fmt == 'ndjson':
+        f.write(''.join([json.dumps({'index': i, label_name: label, 'value': val}) + '\n'
+                         for i, label, val in chunk]))
+    else:
+        csv.writer(f, lineterminator='\n').writerows(chunk)
+
+class export_cmd(gdb.Command):
+    """
+    Export the elements of a container to a file, one record per element.
+
+    Usage: boost-export <expr> <file> [--format ndjson|csv] [--jobs N]
+
+    The default format is ndjson: one JSON object per line, with keys "index",
+    "label" (or "key", for maps) and "value". With --jobs, the elements are
+    formatted by N worker processes forked from gdb (default: 1, no workers),
+    if they can be formatted from their raw bytes exactly as gdb prints them.
+    Forking a multithreaded process is not safe in general: if gdb misbehaves
+    afterwards, export without --jobs.
+    """
+    def __init__(self):
+        super(export_cmd, self).__init__('boost-export', gdb.COMMAND_DATA)
+
+    def invoke(self, arg, from_tty):
+        usage = 'usage: boost-export <expr> <file> [--format ndjson|csv] [--jobs N]'
+        opts = {'--format': 'ndjson', '--jobs': '1'}
+        argv = list()
+        it = iter(gdb.string_to_argv(arg))
+        for a in it:
+            if a in opts:
+                opts[a] = next(it, None)
+            elif a.split('=')[0] in opts:
+                opts[a.split('=')[0]] = a.split('=', 1)[1]
+            else:
+                argv.append(a)
+        fmt = opts['--format']
+        if len(argv) < 2 or fmt not in formats or not str(opts['--jobs']).isdigit():
+            raise gdb.GdbError(usage)
+        start = time.time()
+        count = export(' '.join(argv[:-1]), argv[-1], fmt, int(opts['--jobs']))
+        message('export: %d records written to %s in %.1f s' % (count, argv[-1], time.time() - start))
+
+_export = export_cmd()
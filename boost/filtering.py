@@ -0,0 +1,272 @@
+#
+# filtering.py
+#
+# Print only the elements of a container that satisfy a python predicate.
+#
+# The predicate is a python expression over the element `e`. For containers
+# whose printer provides elem_type and elem_addrs() (see utils.py), the
+# element bytes are read in chunks, and `e` is decoded from them without
+# building gdb values: a number for arithmetic and enum elements, otherwise a
+# rawdata.Raw_Struct, whose fields are decoded only when accessed. The
+# enumerators of the enums in the element type are available by name.
+# Only the matching elements are formatted, by gdb.
+#
+# With numpy available, the predicate is first tried on a whole chunk at
+# once, with `e` a numpy record array of the elements (see
+# rawdata.layout_dtype): `e.qty > 100` then evaluates to an array of
+# booleans. Predicates that cannot run on arrays (e.g. using `and` instead of
+# `&`, or strings) are evaluated element by element instead. So are the
+# predicates that could give other results on arrays (see vectorizable()):
+# numpy integers have a fixed width and wrap around, python ones do not.
+#
+# For other printers, `e` is each value produced by children(), or a (key,
+# value) pair for printers with display hint 'map'.
+#
+
+import ast
+import sys
+
+from boost import *
+from boost import layout
+from boost import rawdata
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def predicate_namespace(l):
+    """
+    Global namespace for predicates on elements of layout `l`: the
+    enumerators of its enums (by unqualified name), and numpy.
+    """
+    ns = dict()
+    for name, val in rawdata.enumerators(l):
+        ns.setdefault(name.split('::')[-1], val)
+    if numpy != None:
+        ns['numpy'] = numpy
+    return ns
+
+_vector_ops = (ast.BitAnd, ast.BitOr, ast.BitXor)
+_vector_nodes = (ast.Expression, ast.Compare, ast.BoolOp, ast.And, ast.Or, ast.Not,
+                 ast.Name, ast.Load, ast.Attribute, ast.Subscript,
+                 ast.Tuple, ast.List, ast.cmpop) + _vector_ops
+if sys.version_info >= (3, 8):
+    _constant_nodes = (ast.Constant,)
+else:
+    _constant_nodes = tuple([getattr(ast, n) for n in ['Num', 'Str', 'NameConstant']
+                             if hasattr(ast, n)])
+
+def _is_mask(node):
+    # whether `node` evaluates to booleans (an array of them, vectorized)
+    if isinstance(node, ast.Compare):
+        return True
+    if isinstance(node, ast.BinOp) and isinstance(node.op, _vector_ops):
+        return _is_mask(node.left) and _is_mask(node.right)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Invert):
+        return _is_mask(node.operand)
+    return False
+
+def _has_float32(l):
+    if l['kind'] == 'float':
+        return l['size'] != 8
+    if l['kind'] == 'array':
+        return _has_float32(l['elem'])
+    return any([_has_float32(f['layout']) for f in l.get('fields', [])])
+
+def vectorizable(predicate, l):
+    """
+    Check if python expression `predicate` evaluates on numpy arrays of
+    elements of layout `l` like it does on each element. That is the case
+    for comparisons of fields and constants, combined with `&`, `|`, `^`,
+    `~`, `and`, `or`, `not`; but not with arithmetic, which wraps around in
+    numpy (e.g. `e.a - e.b > 0` on unsigned fields), nor with function calls.
+    Integer constants must be small, and float constants are only allowed
+    without float fields of single precision, which numpy would compare in
+    single precision.
+    """
+    try:
+        tree = ast.parse(predicate, mode='eval')
+    except SyntaxError:
+        return False
+    for node in ast.walk(tree):
+        if isinstance(node, _constant_nodes):
+            c = getattr(node, 'value', getattr(node, 'n', None))
+            if isinstance(c, bool) or c == None:
+                continue
+            if isinstance(c, float) and _has_float32(l):
+                return False
+            if isinstance(c, int) and not -2**31 <= c < 2**31:
+                return False
+        elif isinstance(node, ast.BinOp):
+            if not isinstance(node.op, _vector_ops):
+                return False
+        elif isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, ast.Invert):
+                if not _is_mask(node.operand):
+                    return False
+            elif isinstance(node.op, ast.USub):
+                if not isinstance(node.operand, _constant_nodes):
+                    return False
+            elif not isinstance(node.op, ast.Not):
+                return False
+        elif isinstance(node, ast.Index if hasattr(ast, 'Index') else ()):
+            continue
+        elif not isinstance(node, _vector_nodes) and not isinstance(node, (ast.unaryop, ast.operator)):
+            return False
+    return True
+
+def _vectorized_hits(code, ns, buf, dt, count):
+    # evaluate `code` on `count` records at once, and return the indexes of
+    # the matches; None if the predicate does not work on arrays
+    a = numpy.frombuffer(buf, dtype=dt, count=count)
+    if dt.names:
+        a = a.view(numpy.recarray)
+    ns['e'] = a
+    try:
+        mask = numpy.asarray(eval(code, ns))
+    except Exception:
+        return None
+    if mask.dtype != numpy.bool_ or mask.shape != (count,):
+        return None
+    return numpy.nonzero(mask)[0].tolist()
+
+def _elem_chunks(p, elem_size):
+    # generate (addresses, bytes) pairs covering the elements in order
+    if hasattr(p, 'segments'):
+        for addr, buf in Contiguous_Range(p.segments(), p.elem_type).chunks():
+            yield (xrange(addr, addr + len(buf), elem_size), buf)
+        return
+    chunk_elems = max(1, options['bulk_read_size'] // elem_size)
+    addrs = list()
+    chunk = list()
+    for addr in p.elem_addrs():
+        addrs.append(addr)
+        chunk.append(read_memory(addr, elem_size))
+        if len(chunk) == chunk_elems:
+            yield (addrs, bytes().join(chunk))
+            addrs = list()
+            chunk = list()
+    if len(chunk) > 0:
+        yield (addrs, bytes().join(chunk))
+
+def raw_matches(p, code, vectorize=True):
+    """
+    Generate (index, address) pairs of the elements of the container printed
+    by `p` that satisfy the compiled predicate `code`, decoding raw bytes.
+    """
+    l = layout.type_layout(p.elem_type)
+    size = l['size']
+    ns = predicate_namespace(l)
+    dt = rawdata.layout_dtype(l) if vectorize else None
+    i = 0
+    for addrs, buf in _elem_chunks(p, size):
+        k = len(buf) // size
+        hits = _vectorized_hits(code, ns, buf, dt, k) if dt != None else None
+        if hits != None:
+            for j in hits:
+                yield (i + j, addrs[j])
+        else:
+            # do not try arrays again
+            dt = None
+            for j in xrange(k):
+                ns['e'] = rawdata.raw_value(l, buf, j * size)
+                if eval(code, ns):
+                    yield (i + j, addrs[j])
+        i += k
+
+def children_matches(p, code):
+    """
+    Generate (label, value) pairs of the children of printer `p` that satisfy
+    the compiled predicate `code`.
+    """
+    ns = dict()
+    it = iter(p.children())
+    is_map = hasattr(p, 'display_hint') and p.display_hint() == 'map'
+    while True:
+        try:
+            label, val = next(it)
+            if is_map:
+                _, mapped = next(it)
+                label = '[%s]' % str(val)
+                val = (val, mapped)
+        except StopIteration:
+            return
+        ns['e'] = val
+        if eval(code, ns):
+            yield (label, mapped if is_map else val)
+
+def print_matches(value, predicate, limit=None, vectorize=True):
+    """
+    Print the elements of container `value` that satisfy `predicate` (python
+    expression string), at most `limit` of them. Returns the number of
+    matches printed.
+    """
+    p = full_printer(gdb.default_visualizer(value))
+    if p == None or not hasattr(p, 'children'):
+        message('filter: no container printer for type: ' + str(value.type))
+        raise gdb.error
+    code = compile(predicate, '<boost-filter>', 'eval')
+    n = 0
+    if hasattr(p, 'elem_type') and hasattr(p, 'elem_addrs'):
+        elem_ptr_t = p.elem_type.pointer()
+        vectorize = vectorize and vectorizable(predicate, layout.type_layout(p.elem_type))
+        for i, addr in raw_matches(p, code, vectorize):
+            if limit != None and n >= limit:
+                gdb.write('...\n')
+                break
+            gdb.write('[%d] = %s\n' % (i, str(gdb.Value(addr).cast(elem_ptr_t).dereference())))
+            n += 1
+        return n
+    for label, val in children_matches(p, code):
+        if limit != None and n >= limit:
+            gdb.write('...\n')
+            break
+        gdb.write('%s = %s\n' % (label, str(val)))
+        n += 1
+    return n
+
+class filter_cmd(gdb.Command):
+    """
+    Print the elements of a container that satisfy a python predicate.
+
+    Usage: boost-filter [--scalar] [--limit <n>] <expr> <predicate>
+
+    <predicate> is a python expression over the element `e`, quoted as one
+    argument, e.g.:
+
+      boost-filter orders 'e.second.state == CANCELLED and e.second.qty > 100'
+
+    Struct fields are attributes of `e`; enumerators are available by name.
+    At most <n> matches are printed (default: the "print elements" limit; 0
+    for no limit). With --scalar, the predicate is never tried on numpy
+    arrays of elements.
+    """
+    def __init__(self):
+        super(filter_cmd, self).__init__('boost-filter', gdb.COMMAND_DATA)
+
+    def invoke(self, arg, from_tty):
+        argv = gdb.string_to_argv(arg)
+        limit = gdb.parameter('print elements')
+        vectorize = True
+        if '--scalar' in argv:
+            argv.remove('--scalar')
+            vectorize = False
+        if '--limit' in argv:
+            i = argv.index('--limit')
+            if i + 1 >= len(argv):
+                raise gdb.GdbError('boost-filter: --limit needs a value')
+            limit = int(argv[i + 1])
+            argv = argv[:i] + argv[i + 2:]
+        if len(argv) != 2:
+            raise gdb.GdbError('usage: boost-filter [--scalar] [--limit <n>] <expr> <predicate>')
+        if not limit:
+            limit = None
+        try:
+            n = print_matches(parse_and_eval(argv[0]), argv[1], limit, vectorize)
+        except (SyntaxError, NameError, AttributeError, KeyError, TypeError) as e:
+            raise gdb.GdbError('boost-filter: predicate error: ' + str(e))
+        if n == 0:
+            gdb.write('no match\n')
+
+_filter = filter_cmd()
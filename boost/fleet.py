@@ -0,0 +1,167 @@
+#
+# fleet.py
+#
+# Parallel triage of many core files, using a pool of gdb batch processes.
+#
+# NOTE: This module does not use the gdb API. It runs outside of gdb, e.g.:
+#
+#   $ python -m boost.fleet -j 16 --exe ./server -o report.json cores/core.*
+#
+# Each worker runs boost/triage.py as a gdb script on one core file (see
+# triage.py). Cores are scheduled largest first. All workers share one type plan
+# directory, so the global variable enumeration is done once per build-id: for
+# every executable, its largest core is triaged first, and the remaining cores
+# of that executable only start after the plan is available.
+#
+# The per-core reports are merged into one report, with a summary by container
+# type.
+#
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from multiprocessing.pool import ThreadPool
+
+triage_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'triage.py')
+
+class Job(object):
+    """
+    Triage of one core file.
+    """
+    def __init__(self, exe, core):
+        self.exe = exe
+        self.core = core
+        self.size = os.path.getsize(core)
+        self.returncode = None
+        self.report = None
+        self.error = None
+
+def run_job(job, gdb='gdb', elements=10, budget=60.0, plan_dir=None, out_dir=None):
+    """
+    Run gdb on `job`, and load its report.
+    """
+    out_path = os.path.join(out_dir, '%d.json' % id(job))
+    env = dict(os.environ)
+    env['BOOST_TRIAGE_OUTPUT'] = out_path
+    env['BOOST_TRIAGE_ELEMENTS'] = str(elements)
+    env['BOOST_TRIAGE_BUDGET'] = str(budget)
+    if plan_dir:
+        env['BOOST_TRIAGE_PLAN_DIR'] = plan_dir
+    cmd = [gdb, '-batch', '-nx', '-x', triage_script, job.exe, job.core]
+    with open(os.devnull, 'w') as devnull:
+        job.returncode = subprocess.call(cmd, env=env, stdout=devnull, stderr=devnull)
+    try:
+        with open(out_path) as f:
+            job.report = json.load(f)
+    except (IOError, ValueError) as e:
+        job.error = 'no report (gdb exit code %d): %s' % (job.returncode, e)
+    return job
+
+def schedule(jobs):
+    """
+    Split `jobs` in 2 waves: the first wave contains the largest core of
+    every executable, the second one all the others. Each wave is sorted by
+    decreasing core size.
+    """
+    jobs = sorted(jobs, key=lambda j: -j.size)
+    first = list()
+    second = list()
+    seen = set()
+    for j in jobs:
+        if j.exe in seen:
+            second.append(j)
+        else:
+            seen.add(j.exe)
+            first.append(j)
+    return first, second
+
+def merge(jobs):
+    """
+    Merge the reports of `jobs` into one report.
+    """
+    res = dict()
+    res['cores'] = list()
+    summary = dict()
+    for j in jobs:
+        entry = {'core': j.core, 'exe': j.exe, 'returncode': j.returncode}
+        if j.error:
+            entry['error'] = j.error
+        else:
+            entry['report'] = j.report
+            for c in j.report['containers']:
+                s = summary.setdefault(c['type'], {'count': 0, 'cores': 0, 'total_size': 0,
+                                                   'max_size': 0, 'total_footprint': 0})
+                s['count'] += 1
+                s['total_size'] += c.get('size', 0)
+                s['max_size'] = max(s['max_size'], c.get('size', 0))
+                s['total_footprint'] += c.get('footprint', 0)
+            for t in set([c['type'] for c in j.report['containers']]):
+                summary[t]['cores'] += 1
+        res['cores'].append(entry)
+    res['summary'] = summary
+    res['failed'] = len([j for j in jobs if j.error])
+    return res
+
+def run(jobs, workers, **kwargs):
+    """
+    Triage all `jobs` using `workers` gdb processes. Returns the merged report.
+    """
+    tmp_dir = tempfile.mkdtemp(prefix='boost-fleet-')
+    try:
+        kwargs['out_dir'] = tmp_dir
+        if not kwargs.get('plan_dir'):
+            kwargs['plan_dir'] = os.path.join(tmp_dir, 'plans')
+            os.mkdir(kwargs['plan_dir'])
+        pool = ThreadPool(workers)
+        done = 0
+        for wave in schedule(jobs):
+            for j in pool.imap_unordered(lambda j: run_job(j, **kwargs), wave):
+                done += 1
+                print('[%d/%d] %s%s' % (done, len(jobs), j.core, ' FAILED' if j.error else ''),
+                      file=sys.stderr)
+        pool.close()
+        pool.join()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return merge(jobs)
+
+def _main(argv):
+    parser = argparse.ArgumentParser(prog='python -m boost.fleet',
+                                     description='Triage many core files in parallel.')
+    parser.add_argument('-j', '--jobs', type=int, default=os.sysconf('SC_NPROCESSORS_ONLN'),
+                        help='number of gdb workers (default: number of CPUs)')
+    parser.add_argument('--gdb', default='gdb', help='gdb executable')
+    parser.add_argument('--exe', help='executable for cores not given as EXE:CORE')
+    parser.add_argument('--elements', type=int, default=10, help='elements listed per container')
+    parser.add_argument('--budget', type=float, default=60.0, help='time budget per core, in seconds')
+    parser.add_argument('--plan-dir', help='type plan directory, kept across runs')
+    parser.add_argument('-o', '--output', help='merged report file (default: stdout)')
+    parser.add_argument('cores', nargs='+', help='core files, as CORE or EXE:CORE')
+    args = parser.parse_args(argv)
+    jobs = list()
+    for c in args.cores:
+        if ':' in c:
+            exe, core = c.split(':', 1)
+        elif args.exe:
+            exe, core = args.exe, c
+        else:
+            parser.error('no executable given for core: ' + c)
+        jobs.append(Job(exe, core))
+    report = run(jobs, args.jobs, gdb=args.gdb, elements=args.elements,
+                 budget=args.budget, plan_dir=args.plan_dir)
+    s = json.dumps(report, indent=1, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(s + '\n')
+    else:
+        print(s)
+    return 1 if report['failed'] > 0 else 0
+
+if __name__ == '__main__':
+    sys.exit(_main(sys.argv[1:]))
@@ -10,16 +10,41 @@ def short_ns(tag):
     else:
         return tag
 
+def _val_str(val_rptr):
+    try:
+        return str(val_rptr.referenced_value())
+    except:
+        return 'N/A'
+
+def _find_member(v, name):
+    # breadth-first search for data member `name` in struct value `v`, through
+    # its base classes and struct members
+    queue = [v]
+    while len(queue) > 0:
+        crt = queue.pop(0)
+        for f in crt.type.strip_typedefs().fields():
+            if not hasattr(f, 'bitpos') or f.type == None:
+                # static member
+                continue
+            if f.is_base_class:
+                queue.append(crt.cast(f.type))
+            elif f.name == name:
+                return crt[f.name]
+            elif f.name and f.type.strip_typedefs().code == gdb.TYPE_CODE_STRUCT:
+                queue.append(crt[f.name])
+    return None
+
 @add_type_recognizer
 class Generic_Hook_Type_Recognizer:
     "Type Recognizer for boost::intrusive::generic_hook"
     name = 'boost::intrusive::generic_hook-1.55'
     version = '1.55'
     enabled = True
-    target_re = re.compile('^boost::intrusive::generic_hook<.*>$')
+    template_name = 'boost::intrusive::generic_hook'
 
     def recognize(self, t):
-        if not t.tag or self.target_re.search(t.tag) == None:
+        # also called directly, by Hook_Type_Recognizer
+        if not t.tag or template_name(t) != self.template_name:
             return None
         # hook_tag: default (base) or member
         hook_tag = str(t.template_argument(1).strip_typedefs())
@@ -67,7 +92,7 @@ class Hook_Type_Recognizer:
                      'boost::intrusive::unordered_set_base_hook', 'boost::intrusive::unordered_set_member_hook']
 
     def recognize(self, t):
-        if not t.tag or not template_name(t) in self.template_name:
+        if not t.tag:
             return None
         # just print the underlying generic hook
         generic_hook_t = t.fields()[0].type
@@ -277,6 +302,8 @@ class List_Printer:
 
     class Iterator:
         def __init__(self, v):
+            self.v = v
+            self.render_cache = None
             self.value_traits_t = v.value_traits_t
             self.node_traits_t = v.node_traits_t
             self.root_node_rptr = get_raw_ptr(call_object_method(v, 'get_root_node'))
@@ -287,19 +314,23 @@ class List_Printer:
                 self.node_traits_t, 'get_next', self.root_node_rptr))
             return self
 
-        def __next__(self):
+        def next_val_rptr(self):
             if self.crt_node_rptr == self.root_node_rptr or is_null(self.crt_node_rptr):
                 raise StopIteration
             val_rptr = get_raw_ptr(call_static_method(
                 self.value_traits_t, 'to_value_ptr', self.crt_node_rptr))
-            try:
-                val_str = str(val_rptr.referenced_value())
-            except:
-                val_str = 'N/A'
-            result = ('[%d @%s]' % (self.count, print_ptr(val_rptr)), val_str)
-            self.count += 1
             self.crt_node_rptr = get_raw_ptr(call_static_method(
                 self.node_traits_t, 'get_next', self.crt_node_rptr))
+            return val_rptr
+
+        def __next__(self):
+            val_rptr = self.next_val_rptr()
+            if self.render_cache == None:
+                # created on first use: elem_addrs() also iterates
+                self.render_cache = Render_Cache(self.v, self.v.value_t)
+            val_str = self.render_cache.render(intptr(val_rptr), lambda: _val_str(val_rptr))
+            result = ('[%d @%s]' % (self.count, print_ptr(val_rptr)), val_str)
+            self.count += 1
             return result
 
         def next(self):
@@ -311,6 +342,45 @@ class List_Printer:
         self.v.value_t = self.v.basic_type.template_argument(0)
         self.v.value_traits_t = self.v.list_impl_t.template_argument(0)
         self.v.node_traits_t = get_inner_type(self.v.list_impl_t, 'node_traits')
+        self.elem_type = self.v.value_t
+
+    # the elements are owned by the user, the hooks are inside them
+    owns_elements = False
+
+    def hook_size(self):
+        try:
+            return get_inner_type(self.v.node_traits_t, 'node').sizeof
+        except gdb.error:
+            return None
+
+    def elem_count(self):
+        # known only with constant_time_size
+        size = _find_member(self.v, 'size_')
+        return int(size) if size != None else None
+
+    def elem_addrs(self):
+        it = iter(self.Iterator(self.v))
+        while True:
+            try:
+                yield intptr(it.next_val_rptr())
+            except StopIteration:
+                return
+
+    def tail_addrs(self, k):
+        # lists are doubly linked: follow the prev links from the root node;
+        # slists are not
+        if self.v.template_name != 'boost::intrusive::list':
+            return None
+        it = self.Iterator(self.v)
+        res = list()
+        n = it.root_node_rptr
+        for i in xrange(k):
+            n = get_raw_ptr(n['prev_'])
+            if n == it.root_node_rptr:
+                break
+            res.append(intptr(get_raw_ptr(call_static_method(
+                self.v.value_traits_t, 'to_value_ptr', n))))
+        return list(reversed(res))
 
     def to_string (self):
         if not self.v.qualifiers:
@@ -327,11 +397,10 @@ class List_Type_Recognizer:
     "Type Recognizer for boost::intrusive::list"
     name = 'boost::intrusive::list-1.55'
     enabled = True
+    template_name = ['boost::intrusive::list', 'boost::intrusive::slist']
 
     def recognize(self, t):
         t_name = template_name(t)
-        if t_name not in ['boost::intrusive::list', 'boost::intrusive::slist']:
-            return None
         res = ''
         qualifiers = get_type_qualifiers(t)
         if qualifiers:
@@ -372,6 +441,8 @@ class Tree_Printer:
 
     class Iterator:
         def __init__(self, v):
+            self.v = v
+            self.render_cache = None
             self.value_traits_t = v.value_traits_t
             self.node_traits_t = v.node_traits_t
             self.optimize_size = False
@@ -386,18 +457,22 @@ class Tree_Printer:
                 self.node_traits_t, 'get_left', self.header_node_rptr))
             return self
 
-        def __next__(self):
+        def next_val_rptr(self):
             if self.crt_node_rptr == self.header_node_rptr:
                 raise StopIteration
             val_rptr = get_raw_ptr(call_static_method(
                 self.value_traits_t, 'to_value_ptr', self.crt_node_rptr))
-            try:
-                val_str = str(val_rptr.referenced_value())
-            except:
-                val_str = 'N/A'
+            self.advance()
+            return val_rptr
+
+        def __next__(self):
+            val_rptr = self.next_val_rptr()
+            if self.render_cache == None:
+                # created on first use: elem_addrs() also iterates
+                self.render_cache = Render_Cache(self.v, self.v.value_t)
+            val_str = self.render_cache.render(intptr(val_rptr), lambda: _val_str(val_rptr))
             result = ('[%d @%s]' % (self.count, print_ptr(val_rptr)), val_str)
             self.count += 1
-            self.advance()
             return result
 
         def next(self):
@@ -433,6 +508,84 @@ class Tree_Printer:
         self.v.value_t = get_inner_type(self.v.bstree_impl_t, 'value_type')
         self.v.value_traits_t = self.v.bstree_impl_t.template_argument(0)
         self.v.node_traits_t = get_inner_type(self.v.bstree_impl_t, 'node_traits')
+        self.elem_type = self.v.value_t
+        self.key_fields = self.get_key_fields(self.v.bstree_impl_t, self.v.value_t)
+
+    #
+    # Key fields of trees, see get_key_fields().
+    #
+    # key: str
+    #   bstree_impl type name.
+    # value: list or None
+    #   [] if the tree is sorted by std::less on the elements, None otherwise.
+    #
+    key_fields_cache = dict()
+
+    @classmethod
+    def get_key_fields(cls, impl_t, value_t):
+        # trees are sorted by the element itself, through the container
+        # compare; its order is known only if it is the default, std::less
+        # on the elements (key_compare since 1.59, value_compare before)
+        name = str(impl_t)
+        if name not in cls.key_fields_cache:
+            res = None
+            for s in ['key_compare', 'value_compare']:
+                try:
+                    comp_t = get_inner_type(impl_t, s)
+                except gdb.error:
+                    continue
+                if is_default_compare(comp_t, value_t):
+                    res = []
+                break
+            cls.key_fields_cache[name] = res
+        return cls.key_fields_cache[name]
+
+    # the elements are owned by the user, the hooks are inside them
+    owns_elements = False
+
+    def hook_size(self):
+        try:
+            return get_inner_type(self.v.node_traits_t, 'node').sizeof
+        except gdb.error:
+            return None
+
+    def elem_count(self):
+        # known only with constant_time_size
+        size = _find_member(self.v, 'size_')
+        return int(size) if size != None else None
+
+    def elem_addrs(self):
+        it = iter(self.Iterator(self.v))
+        while True:
+            try:
+                yield intptr(it.next_val_rptr())
+            except StopIteration:
+                return
+
+    def search_tree(self):
+        #
+        # The parent of the header node is the root. The element address is
+        # at a fixed offset from its node, determined once, on the root.
+        #
+        it = self.Iterator(self.v)
+        header_rptr = it.header_node_rptr
+        node_t = header_rptr.type.strip_typedefs().target().strip_typedefs()
+        offsets = list()
+        for f in ['parent_', 'left_', 'right_']:
+            try:
+                if node_t[f].type.strip_typedefs().code != gdb.TYPE_CODE_PTR:
+                    # e.g. offset_ptr links
+                    return None
+            except KeyError:
+                return None
+            offsets.append(field_offset(node_t, f))
+        tree = Ordered_Tree(0, offsets, ~intptr(3) if it.optimize_size else ~intptr(0))
+        tree.root = tree.parent(intptr(header_rptr))
+        if tree.root != 0:
+            root_rptr = gdb.Value(tree.root).cast(header_rptr.type)
+            val_rptr = get_raw_ptr(call_static_method(self.v.value_traits_t, 'to_value_ptr', root_rptr))
+            tree.value_offset = tree.root - intptr(val_rptr)
+        return tree
 
     def to_string (self):
         if not self.v.qualifiers:
@@ -452,6 +605,8 @@ class Tree_Type_Recognizer:
     "Type Recognizer for boost::intrusive::tree"
     name = 'boost::intrusive::tree-1.55'
     enabled = True
+    # no template_name: trees are recognized by their bstree_impl base, so
+    # this is tried on all other types; results are memoized by type name
 
     def recognize(self, t):
         basic_t = get_basic_type(t)
@@ -465,3 +620,140 @@ class Tree_Type_Recognizer:
         value_t = get_inner_type(bstree_impl_t, 'value_type')
         res += short_ns(template_name(basic_t)) + '<' + str(value_t) + '>'
         return res
+
+#
+# Layout of hashtables, assumed by Hashtable_Printer:
+# - The bucket traits hold 'buckets_', a raw pointer to the bucket array,
+#   and 'buckets_len_', the number of buckets.
+# - Each bucket is a circular slist holding only its root node, i.e. a single
+#   next pointer to the first node of the bucket, or to itself if empty.
+# - Each node starts with its 'next_' pointer (with optimize_multikey, the
+#   group links follow it); the last node of a bucket points back to it.
+# - With constant_time_size, the size is held in 'size_'.
+#
+@add_printer
+class Hashtable_Printer:
+    "Pretty Printer for boost::intrusive unordered sets"
+    printer_name = 'boost::intrusive::unordered_set'
+    version = '1.55'
+
+    @staticmethod
+    def get_hashtable_impl_base(t):
+        #
+        # Given a type `t`, look for a `hashtable_impl` base up to 5 levels up
+        # the class hierarchy.
+        #
+        depth = 0
+        while (depth < 5 and isinstance(t, gdb.Type) and t.code == gdb.TYPE_CODE_STRUCT
+               and template_name(t) != 'boost::intrusive::hashtable_impl'):
+            depth += 1
+            try:
+                t = get_basic_type(t.fields()[0].type)
+            except:
+                return None
+        if isinstance(t, gdb.Type) and template_name(t) == 'boost::intrusive::hashtable_impl':
+            return t
+        else:
+            return None
+
+    @staticmethod
+    def supports(v):
+        return Hashtable_Printer.get_hashtable_impl_base(v.type) != None
+
+    def __init__(self, v):
+        self.v = v
+        self.v.hashtable_impl_t = self.get_hashtable_impl_base(v.type)
+        self.v.value_t = get_inner_type(self.v.hashtable_impl_t, 'value_type')
+        self.v.value_traits_t = self.v.hashtable_impl_t.template_argument(0)
+        self.v.node_traits_t = get_inner_type(self.v.hashtable_impl_t, 'node_traits')
+        self.elem_type = self.v.value_t
+        impl = self.v.cast(self.v.hashtable_impl_t)
+        self.buckets = _find_member(impl, 'buckets_')
+        self.bucket_count = int(_find_member(impl, 'buckets_len_'))
+        size = _find_member(impl, 'size_')
+        self.size = int(size) if size != None else None
+        self.value_offset = None
+
+    # the elements are owned by the user, the hooks are inside them
+    owns_elements = False
+
+    def hook_size(self):
+        try:
+            return get_inner_type(self.v.node_traits_t, 'node').sizeof
+        except gdb.error:
+            return None
+
+    def hash_buckets(self):
+        buckets = get_raw_ptr(self.buckets)
+        if buckets.type.strip_typedefs().target().sizeof != buckets.type.sizeof:
+            # not the bucket layout described above
+            return None
+        res = Hash_Buckets(buckets, self.bucket_count)
+        if self.value_offset == None:
+            # the element address is at a fixed offset from its node,
+            # determined once, on the first node
+            for i, head in enumerate(res.heads()):
+                if not res.is_empty(i, head):
+                    node_rptr_t = get_inner_type(self.v.node_traits_t, 'node').pointer()
+                    val_rptr = get_raw_ptr(call_static_method(
+                        self.v.value_traits_t, 'to_value_ptr', gdb.Value(head).cast(node_rptr_t)))
+                    self.value_offset = head - intptr(val_rptr)
+                    break
+        res.value_offset = self.value_offset or 0
+        return res
+
+    def elem_count(self):
+        return self.size
+
+    def elem_addrs(self):
+        buckets = self.hash_buckets()
+        if buckets == None:
+            message('elem_addrs: unsupported bucket type: ' + str(self.buckets.type))
+            raise gdb.error
+        # the bucket array is read at once; empty buckets are skipped there
+        for i, head in enumerate(buckets.heads()):
+            if buckets.is_empty(i, head):
+                continue
+            for n in buckets.chain(i, head):
+                yield buckets.value_addr(n)
+
+    def to_string (self):
+        res = ''
+        if self.v.qualifiers:
+            res += '(' + self.v.qualifiers + ')'
+        if self.v.template_name.startswith('boost::intrusive::'):
+            res += short_ns(self.v.template_name) + '<' + str(self.v.value_t) + '>'
+        else:
+            res += str(self.v.type)
+        if self.size != None:
+            res += ' of size %d' % self.size
+        return res + ' with %d buckets' % self.bucket_count
+
+    def children (self):
+        val_rptr_t = self.v.value_t.pointer()
+        render_cache = Render_Cache(self.v, self.v.value_t)
+        for i, addr in enumerate(self.elem_addrs()):
+            val_rptr = gdb.Value(addr).cast(val_rptr_t)
+            val_str = render_cache.render(addr, lambda: _val_str(val_rptr))
+            yield ('[%d @%s]' % (i, print_ptr(val_rptr)), val_str)
+
+@add_type_recognizer
+class Hashtable_Type_Recognizer:
+    "Type Recognizer for boost::intrusive::hashtable"
+    name = 'boost::intrusive::hashtable-1.55'
+    enabled = True
+    template_name = ['boost::intrusive::unordered_set', 'boost::intrusive::unordered_multiset',
+                     'boost::intrusive::hashtable']
+
+    def recognize(self, t):
+        basic_t = get_basic_type(t)
+        hashtable_impl_t = Hashtable_Printer.get_hashtable_impl_base(basic_t)
+        if not hashtable_impl_t:
+            return None
+        qualifiers = get_type_qualifiers(t)
+        res = ''
+        if qualifiers:
+            res += '(' + qualifiers + ')'
+        value_t = get_inner_type(hashtable_impl_t, 'value_type')
+        res += short_ns(template_name(basic_t)) + '<' + str(value_t) + '>'
+        return res
@@ -0,0 +1,119 @@
+#
+# layout.py
+#
+# Description of the memory layout of gdb types as plain python objects.
+#
+# A layout is a dict that can be saved as JSON and used without gdb, e.g. to
+# decode raw element bytes saved in a snapshot file. Its keys are:
+#
+# - 'name' : type name
+# - 'size' : type size, in bytes
+# - 'kind' : one of
+#     'int', 'char', 'bool', 'float', 'enum' : arithmetic types; 'int', 'char'
+#         and 'enum' also have a 'signed' key; 'enum' has an 'enumerators' key,
+#         a list of [value, name] pairs
+#     'pointer' : pointers and references
+#     'array' : fixed size arrays; with keys 'count' and 'elem' (a layout)
+#     'struct' : with key 'fields', a list of dicts with keys 'name', 'offset'
+#         (in bytes), 'base' (True for base classes), and 'layout'; bitfields
+#         have instead 'bitpos' (in bits, from the start of the struct) and
+#         'bitsize', and 'layout' is that of the declared type; and key
+#         'printer', True if gdb has a pretty-printer for the type
+#     'opaque' : anything else (unions, functions, ...)
+#
+# For the corresponding numpy dtypes, see rawdata.layout_dtype.
+#
+
+from boost import *
+from boost import rawdata
+
+_char_type_names = ['char', 'signed char', 'unsigned char']
+
+#
+# Cache of layouts.
+#
+# key: str
+#   Type name, stripped of typedefs only: a reference, or a cv-qualified
+#   type, is not the type it refers to.
+# value: dict
+#   The layout.
+#
+_layout_cache = dict()
+
+def _is_signed(t):
+    # gdb has no direct way to ask for the signedness of integral types
+    try:
+        return intptr(gdb.Value(-1).cast(t)) < 0
+    except gdb.error:
+        return not str(t).startswith('unsigned')
+
+def _has_printer(t):
+    # look up the printers with a lazy value, never read
+    try:
+        return gdb.default_visualizer(gdb.Value(0).cast(t.pointer()).dereference()) != None
+    except Exception:
+        # a printer failed on it: it is there
+        return True
+
+def type_layout(t):
+    """
+    Compute the layout of gdb.Type `t`. See the top of this file.
+    """
+    assert isinstance(t, gdb.Type)
+    st = t.strip_typedefs()
+    key = str(st)
+    if key in _layout_cache:
+        return _layout_cache[key]
+    name = str(get_basic_type(t))
+    res = dict()
+    res['name'] = name
+    res['size'] = st.sizeof
+    if st.code == gdb.TYPE_CODE_INT and str(st.unqualified()) not in _char_type_names:
+        res['kind'] = 'int'
+        res['signed'] = _is_signed(st)
+    elif st.code == gdb.TYPE_CODE_INT or st.code == gdb.TYPE_CODE_CHAR:
+        res['kind'] = 'char'
+        res['signed'] = _is_signed(st)
+    elif st.code == gdb.TYPE_CODE_BOOL:
+        res['kind'] = 'bool'
+    elif st.code == gdb.TYPE_CODE_FLT:
+        res['kind'] = 'float'
+    elif st.code == gdb.TYPE_CODE_ENUM:
+        res['kind'] = 'enum'
+        res['enumerators'] = [[int(f.enumval), f.name] for f in st.fields()]
+        res['signed'] = any([e[0] < 0 for e in res['enumerators']])
+    elif st.code in [gdb.TYPE_CODE_PTR, gdb.TYPE_CODE_REF]:
+        res['kind'] = 'pointer'
+    elif st.code == gdb.TYPE_CODE_ARRAY and st.target().sizeof > 0:
+        res['kind'] = 'array'
+        res['elem'] = type_layout(st.target())
+        res['count'] = st.sizeof // st.target().sizeof
+    elif st.code == gdb.TYPE_CODE_STRUCT:
+        res['kind'] = 'struct'
+        res['printer'] = _has_printer(st)
+        res['fields'] = list()
+        for f in st.fields():
+            if not hasattr(f, 'bitpos') or f.type == None:
+                # static member
+                continue
+            fd = dict()
+            fd['name'] = f.name
+            fd['base'] = bool(f.is_base_class)
+            if f.bitsize > 0:
+                fd['bitpos'] = f.bitpos
+                fd['bitsize'] = f.bitsize
+            else:
+                fd['offset'] = f.bitpos // 8
+            fd['layout'] = type_layout(f.type)
+            res['fields'].append(fd)
+    else:
+        res['kind'] = 'opaque'
+    _layout_cache[key] = res
+    return res
+
+def type_dtype(t):
+    """
+    numpy structured dtype of gdb.Type `t`, with the offsets and padding of
+    the inferior, or None (see rawdata.layout_dtype).
+    """
+    return rawdata.layout_dtype(type_layout(t))
@@ -0,0 +1,290 @@
+#
+# lookup.py
+#
+# Key lookups in ordered containers: the convenience function $contains, and
+# the command boost-find-key.
+#
+# A lookup is a binary search: it descends the tree of node-based containers
+# whose printer provides search_tree() (intrusive trees, multi_index ordered
+# indexes), and bisects the elements of sorted contiguous containers (flat_set,
+# flat_map). Only O(log n) elements are read, whatever the container size.
+#
+# Keys are compared as Python values: arithmetic and enum values as numbers,
+# strings (char arrays and pointers, and types printed as strings) as Python
+# strings, and structs as tuples of their fields (without intrusive hooks).
+# The key of an element is made of the key_fields of the container printer
+# (see utils.py), or is computed by a function in key_extractor. A key given
+# for a lookup can be a prefix of the element key: e.g. with a composite key
+# (a, b), looking up a value of a finds all the elements with that a.
+#
+# NOTE: The container must order its elements like Python orders their keys,
+# i.e. with std::less on numbers and strings, and lexicographically on
+# composite keys. Printers only provide key fields for containers using the
+# default comparator (std::less). For other orders, use a key extractor that
+# maps the element to a key in the Python order (e.g. the opposite number
+# for std::greater).
+#
+
+import itertools
+
+from boost import *
+
+#
+# Key extractors.
+#
+# key: str
+#   Container type name, stripped of typedefs, or element type name.
+#   An extractor for the container type comes first, then the key fields
+#   of the container printer; one for the element type is only used when
+#   the printer does not know the key (e.g. a multi_index index with a
+#   global_fun extractor), so it does not affect the other indexes.
+# value: function
+#   Call function with argument an element (gdb.Value) to get its key, as a
+#   gdb.Value or as a Python value.
+#
+key_extractor = dict()
+
+def key_value(v):
+    """
+    Convert `v` to the Python value used to compare keys. Python values are
+    returned unchanged.
+    """
+    if not isinstance(v, gdb.Value):
+        return v
+    t = v.type.strip_typedefs()
+    if t.code == gdb.TYPE_CODE_REF:
+        v = v.referenced_value()
+        t = v.type.strip_typedefs()
+    if t.code in [gdb.TYPE_CODE_INT, gdb.TYPE_CODE_ENUM, gdb.TYPE_CODE_BOOL, gdb.TYPE_CODE_CHAR]:
+        return int(v)
+    if t.code == gdb.TYPE_CODE_FLT:
+        return float(v)
+    if t.code in [gdb.TYPE_CODE_PTR, gdb.TYPE_CODE_ARRAY] and is_char_type(t.target()):
+        return v.string()
+    if t.code == gdb.TYPE_CODE_STRUCT:
+        p = gdb.default_visualizer(v)
+        if p != None and hasattr(p, 'display_hint') and p.display_hint() == 'string':
+            s = p.to_string()
+            if hasattr(s, 'value'):
+                # gdb.LazyString
+                s = s.value()
+            if isinstance(s, gdb.Value):
+                s = s.string()
+            return s
+        # intrusive hooks, as base classes or members, are not part of the key
+        return tuple([key_value(v[f]) for f in t.fields() if hasattr(f, 'bitpos')
+                      and not template_name(f.type).startswith('boost::intrusive::')])
+    message('lookup: unsupported key type: ' + str(v.type))
+    raise gdb.error
+
+def compare_keys(elem_key, key):
+    """
+    Compare the element key `elem_key` with the lookup key `key`, which can
+    be a prefix of it. Returns a negative number, 0, or a positive number.
+    """
+    if not isinstance(elem_key, tuple):
+        elem_key = (elem_key,)
+    if not isinstance(key, tuple):
+        key = (key,)
+    elem_key = elem_key[:len(key)]
+    try:
+        return (elem_key > key) - (elem_key < key)
+    except TypeError:
+        message('lookup: cannot compare key ' + repr(key) + ' with element key ' + repr(elem_key))
+        raise gdb.error
+
+class _Sorted_Elements(object):
+    # sorted contiguous elements; positions are indexes, the end is the size
+    def __init__(self, segments, elem_size, elem_key):
+        self.segments = segments
+        self.elem_size = elem_size
+        self.elem_key = elem_key
+        self.size = sum([count for _, count in segments])
+        self.end = self.size
+
+    def addr(self, i):
+        for start, count in self.segments:
+            if i < count:
+                return start + i * self.elem_size
+            i -= count
+        assert False, 'index out of range'
+
+    def bound(self, key, upper):
+        lo = 0
+        hi = self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            c = compare_keys(self.elem_key(self.addr(mid)), key)
+            if c < 0 or (upper and c == 0):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def elements(self, first, last):
+        for i in xrange(first, last):
+            yield ('[%d]' % i, self.addr(i))
+
+class _Tree_Elements(object):
+    # elements of an Ordered_Tree; positions are nodes, the end is None
+    def __init__(self, tree, elem_key):
+        self.tree = tree
+        self.elem_key = elem_key
+        self.end = None
+
+    def addr(self, n):
+        return self.tree.value_addr(n)
+
+    def bound(self, key, upper):
+        res = None
+        n = self.tree.root
+        while n != 0:
+            c = compare_keys(self.elem_key(self.addr(n)), key)
+            if c < 0 or (upper and c == 0):
+                n = self.tree.right(n)
+            else:
+                res = n
+                n = self.tree.left(n)
+        return res
+
+    def elements(self, first, last):
+        if first == None:
+            return
+        last_node = self.tree.rightmost(self.tree.root)
+        n = first
+        while n != last:
+            yield ('[%s]' % hex(self.addr(n)), self.addr(n))
+            if n == last_node:
+                return
+            n = self.tree.successor(n)
+
+def _elem_key_function(value, p):
+    # function mapping an element address to its key
+    elem_ptr_t = p.elem_type.pointer()
+    names = [str(get_basic_type(value.type)), str(p.elem_type.strip_typedefs())]
+    extractors = [key_extractor.get(name) for name in names]
+    if extractors[0] == None and p.key_fields == None:
+        extractors[0] = extractors[1]
+    if extractors[0] != None:
+        f = extractors[0]
+        return lambda addr: key_value(f(gdb.Value(addr).cast(elem_ptr_t).dereference()))
+    if p.key_fields == None:
+        message('lookup: cannot determine the key of the elements of: ' + names[0])
+        long_message(
+            'lookup',
+            '\n\tto provide it with python function <f> taking an element, add:\n' +
+            '\t  py boost.lookup.key_extractor["' + names[0] + '"] = <f>')
+        raise gdb.error
+    def elem_field(v, path):
+        for name in path.split('.'):
+            v = v[name]
+        return v
+    def elem_key(addr):
+        v = gdb.Value(addr).cast(elem_ptr_t).dereference()
+        if len(p.key_fields) == 0:
+            return key_value(v)
+        if len(p.key_fields) == 1:
+            return key_value(elem_field(v, p.key_fields[0]))
+        return tuple([key_value(elem_field(v, path)) for path in p.key_fields])
+    return elem_key
+
+def ordered_elements(value):
+    """
+    Return the searchable elements of ordered container `value`: an object
+    with a `bound(key, upper)` method returning the position of the first
+    element whose key is not less than `key` (greater than `key` if `upper`),
+    an `elements(first, last)` method generating (label, address) pairs for
+    the elements in [`first`, `last`), an `addr(pos)` method, and an `end`
+    position.
+    """
+    p = gdb.default_visualizer(value)
+    if p == None or not hasattr(p, 'key_fields') or not hasattr(p, 'elem_type'):
+        message('lookup: not an ordered container: ' + str(value.type))
+        raise gdb.error
+    elem_key = _elem_key_function(value, p)
+    tree = p.search_tree() if hasattr(p, 'search_tree') else None
+    if tree != None:
+        return _Tree_Elements(tree, elem_key)
+    if hasattr(p, 'segments'):
+        return _Sorted_Elements(p.segments(), p.elem_type.sizeof, elem_key)
+    message('lookup: no binary search for: ' + str(value.type))
+    raise gdb.error
+
+def find_key(value, key, mode=None, limit=None):
+    """
+    Look up `key` in ordered container `value`.
+
+    Returns a list of (label, address) pairs:
+    - with `mode` None: the first element with that key, if any;
+    - 'lower': the first element whose key is not less than `key`, if any;
+    - 'upper': the first element whose key is greater than `key`, if any;
+    - 'range': all the elements with that key, at most `limit` if given.
+    """
+    key = key_value(key)
+    s = ordered_elements(value)
+    if mode == 'upper':
+        first = s.bound(key, True)
+    else:
+        first = s.bound(key, False)
+    if first == s.end:
+        return []
+    if mode == 'range':
+        return list(itertools.islice(s.elements(first, s.bound(key, True)), limit))
+    if mode == None and compare_keys(s.elem_key(s.addr(first)), key) != 0:
+        return []
+    return [next(s.elements(first, s.end))]
+
+def contains(value, key):
+    """
+    Check if ordered container `value` holds an element with key `key`.
+    """
+    return len(find_key(value, key)) > 0
+
+class contains_func(gdb.Function):
+    """
+    Check if an ordered container holds an element with the given key.
+
+    Usage: $contains(<container>, <key>)
+    """
+    def __init__(self):
+        super(contains_func, self).__init__('contains')
+
+    def invoke(self, cont, key):
+        return int(contains(cont, key))
+
+_contains = contains_func()
+
+class find_key_cmd(gdb.Command):
+    """
+    Find elements by key in an ordered container, with a binary search.
+
+    Usage: boost-find-key <expr> <key> [lower|upper|range]
+
+    Without a mode, print the element with key <key>. With lower (upper),
+    print the first element whose key is not less than (greater than) <key>.
+    With range, print all the elements with key <key>, up to the "print
+    elements" limit. String keys are C string literals, quoted for the
+    command line: boost-find-key m '"abc"'.
+    """
+    def __init__(self):
+        super(find_key_cmd, self).__init__('boost-find-key', gdb.COMMAND_DATA)
+
+    def invoke(self, arg, from_tty):
+        argv = gdb.string_to_argv(arg)
+        if len(argv) < 2 or len(argv) > 3 or (len(argv) == 3 and argv[2] not in ['lower', 'upper', 'range']):
+            raise gdb.GdbError('usage: boost-find-key <expr> <key> [lower|upper|range]')
+        value = parse_and_eval(argv[0])
+        mode = argv[2] if len(argv) == 3 else None
+        limit = gdb.parameter('print elements')
+        res = find_key(value, parse_and_eval(argv[1]), mode, limit + 1 if limit else None)
+        if len(res) == 0:
+            gdb.write('not found\n')
+            return
+        elem_ptr_t = gdb.default_visualizer(value).elem_type.pointer()
+        for i, (label, addr) in enumerate(res):
+            if limit and i >= limit:
+                gdb.write('...\n')
+                break
+            gdb.write('%s = %s\n' % (label, str(gdb.Value(addr).cast(elem_ptr_t).dereference())))
+
+_find_key = find_key_cmd()
@@ -0,0 +1,214 @@
+#
+# memusage.py
+#
+# Memory accounting of a container: bytes used by the container object
+# (header), the elements, the node fields added to them, the unused capacity,
+# and the other blocks it allocates (e.g. bucket arrays).
+#
+# Everything is computed from the types and from what the printers know about
+# the memory of their containers (see utils.py): the element count, the node
+# size, the capacity, etc. No element is rendered. With --deep, the pointees
+# of the boost::shared_ptr and boost::scoped_ptr fields of the elements (and,
+# recursively, of the pointees) are added, each address counted once. Only
+# the static type size of a pointee is counted, not its control block.
+#
+
+from boost import *
+from boost import rawdata
+
+_smart_ptr_templates = ['boost::shared_ptr', 'boost::scoped_ptr']
+
+#
+# Smart pointer fields of a type.
+#
+# key: str
+#   The type name, stripped of typedefs only (references are not their
+#   target types).
+# value: list
+#   List of (offset of the raw pointer, pointee gdb.Type) pairs.
+#
+_smart_ptr_fields_cache = dict()
+
+def smart_ptr_fields(t):
+    """
+    List the (offset of the raw pointer, pointee gdb.Type) pairs of the
+    boost::shared_ptr and boost::scoped_ptr in gdb.Type `t` (`t` itself, its
+    fields, base classes and arrays, recursively).
+    """
+    st = t.strip_typedefs()
+    name = str(st)
+    if name in _smart_ptr_fields_cache:
+        return _smart_ptr_fields_cache[name]
+    res = list()
+    if st.code == gdb.TYPE_CODE_STRUCT and template_name(st) in _smart_ptr_templates:
+        offset = field_offset(st, 'px')
+        if offset != None:
+            res.append((offset, st['px'].type.strip_typedefs().target()))
+    elif st.code == gdb.TYPE_CODE_STRUCT:
+        for f in st.fields():
+            if not hasattr(f, 'bitpos') or f.type == None or f.bitsize > 0:
+                # static member or bitfield
+                continue
+            for offset, target in smart_ptr_fields(f.type):
+                res.append((f.bitpos // 8 + offset, target))
+    elif st.code == gdb.TYPE_CODE_ARRAY and st.target().sizeof > 0:
+        elem_size = st.target().sizeof
+        sub = smart_ptr_fields(st.target())
+        for i in xrange(st.sizeof // elem_size if len(sub) > 0 else 0):
+            res += [(i * elem_size + offset, target) for offset, target in sub]
+    _smart_ptr_fields_cache[name] = res
+    return res
+
+def _pointees(fields, buf, count, size):
+    # generate the non-null (address, pointee type) pairs of smart pointer
+    # `fields` in `count` objects of `size` bytes in `buf`
+    ptr_size = gdb.lookup_type('void').pointer().sizeof
+    for i in xrange(count):
+        for offset, target in fields:
+            addr = rawdata.decode_int(buf, i * size + offset, ptr_size, False)
+            if addr != 0:
+                yield (addr, target)
+
+def deep_usage(p, seen=None):
+    """
+    Follow the smart pointers in the elements of the container printed by
+    `p`, and in their pointees. Returns the pair (number of pointees, bytes);
+    the addresses in set `seen` are skipped, and the new ones added to it.
+    """
+    if seen == None:
+        seen = set()
+    fields = smart_ptr_fields(p.elem_type)
+    if len(fields) == 0:
+        return (0, 0)
+    elem_size = p.elem_type.sizeof
+    pending = list()
+    chunk_elems = max(1, options['bulk_read_size'] // elem_size)
+    for buf in read_elem_chunks(p, chunk_elems):
+        for addr, target in _pointees(fields, buf, len(buf) // elem_size, elem_size):
+            if addr not in seen:
+                seen.add(addr)
+                pending.append((addr, target))
+    count = 0
+    total = 0
+    while len(pending) > 0:
+        addr, t = pending.pop()
+        count += 1
+        total += t.sizeof
+        sub = smart_ptr_fields(t)
+        if len(sub) == 0:
+            continue
+        for a, target in _pointees(sub, read_memory(addr, t.sizeof), 1, t.sizeof):
+            if a not in seen:
+                seen.add(a)
+                pending.append((a, target))
+    return (count, total)
+
+class Memory_Usage(object):
+    """
+    Memory used by a container.
+
+    Attributes:
+      `rows`: list of (name, count, unit size, bytes, counted) tuples; count
+        and unit size are None for single blocks; rows not counted (e.g. the
+        elements of intrusive containers) are informative only
+      `total`: bytes used by the container
+    """
+    def __init__(self, value, p, deep=False):
+        self.rows = list()
+        self.total = 0
+        self.add('header', None, None, value.type.sizeof)
+        n = elem_count(p)
+        if n == None:
+            n = 0
+            for _ in p.elem_addrs():
+                n += 1
+        elem_size = p.elem_type.sizeof
+        owned = getattr(p, 'owns_elements', True)
+        if owned and hasattr(p, 'segments') and value.address != None:
+            # e.g. boost::array: the elements are in the header
+            start = intptr(value.address)
+            end = start + value.type.sizeof
+            if all([start <= a and a + c * elem_size <= end for a, c in p.segments()]):
+                owned = False
+        if owned:
+            self.add('elements', n, elem_size)
+        else:
+            self.add('elements (not owned)', n, elem_size, counted=False)
+        if hasattr(p, 'hook_size'):
+            hook_size = p.hook_size()
+            if hook_size != None:
+                self.add('hooks (in elements)', n, hook_size, counted=False)
+        if hasattr(p, 'node_size') and p.node_size > elem_size:
+            fields = getattr(p, 'node_fields', [('node fields', p.node_size - elem_size)])
+            for name, size in fields:
+                self.add(name, n, size)
+        if hasattr(p, 'capacity') and owned:
+            self.add('unused capacity', p.capacity() - n, elem_size)
+        if hasattr(p, 'extra_blocks'):
+            for name, size in p.extra_blocks():
+                self.add(name, None, None, size)
+        if deep:
+            count, size = deep_usage(p)
+            self.add('pointees', count, None, size)
+
+    def add(self, name, count, unit, size=None, counted=True):
+        if size == None:
+            size = count * unit
+        self.rows.append((name, count, unit, size, counted))
+        if counted:
+            self.total += size
+
+    def lines(self):
+        res = list()
+        for name, count, unit, size, counted in self.rows:
+            if count != None and unit != None:
+                detail = '%d x %d' % (count, unit)
+            elif count != None:
+                detail = '%d' % count
+            else:
+                detail = ''
+            res.append('%-28s %16s %12d%s' % (name, detail, size, '' if counted else ' *'))
+        res.append('%-28s %16s %12d' % ('total', '', self.total))
+        if not all([r[4] for r in self.rows]):
+            res.append('(*: not allocated by the container, not in the total)')
+        return res
+
+def memory_usage(value, deep=False):
+    """
+    Compute the Memory_Usage of container `value`.
+    """
+    p = gdb.default_visualizer(value)
+    if p == None or not hasattr(p, 'elem_type') or not hasattr(p, 'elem_addrs'):
+        message('memusage: no container printer with raw element access for type: '
+                + str(value.type))
+        raise gdb.error
+    return Memory_Usage(value, p, deep)
+
+class memusage_cmd(gdb.Command):
+    """
+    Print the memory used by a container.
+
+    Usage: boost-memusage <expr> [--deep]
+
+    Prints the bytes used by the container object, the elements, the node
+    fields (e.g. the fields of each multi_index index), the unused capacity,
+    and the other blocks allocated by the container (bucket and pointer
+    arrays). The elements and hooks of intrusive containers are listed, but
+    not counted. With --deep, the pointees of the boost::shared_ptr and
+    boost::scoped_ptr in the elements are followed, and counted once each.
+    """
+    def __init__(self):
+        super(memusage_cmd, self).__init__('boost-memusage', gdb.COMMAND_DATA)
+
+    def invoke(self, arg, from_tty):
+        argv = gdb.string_to_argv(arg)
+        deep = False
+        if '--deep' in argv:
+            argv.remove('--deep')
+            deep = True
+        if len(argv) != 1:
+            raise gdb.GdbError('usage: boost-memusage <expr> [--deep]')
+        usage = memory_usage(parse_and_eval(argv[0]), deep)
+        gdb.write('\n'.join(usage.lines()) + '\n')
+
+_memusage = memusage_cmd()
@@ -51,22 +51,45 @@ def _strip_inheritance_qual(s):
         return s[10:]
     return s
 
-def _boost_multi_index_get_indexes(v):
-    "Save the index types of a multi_index_container in v.indexes."
-    v.main_args = _paren_split(str(v.basic_type))
-    if len(v.main_args) != 3:
-        message('error parsing: ' + str(v.basic_type))
-        return False
-    arg2_str = str(v.basic_type)[v.main_args[1][0]:v.main_args[1][1]] # the 2nd template arg
+def _boost_multi_index_parse_args(t):
+    """
+    Return the strings of the first 2 template arguments of multi_index_container
+    type `t` (element type and index specifier list), and the list of index
+    types, by parsing the type name. Returns None on errors.
+    """
+    type_str = str(t)
+    main_args = _paren_split(type_str)
+    if main_args == None or len(main_args) != 3:
+        message('error parsing: ' + type_str)
+        return None
+    arg1_str = type_str[main_args[0][0]:main_args[0][1]].strip()
+    arg2_str = type_str[main_args[1][0]:main_args[1][1]] # the 2nd template arg
     arg2_args = _paren_split(arg2_str)
-    if len(arg2_args) == 0:
-        message('error parsing arg2 of: ' + str(v.basic_type))
-        return False
-    v.indexes = []
+    if arg2_args == None or len(arg2_args) == 0:
+        message('error parsing arg2 of: ' + type_str)
+        return None
+    indexes = []
     for r in arg2_args:
-        v.indexes.append(arg2_str[r[0]:r[1]].split('<')[0].strip())
-
-# The size in pointers of the index fields for all index types.
+        indexes.append(arg2_str[r[0]:r[1]].split('<')[0].strip())
+    return (arg1_str, arg2_str.strip(), indexes)
+
+def _boost_multi_index_get_args(t):
+    """
+    Same as _boost_multi_index_parse_args, using the template arguments
+    provided by gdb if possible.
+    """
+    args = template_arguments(t)
+    if args and len(args) >= 2 and isinstance(args[1], gdb.Type):
+        index_args = template_arguments(args[1])
+        if index_args:
+            indexes = [template_name(a) for a in index_args
+                       if isinstance(a, gdb.Type) and not str(a).startswith('mpl_::na')]
+            if len(indexes) > 0 and all(indexes):
+                return (str(args[0]), str(args[1]), indexes)
+    return _boost_multi_index_parse_args(t)
+
+# The size in pointers of the index fields for all index types. Hashed
+# indexes have 2 (prior and next) since Boost 1.56, see _index_size().
 _boost_multi_index_index_size = {}
 _boost_multi_index_index_size['boost::multi_index::ordered_unique'] = 3
 _boost_multi_index_index_size['boost::multi_index::ordered_non_unique'] = 3
@@ -75,6 +98,156 @@ _boost_multi_index_index_size['boost::multi_index::hashed_non_unique'] = 1
 _boost_multi_index_index_size['boost::multi_index::sequenced'] = 2
 _boost_multi_index_index_size['boost::multi_index::random_access'] = 1
 
+def _hashed_links(layer_t):
+    """
+    True if the hashed index class `layer_t` uses the node layout of
+    Boost >= 1.56 (prior and next pointers), detected by the size_index_
+    field of its bucket array; False for the single next pointer of older
+    versions.
+    """
+    return field_offset(layer_t.strip_typedefs(), 'buckets.size_index_') != None
+
+def _index_size(index, layer_t):
+    if index not in _boost_multi_index_index_size:
+        raise gdb.error('unknown multi_index_container index type: ' + index)
+    if index.startswith('boost::multi_index::hashed_') and _hashed_links(layer_t):
+        return 2
+    return _boost_multi_index_index_size[index]
+
+def _template_args(s):
+    r = _paren_split(s)
+    if not r:
+        return []
+    return [s[i:j].strip() for i, j in r]
+
+def _key_fields(spec):
+    """
+    Element fields making up the key of the index with specifier `spec`
+    (e.g. 'ordered_unique<tag<by_id>, member<A, int, &A::id> >'), as a list
+    of field names: [] for identity, ['id'] for the member above, one name per
+    member of a composite_key. Returns None for other key extractors, for
+    pointer keys (std::less orders them by address, lookups compare char
+    pointers as strings), and for ordered indexes with a comparator other
+    than std::less.
+    """
+    args = _template_args(spec)
+    ordered = spec.split('<')[0].split('::')[-1].strip() in ['ordered_unique', 'ordered_non_unique']
+    for i, arg in enumerate(args):
+        name = arg.split('<')[0].strip().split('::')[-1]
+        if name in ['identity', 'member']:
+            # key type: the 1st argument of identity, the 2nd of member
+            key_args = _template_args(arg)
+            pos = 0 if name == 'identity' else 1
+            key_t = key_args[pos] if pos < len(key_args) else ''
+            if key_t.endswith('*') or key_t.endswith('&'):
+                return None
+            res = [] if name == 'identity' else [key_args[-1].strip('&() ').split('::')[-1]]
+        elif name == 'composite_key':
+            res = list()
+            for key_arg in _template_args(arg)[1:]:
+                if key_arg.startswith('boost::tuples::null_type') or key_arg.startswith('mpl_::na'):
+                    continue
+                key = _key_fields('<' + key_arg + '>')
+                if key == None or len(key) != 1:
+                    return None
+                res += key
+        else:
+            continue
+        # the comparator follows the key extractor
+        if ordered and i + 1 < len(args) and args[i + 1].split('<')[0].strip() not in ['std::less', 'mpl_::na']:
+            return None
+        return res
+    return None
+
+class Multi_Index_Layout(object):
+    """
+    Layout of a multi_index_container type, computed once per type.
+
+    Attributes:
+      `indexes`: list of index types (template names, e.g.
+        'boost::multi_index::ordered_unique')
+      `display_name`: shortened container type name
+      `elem_type`: gdb.Type of the elements
+      `header_t`: the header_holder base class, holding the head node pointer
+      `node_size`: size of a node
+      `index_offsets`: for each index, offset of its fields from the element
+      `index_sizes`: for each index, size of its fields, in pointers
+      `index_layers`: for each index, its index class (e.g. hashed_index<...>);
+        these are the successive first base classes of the 3rd base class of
+        the container
+      `node_fields`: (name, bytes) pairs of the index fields in a node, and of
+        the padding of the element, if any
+      `key_fields`: for each index, the element fields making up its key (see
+        _key_fields), or None if unknown
+    """
+    def __init__(self, t):
+        args = _boost_multi_index_get_args(t)
+        if args == None:
+            raise gdb.error('cannot parse multi_index_container type: ' + str(t))
+        arg1_str, arg2_str, self.indexes = args
+
+        # clear up the type_name: template name, with 2 args only (omit allocator)
+        name = 'boost::multi_index::multi_index_container<' + arg1_str + ', ' + arg2_str + '>'
+        # remove bulk
+        name = ''.join(name.split('boost::multi_index::detail::'))
+        name = ''.join(name.split('boost::multi_index::'))
+        name = ''.join(name.split('boost::detail::'))
+        name = ''.join(name.split(', mpl_::na'))
+        name = ''.join(name.split('mpl_::na'))
+        name = ''.join(name.split('tag<>'))
+        name = '<>'.join(name.split('< >'))
+        self.display_name = 'boost::' + name
+
+        self.elem_type = t.template_argument(0)
+
+        # the 2nd subtype should be header_holder; its 'member' points to the head node
+        self.header_t = t.fields()[1].type
+        if not str(self.header_t).strip().startswith('boost::multi_index::detail::header_holder'):
+            raise gdb.error('2nd subtype of multi_index_container is not header_holder')
+        head_ptr_t = [f.type for f in self.header_t.strip_typedefs().fields() if f.name == 'member'][0]
+        self.node_size = head_ptr_t.strip_typedefs().target().sizeof
+
+        # offset from the element address to the fields of each index:
+        # the fields of all indexes prior to the current one come after
+        ptr_size = gdb.lookup_type('void').pointer().sizeof
+        self.index_layers = list()
+        layer_t = t.fields()[2].type
+        for index in self.indexes:
+            self.index_layers.append(layer_t)
+            layer_t = layer_t.strip_typedefs().fields()[0].type
+        self.index_sizes = [_index_size(index, self.index_layers[i])
+                            for i, index in enumerate(self.indexes)]
+        self.index_offsets = list()
+        offset = self.node_size
+        for size in self.index_sizes:
+            offset -= size * ptr_size
+            self.index_offsets.append(offset)
+        self.node_fields = [('index %d (%s)' % (i, self.indexes[i].split('::')[-1]),
+                             self.index_sizes[i] * ptr_size)
+                            for i in xrange(len(self.indexes))]
+        if offset > self.elem_type.sizeof:
+            self.node_fields.append(('padding', offset - self.elem_type.sizeof))
+
+        # key extractors, from the index specifiers
+        specs = list()
+        for r in _paren_split(arg2_str) or []:
+            spec = arg2_str[r[0]:r[1]].strip()
+            if not spec.startswith('mpl_::na'):
+                specs.append(spec)
+        self.key_fields = [_key_fields(spec) for spec in specs[:len(self.indexes)]]
+        self.key_fields += [None] * (len(self.indexes) - len(self.key_fields))
+
+#
+# Cache of multi_index_container layouts, by type name.
+#
+_layout_cache = dict()
+
+def _get_layout(t):
+    tn = str(t)
+    if tn not in _layout_cache:
+        _layout_cache[tn] = Multi_Index_Layout(t)
+    return _layout_cache[tn]
+
 #
 # The following is an experimental printer for boost::multi_index_container
 # using ordered unique/nonunique or sequenced index. This might not always
@@ -89,7 +262,8 @@ _boost_multi_index_index_size['boost::multi_index::random_access'] = 1
 #   (Element, index_n-1_fields, ..., index_0_fields)
 # - The size of an Element is rounded up to the next multiple of 8.
 # - The size of the index fields for various indexes are in
-#   _boost_multi_index_index_size (in number of pointers).
+#   _boost_multi_index_index_size (in number of pointers), except for hashed
+#   indexes since Boost 1.56 (see _index_size).
 # - For ordered & sequenced indexes:
 # - The i-th index field pointers (3 for ordered, 2 for sequenced) point to the
 #   address of the destination node's i-th index fields pointers (not to the
@@ -111,6 +285,28 @@ _boost_multi_index_index_size['boost::multi_index::random_access'] = 1
 #   - The index field contains: previous@0 and next@1.
 #   - To traverse the container, keep following next pointers until returning
 #     back to the head node.
+# - For hashed indexes (Boost < 1.56):
+#   - The index class holds 'buckets', an array of size_ (+1) bucket nodes,
+#     each a single next pointer, at buckets.spc.data_.
+#   - The index field of a node is a single next pointer.
+#   - The nodes of a bucket form a circular list through the bucket node: the
+#     bucket points to the first node, and the last node points back to the
+#     bucket. An empty bucket points to itself.
+#   - The bucket array is read at once, then each chain is followed.
+# - For hashed indexes (Boost >= 1.56):
+#   - The bucket array holds size_index_ instead of size_, and each bucket
+#     node is a single prior pointer, null for an empty bucket.
+#   - The index field of a node is: prior@0 and next@1.
+#   - All the nodes form a single list, ending at the head node, with the
+#     bucket nodes linked in between; the first node is the prior of the next
+#     of the head node. The successor of a node is computed as in after() in
+#     boost/multi_index/detail/hash_index_node.hpp, which differs for unique
+#     and non unique indexes (the latter link groups of equivalent elements).
+#   - Bucket statistics are not available for this layout.
+# - For random access indexes:
+#   - The index class holds 'ptrs', an array of size_ (+1) pointers to the
+#     node index fields, in order, at ptrs.spc.data_.
+#   - The pointer array is read at once.
 #
 # 2. The python framework in gdb is limited. To cast a
 # boost::multi_index_container to one of its super classes, I use an awkward
@@ -125,100 +321,63 @@ class Boost_Multi_Index:
     template_name = 'boost::multi_index::multi_index_container'
 
     #
-    # Not supported indexes (hashes and random-access) are captured and printed
-    # by this subprinter. To disable this, set this to False. This can be set in
+    # Indexes that cannot be printed are captured and printed by this
+    # subprinter. To disable this, set this to False. This can be set in
     # the source code, in .gdbinit where the printers are loaded, or dynamically
     # from inside gdb.
     #
     print_not_supported = True
 
+    supported_indexes = ['boost::multi_index::ordered_unique',
+                         'boost::multi_index::ordered_non_unique',
+                         'boost::multi_index::sequenced',
+                         'boost::multi_index::hashed_unique',
+                         'boost::multi_index::hashed_non_unique',
+                         'boost::multi_index::random_access']
+
     @classmethod
     def supports(self_type, v):
-        _boost_multi_index_get_indexes(v)
-        #message('address=' + str(intptr(v.address)) + ' multi_index_selector=' + str(multi_index_selector))
+        try:
+            v.layout = _get_layout(v.basic_type)
+        except gdb.error as e:
+            message(str(e))
+            return False
+        v.indexes = v.layout.indexes
         if intptr(v.address) in multi_index_selector:
             v.idx = multi_index_selector[intptr(v.address)]
-            #message('address found')
         else:
             v.idx = 0
-            #message('address not found')
         if v.idx >= len(v.indexes):
             return False
         return (self_type.print_not_supported
-                or v.indexes[v.idx] == 'boost::multi_index::ordered_unique'
-                or v.indexes[v.idx] == 'boost::multi_index::ordered_non_unique'
-                or v.indexes[v.idx] == 'boost::multi_index::sequenced')
+                or v.indexes[v.idx] in self_type.supported_indexes)
 
     @staticmethod
     def get_val_ptr(node_ptr, index_offset):
         return node_ptr - index_offset
 
     def __init__(self, v):
-        # clear up the type_name:
-        # pick template name
-        self.type_name = v.type_name[0:v.main_args[0][0]].strip()[:-1]
-        # add 2 args only (omit allocator)
-        self.type_name += ('<'
-                           + v.type_name[v.main_args[0][0]:v.main_args[0][1]].strip()
-                           + ', '
-                           + v.type_name[v.main_args[1][0]:v.main_args[1][1]].strip()
-                           + '>')
-        # remove bulk
-        self.type_name = ''.join(self.type_name.split('boost::multi_index::detail::'))
-        self.type_name = ''.join(self.type_name.split('boost::multi_index::'))
-        self.type_name = ''.join(self.type_name.split('boost::detail::'))
-        self.type_name = ''.join(self.type_name.split(', mpl_::na'))
-        self.type_name = ''.join(self.type_name.split('mpl_::na'))
-        self.type_name = ''.join(self.type_name.split('tag<>'))
-        self.type_name = '<>'.join(self.type_name.split('< >'))
-        self.type_name = 'boost::' + self.type_name
-        # add index specifier
-        self.type_name += '[idx=' + str(v.idx) + ']'
-        #message('type_name: ' + self.type_name)
-
-        # index type
-        self.index_type = v.indexes[v.idx]
-
-        # node count
+        layout = v.layout
+        self.type_name = layout.display_name + '[idx=' + str(v.idx) + ']'
+        self.index_type = layout.indexes[v.idx]
         self.node_count = int(v['node_count'])
-
-        # first, we need the element type
-        self.elem_type = v.basic_type.template_argument(0)
-        #message('elem_type: ' + str(self.elem_type))
-
-        # next, we compute the element size and round it up to the pointer size
-        ptr_size = gdb.lookup_type('void').pointer().sizeof
-        self.elem_size = ((self.elem_type.sizeof - 1) / ptr_size + 1) * ptr_size
-        #message('elem_size: ' + str(self.elem_size))
-
-        # next, we cast the object into its 2nd subtype which should be header_holder
-        # and retrieve the head node
-        #header_holder_subtype = _get_subtype(v.basic_type, 1)
-        header_holder_subtype = v.basic_type.fields()[1].type
-        if header_holder_subtype == None:
-            message('error computing 2nd subtype of ' + str(v.basic_type))
-            return None
-        if not str(header_holder_subtype).strip().startswith('boost::multi_index::detail::header_holder'):
-            message('2nd subtype of multi_index_container is not header_holder')
-            return None
-        head_node = v.cast(header_holder_subtype)['member'].dereference()
-        #message('head_node.type.sizeof: ' + str(head_node.type.sizeof))
-
-        # finally, we compute the offset from the element address
-        # to the index field address, as well as the address of the parent_ptr
-        # inside the head node
-        # to do that, we compute the size of all indexes prior to the current one
-        self.index_offset = head_node.type.sizeof
-        for i in xrange(v.idx + 1):
-            self.index_offset -= _boost_multi_index_index_size[v.indexes[i]] * ptr_size
-        #message('index_offset: ' +  str(self.index_offset))
-
-        self.head_index_ptr = intptr(head_node.address) + self.index_offset
-        #message('head_index_ptr: ' + hex(self.head_index_ptr))
+        self.elem_type = layout.elem_type
+        self.node_size = layout.node_size
+        self.node_fields = layout.node_fields
+        self.index_offset = layout.index_offsets[v.idx]
+        self.index_size = layout.index_sizes[v.idx]
+        head_node_ptr = intptr(v.cast(layout.header_t)['member'])
+        self.head_index_ptr = head_node_ptr + self.index_offset
+        self.index_layer = v.cast(layout.index_layers[v.idx])
+        self.key_fields = layout.key_fields[v.idx]
+        self.value = v
 
     def empty_cont(self):
         return self.node_count == 0
 
+    def elem_count(self):
+        return self.node_count
+
     class empty_iterator:
         def __init__(self):
             pass
@@ -228,6 +387,8 @@ class Boost_Multi_Index:
             raise StopIteration
         def next(self):
             return self.__next__()
+        def next_val_ptr(self):
+            raise StopIteration
 
     class na_iterator:
         def __init__(self, index_type):
@@ -267,7 +428,7 @@ class Boost_Multi_Index:
         def __iter__(self):
             return self
 
-        def __next__(self):
+        def next_val_ptr(self):
             if self.crt == self.last and self.saw_last:
                 raise StopIteration
             crt = self.crt
@@ -290,9 +451,12 @@ class Boost_Multi_Index:
                         if self.get_left_ptr(self.crt) == old_crt:
                             break
                 #message('next: ' + hex(self.crt))
+            return Boost_Multi_Index.get_val_ptr(crt, self.index_offset)
+
+        def __next__(self):
+            val_ptr = self.next_val_ptr()
             count = self.count
             self.count = self.count + 1
-            val_ptr = Boost_Multi_Index.get_val_ptr(crt, self.index_offset)
             return ('[%s]' % hex(int(val_ptr)),
                     str(parse_and_eval('*(' + str(self.elem_type) + '*)'
                                        + str(val_ptr))))
@@ -319,14 +483,17 @@ class Boost_Multi_Index:
         def __iter__(self):
             return self
 
-        def __next__(self):
+        def next_val_ptr(self):
             if self.crt == self.end:
                 raise StopIteration
             crt = self.crt
             self.crt = self.get_next_ptr(self.crt)
+            return Boost_Multi_Index.get_val_ptr(crt, self.index_offset)
+
+        def __next__(self):
+            val_ptr = self.next_val_ptr()
             count = self.count
             self.count = self.count + 1
-            val_ptr = Boost_Multi_Index.get_val_ptr(crt, self.index_offset)
             return ('[%s]' % hex(int(val_ptr)),
                     str(parse_and_eval('*(' + str(self.elem_type) + '*)'
                                        + str(val_ptr))))
@@ -334,6 +501,136 @@ class Boost_Multi_Index:
         def next(self):
             return self.__next__()
 
+    class val_ptr_iterator:
+        # iterate over the elements at the addresses produced by `val_ptrs`
+        def __init__(self, elem_type, val_ptrs):
+            self.elem_type = elem_type
+            self.val_ptrs = val_ptrs
+
+        def __iter__(self):
+            return self
+
+        def next_val_ptr(self):
+            return next(self.val_ptrs)
+
+        def __next__(self):
+            val_ptr = self.next_val_ptr()
+            return ('[%s]' % hex(int(val_ptr)),
+                    str(parse_and_eval('*(' + str(self.elem_type) + '*)'
+                                       + str(val_ptr))))
+
+        def next(self):
+            return self.__next__()
+
+    def hash_buckets(self):
+        if (self.index_type != 'boost::multi_index::hashed_unique'
+            and self.index_type != 'boost::multi_index::hashed_non_unique'):
+            return None
+        if self.index_size != 1:
+            # Boost >= 1.56: not the bucket layout of Hash_Buckets
+            return None
+        buckets = self.index_layer['buckets']
+        return Hash_Buckets(buckets['spc']['data_'], buckets['size_'],
+                            value_offset=self.index_offset)
+
+    def extra_blocks(self):
+        # the head node, and the arrays of all the hashed and random access
+        # indexes, whichever index is selected
+        ptr_size = gdb.lookup_type('void').pointer().sizeof
+        layout = self.value.layout
+        res = [('head node', self.node_size)]
+        for i, index in enumerate(layout.indexes):
+            if index.startswith('boost::multi_index::hashed_'):
+                arr = self.value.cast(layout.index_layers[i])['buckets']
+                name = 'index %d buckets' % i
+            elif index == 'boost::multi_index::random_access':
+                arr = self.value.cast(layout.index_layers[i])['ptrs']
+                name = 'index %d pointers' % i
+            else:
+                continue
+            try:
+                # allocated size of the auto_space
+                n = int(arr['spc']['n_'])
+            except gdb.error:
+                n = int(arr['size_']) + 1
+            res.append((name, n * ptr_size))
+        return res
+
+    def hashed_val_ptrs(self):
+        if self.index_size != 1:
+            for val_ptr in self.hashed_list_val_ptrs():
+                yield val_ptr
+            return
+        buckets = self.hash_buckets()
+        count = 0
+        for i, head in enumerate(buckets.heads()):
+            for node_ptr in buckets.chain(i, head, self.node_count - count + 1):
+                count += 1
+                if count > self.node_count:
+                    # not the bucket layout described above
+                    message('hashed index: bucket chains do not match node_count')
+                    return
+                yield buckets.value_addr(node_ptr)
+
+    def hashed_list_val_ptrs(self):
+        # Boost >= 1.56: follow after() from the first node to the head node
+        ptr_size = gdb.lookup_type('void').pointer().sizeof
+        prior = lambda x: read_pointers(x, 1)[0]
+        next_ = lambda x: read_pointers(x + ptr_size, 1)[0]
+        unique = self.index_type == 'boost::multi_index::hashed_unique'
+        end = self.head_index_ptr
+        x = prior(next_(end))
+        count = 0
+        while x != end:
+            count += 1
+            if count > self.node_count or x == 0:
+                message('hashed index: node list does not match node_count')
+                return
+            yield Boost_Multi_Index.get_val_ptr(x, self.index_offset)
+            n = next_(x)
+            np = prior(n)
+            if np == x:
+                x = n
+            elif unique or prior(np) == x:
+                # last of its bucket (or group), followed by a bucket node
+                x = np
+            elif next_(prior(np)) == x:
+                x = n
+            else:
+                x = prior(next_(n))
+
+    def random_access_val_ptrs(self):
+        ptrs = self.index_layer['ptrs']
+        size = int(ptrs['size_'])
+        for node_ptr in read_pointers(intptr(ptrs['spc']['data_']), size):
+            yield Boost_Multi_Index.get_val_ptr(node_ptr, self.index_offset)
+
+    def tail_addrs(self, k):
+        # sequenced: follow the prev links from the head node;
+        # random access: the end of the pointer array
+        k = min(k, self.node_count)
+        if self.index_type == 'boost::multi_index::sequenced':
+            res = list()
+            n = self.head_index_ptr
+            for i in xrange(k):
+                n = read_pointers(n, 1)[0]
+                res.append(Boost_Multi_Index.get_val_ptr(n, self.index_offset))
+            return list(reversed(res))
+        elif self.index_type == 'boost::multi_index::random_access':
+            ptr_size = gdb.lookup_type('void').pointer().sizeof
+            data = intptr(self.index_layer['ptrs']['spc']['data_'])
+            return [Boost_Multi_Index.get_val_ptr(n, self.index_offset)
+                    for n in read_pointers(data + (self.node_count - k) * ptr_size, k)]
+        return None
+
+    def elem_addr(self, i):
+        if self.index_type != 'boost::multi_index::random_access':
+            return None
+        ptr_size = gdb.lookup_type('void').pointer().sizeof
+        data = intptr(self.index_layer['ptrs']['spc']['data_'])
+        return Boost_Multi_Index.get_val_ptr(read_pointers(data + i * ptr_size, 1)[0],
+                                             self.index_offset)
+
     def children(self):
         if self.empty_cont():
             return self.empty_iterator()
@@ -350,8 +647,35 @@ class Boost_Multi_Index:
                 self.index_offset,
                 self.sequenced_iterator.get_next_ptr(self.head_index_ptr),
                 self.head_index_ptr)
+        elif (self.index_type == 'boost::multi_index::hashed_unique'
+              or self.index_type == 'boost::multi_index::hashed_non_unique'):
+            return self.val_ptr_iterator(self.elem_type, self.hashed_val_ptrs())
+        elif self.index_type == 'boost::multi_index::random_access':
+            return self.val_ptr_iterator(self.elem_type, self.random_access_val_ptrs())
         return self.na_iterator(self.index_type)
 
+    def search_tree(self):
+        if (self.index_type != 'boost::multi_index::ordered_unique'
+            and self.index_type != 'boost::multi_index::ordered_non_unique'):
+            return None
+        # the parent of the head node is the root
+        ptr_size = gdb.lookup_type('void').pointer().sizeof
+        tree = Ordered_Tree(0, [0, ptr_size, 2 * ptr_size], ~intptr(1), self.index_offset)
+        if not self.empty_cont():
+            tree.root = tree.parent(self.head_index_ptr)
+        return tree
+
+    def elem_addrs(self):
+        it = self.children()
+        if not hasattr(it, 'next_val_ptr'):
+            message('elem_addrs: index not supported: ' + self.index_type)
+            raise gdb.error
+        while True:
+            try:
+                yield intptr(it.next_val_ptr())
+            except StopIteration:
+                return
+
     def to_string(self):
         if self.empty_cont():
             return 'empty %s' % self.type_name
@@ -33,12 +33,13 @@
 # Inspired _but not copied_ from libstdc++'s pretty printers
 #
 
-import datetime
 import gdb
 import re
+import struct
 import sys
 
 from boost import *
+from boost import rawdata
 
 
 ###
@@ -56,41 +57,78 @@ from boost import *
 ###     (Either supports() or template_name is required.)
 ### - '__init__' : Its only argument is a GDB_Value_Wrapper.
 ###
+### Container printers can also provide the following, which are used by the
+### commands that work on raw container memory (e.g. boost-capture):
+###
+### - 'elem_type' : gdb.Type of the container elements.
+### - 'elem_addrs()' : Generator of the element addresses (as integers), in
+###     printing order, without reading the elements themselves.
+### - 'segments()' : Only for containers storing their elements contiguously.
+###     List of (address, count) pairs covering the elements in order.
+### - 'contiguous_range()' : Same, as a Contiguous_Range (see utils.py), which
+###     reads and decodes the elements in chunks; printers of contiguous
+###     containers build their children and segments from it.
+### - 'elem_count()' : Number of elements, if known without a traversal.
+###     Not needed if 'segments()' exists.
+### - 'node_size' : Bytes allocated by the container per element, if different
+###     from the element size (e.g. the nodes of node-based containers).
+###
 
 @add_printer
-class BoostIteratorRange:
-    "Pretty Printer for boost::iterator_range (Boost.Range)"
-    printer_name = 'boost::iterator_range'
+class BoostCharRange:
+    "Pretty Printer for boost::iterator_range of characters (Boost.Range)"
+    printer_name = 'boost::iterator_range_string'
     version = '1.40'
     template_name = 'boost::iterator_range'
 
-    class _iterator:
-        def __init__(self, begin, end):
-            self.item = begin
-            self.end = end
-            self.count = 0
+    @classmethod
+    def supports(self_type, v):
+        t = v['m_Begin'].type.strip_typedefs()
+        return t.code == gdb.TYPE_CODE_PTR and is_char_type(t.target())
 
-        def __iter__(self):
-            return self
+    def __init__(self, value):
+        self.typename = value.type_name
+        self.value = value
 
-        def __next__(self):
-            if self.item == self.end:
-                raise StopIteration
-            count = self.count
-            self.count = self.count + 1
-            elem = self.item.dereference()
-            self.item = self.item + 1
-            return ('[%d]' % count, elem)
+    def to_string(self):
+        begin = self.value['m_Begin']
+        end = self.value['m_End']
+        return string_repr(begin, int(end - begin), begin.type.strip_typedefs().target())
 
-        def next(self):
-            return self.__next__()
+    def display_hint(self):
+        return 'string'
+
+@add_printer
+class BoostIteratorRange:
+    "Pretty Printer for boost::iterator_range (Boost.Range)"
+    printer_name = 'boost::iterator_range'
+    version = '1.40'
+    template_name = 'boost::iterator_range'
+
+    # the range only refers to the elements
+    owns_elements = False
 
     def __init__(self, value):
         self.typename = value.type_name
         self.value = value
+        self.elem_type = self.value['m_Begin'].type.strip_typedefs().target()
+
+    def contiguous_range(self):
+        begin = self.value['m_Begin']
+        end = self.value['m_End']
+        return Contiguous_Range.from_pointer(begin, int(end - begin))
+
+    def segments(self):
+        return self.contiguous_range().segments
+
+    def elem_addrs(self):
+        return self.contiguous_range().addrs()
 
     def children(self):
-        return self._iterator(self.value['m_Begin'], self.value['m_End'])
+        return self.contiguous_range().children()
+
+    def display_children(self):
+        return self.contiguous_range().display_children()
 
     def to_string(self):
         begin = self.value['m_Begin']
@@ -108,14 +146,43 @@ class BoostOptional:
     template_name = 'boost::optional'
     regex = re.compile('^boost::optional<(.*)>$')
 
+    #
+    # Cache of resolved optional types.
+    #
+    # key: str
+    #   Optional type name.
+    # value: (gdb.Type, int)
+    #   Value type (None if it cannot be found), and offset of the value
+    #   storage (None if unknown).
+    #
+    type_cache = dict()
+
     def __init__(self, value):
         self.typename = value.type_name
         self.value = value
 
+    @classmethod
+    def resolve(cls, value):
+        if value.type_name not in cls.type_cache:
+            args = template_arguments(value.basic_type)
+            t = None
+            if args:
+                t = args[0]
+            else:
+                match = cls.regex.search(value.type_name)
+                if match:
+                    try:
+                        t = lookup_type(match.group(1))
+                    except:
+                        pass
+            offset = field_offset(value.basic_type, 'm_storage.dummy_.data')
+            cls.type_cache[value.type_name] = (t, offset)
+        return cls.type_cache[value.type_name]
+
     class _iterator:
         def __init__(self, member, empty):
             self.member = member
-            self.done = empty
+            self.done = empty or member == None
 
         def __iter__(self):
             return self
@@ -124,7 +191,7 @@ class BoostOptional:
             if(self.done):
                 raise StopIteration
             self.done = True
-            return ('value', self.member.dereference())
+            return ('value', self.member)
 
         def next(self):
             return self.__next__()
@@ -133,15 +200,14 @@ class BoostOptional:
         initialized = self.value['m_initialized']
         if(not initialized):
             return self._iterator('', True)
+        t, offset = self.resolve(self.value)
+        if t == None:
+            return self._iterator('', True)
+        if offset != None:
+            member = value_at_offset(self.value, offset, t)
         else:
-            match = BoostOptional.regex.search(self.typename)
-            if match:
-                try:
-                    membertype = lookup_type(match.group(1)).pointer()
-                    member = self.value['m_storage']['dummy_']['data'].address.cast(membertype)
-                    return self._iterator(member, False)
-                except:
-                    return self._iterator('', True)
+            member = self.value['m_storage']['dummy_']['data'].address.cast(t.pointer()).dereference()
+        return self._iterator(member, False)
 
     def to_string(self):
         initialized = self.value['m_initialized']
@@ -176,13 +242,7 @@ class BoostTribool:
         self.value = value
 
     def to_string(self):
-        state = self.value['value']
-        s = 'indeterminate'
-        if(state == 0):
-            s = 'false'
-        elif(state == 1):
-            s = 'true'
-        return '(%s) %s' % (self.typename, s)
+        return '(%s) %s' % (self.typename, rawdata.format_tribool(int(self.value['value'])))
 
 @add_printer
 class BoostScopedPtr:
@@ -228,49 +288,30 @@ class BoostCircular:
     version = '1.40'
     template_name = 'boost::circular_buffer'
 
-    class _iterator:
-        def __init__(self, first, last, buff, end, size):
-            self.item = first # virtual beginning of the circular buffer
-            self.last = last  # virtual end of the circular buffer (one behind the last element).
-            self.buff = buff  # internal buffer used for storing elements in the circular buffer
-            self.end = end    # internal buffer's end (end of the storage space).
-            self.size = size
-            self.capa = int(end-buff)
-            self.count = 0
+    def __init__(self, value):
+        self.typename = value.type_name
+        self.value = value
+        self.elem_type = self.value['m_buff'].type.strip_typedefs().target()
 
-        def __iter__(self):
-            return self
+    def contiguous_range(self):
+        # the elements wrap around the end of the internal buffer
+        return Contiguous_Range.from_ring(self.value['m_buff'], self.value['m_end'],
+                                          self.value['m_first'], self.value['m_size'])
 
-        def __next__(self):
-            if self.count == self.size:
-                raise StopIteration
-            count = self.count
-            crt=self.buff + (count + self.item - self.buff) % self.capa
-            elem = crt.dereference()
-            self.count = self.count + 1
-            return ('[%d]' % count, elem)
-            #
-            # dead code
-            #
-            if self.item == self.last:
-                raise StopIteration
-            count = self.count
-            self.count = self.count + 1
-            elem = self.item.dereference()
-            self.item = self.item + 1
-            if self.item == self.end:
-                self.item == self.buff
-            return ('[%d]' % count, elem)
+    def segments(self):
+        return self.contiguous_range().segments
 
-        def next(self):
-            return self.__next__()
+    def elem_addrs(self):
+        return self.contiguous_range().addrs()
 
-    def __init__(self, value):
-        self.typename = value.type_name
-        self.value = value
+    def capacity(self):
+        return int(self.value['m_end'] - self.value['m_buff'])
 
     def children(self):
-        return self._iterator(self.value['m_first'], self.value['m_last'], self.value['m_buff'], self.value['m_end'], self.value['m_size'])
+        return self.contiguous_range().children()
+
+    def display_children(self):
+        return self.contiguous_range().display_children()
 
     def to_string(self):
         first = self.value['m_first']
@@ -293,9 +334,36 @@ class BoostArray:
     def __init__(self, value):
         self.typename = value.type_name
         self.value = value
+        self.elem_type = self.value['elems'].type.strip_typedefs().target()
+
+    def contiguous_range(self):
+        elems = self.value['elems']
+        if elems.address == None:
+            return Contiguous_Range([], self.elem_type)
+        return Contiguous_Range([(elems.address, elems.type.sizeof // self.elem_type.sizeof)],
+                                self.elem_type)
+
+    def segments(self):
+        return self.contiguous_range().segments
+
+    def elem_addrs(self):
+        return self.contiguous_range().addrs()
+
+    def children(self):
+        elems = self.value['elems']
+        if elems.address == None:
+            # not in inferior memory
+            return (('[%d]' % i, elems[i])
+                    for i in xrange(elems.type.sizeof // self.elem_type.sizeof))
+        return self.contiguous_range().children()
+
+    def display_children(self):
+        if self.value['elems'].address == None:
+            return self.children()
+        return self.contiguous_range().display_children()
 
     def to_string(self):
-        return self.value['elems']
+        return None
 
     def display_hint(self):
         return 'array'
@@ -308,24 +376,75 @@ class BoostVariant:
     template_name = 'boost::variant'
     regex = re.compile('^boost::variant<(.*)>$')
 
+    #
+    # Cache of resolved variant types.
+    #
+    # key: str
+    #   Variant type name.
+    # value: (list, int)
+    #   Alternative types (as gdb.Type, or as names if they cannot be looked
+    #   up), and offset of the storage buffer (None if unknown).
+    #
+    type_cache = dict()
+
     def __init__(self, value):
         self.typename = value.type_name
         self.value = value
 
+    @classmethod
+    def parse_types(cls, type_name):
+        "Alternative types parsed from the variant type name."
+        m = cls.regex.search(type_name)
+        types = list()
+        if not m:
+            return types
+        for s in re.split(r', (?=(?:<[^>]*?(?: [^>]*)*))|, (?=[^>,]+(?:,|$))', m.group(1)):
+            try:
+                types.append(lookup_type(s.strip()))
+            except:
+                types.append(s.strip())
+        return types
+
+    @classmethod
+    def resolve(cls, value):
+        if value.type_name not in cls.type_cache:
+            types = template_arguments(value.basic_type) or []
+            # gdb drops variadic parameter packs (boost::variant<A, B, C> in
+            # C++11 has the arguments [A]), or gives none without debug info
+            # on them: fall back on parsing the type name when it names more
+            # alternatives
+            parsed = cls.parse_types(value.type_name)
+            if len(parsed) > len(types):
+                types = parsed
+            offset = field_offset(value.basic_type, 'storage_.data_.buf')
+            cls.type_cache[value.type_name] = (types, offset)
+        return cls.type_cache[value.type_name]
+
     def to_string(self):
-        m = BoostVariant.regex.search(self.typename)
-        types = [s.strip() for s in re.split(r', (?=(?:<[^>]*?(?: [^>]*)*))|, (?=[^>,]+(?:,|$))', m.group(1))]
-        which = intptr(self.value['which_'])
-        type = types[which]
-        data = ''
-        try:
-            ptrtype = lookup_type(type).pointer()
-            data = self.value['storage_']['data_']['buf'].address.cast(ptrtype)
-        except:
-            data = self.value['storage_']['data_']['buf']
+        types, offset = self.resolve(self.value)
+        which = int(self.value['which_'])
+        # a negative which_ means the storage holds a backup_holder, i.e. a
+        # pointer to a heap copy of alternative -which_-1
+        index = which if which >= 0 else -which - 1
+        if index >= len(types):
+            return '(boost::variant<...>) which (%d) = <unknown type> value = %s' % (
+                which, self.value['storage_']['data_']['buf'])
+        type = types[index]
+        if not isinstance(type, gdb.Type):
+            return '(boost::variant<...>) which (%d) = %s value = %s' % (
+                which, type, self.value['storage_']['data_']['buf'])
+        ptrtype = type.pointer() if which >= 0 else type.pointer().pointer()
+        if offset != None:
+            data = value_at_offset(self.value, offset, ptrtype.target())
+        else:
+            data = self.value['storage_']['data_']['buf'].address.cast(ptrtype).dereference()
+        if data == None:
+            return '(boost::variant<...>) which (%d) = %s value = <unavailable>' % (which, type)
+        if which < 0:
+            data = data.dereference()
         return '(boost::variant<...>) which (%d) = %s value = %s' % (which,
                                                                      type,
-                                                                     data.dereference())
+                                                                     data)
 
 @add_printer
 class BoostUuid:
@@ -339,9 +458,102 @@ class BoostUuid:
         self.value = value
 
     def to_string(self):
-        u = (self.value['data'][i] for i in xrange(16))
-        s = 'xxxx-xx-xx-xx-xxxxxx'.replace('x', '%02x') % tuple(u)
-        return '(%s) %s' % (self.typename, s)
+        data = self.value['data']
+        if data.address != None:
+            u = read_memory(data.address, 16)
+        else:
+            u = [int(data[i]) for i in xrange(16)]
+        return '(%s) %s' % (self.typename, rawdata.format_uuid(u))
+
+@add_printer
+class BoostStringRef:
+    "Pretty Printer for boost::string_ref and boost::string_view (Boost.Utility)"
+    printer_name = 'boost::string_ref'
+    version = '1.53'
+    template_name = ['boost::basic_string_ref', 'boost::basic_string_view']
+
+    def __init__(self, value):
+        self.typename = value.type_name
+        self.value = value
+
+    def to_string(self):
+        ptr = self.value['ptr_']
+        return string_repr(ptr, self.value['len_'], ptr.type.strip_typedefs().target())
+
+    def display_hint(self):
+        return 'string'
+
+@add_printer
+class BoostContainerString:
+    "Pretty Printer for boost::container::basic_string (Boost.Container)"
+    printer_name = 'boost::container::basic_string'
+    version = '1.55'
+    template_name = 'boost::container::basic_string'
+
+    #
+    # Cache of resolved string layouts.
+    #
+    # key: str
+    #   String type name.
+    # value: (str, int, gdb.Type)
+    #   Name of the short representation member of m_repr, offset of the
+    #   short characters in m_repr, and type of the long representation
+    #   (None if it cannot be looked up).
+    #
+    type_cache = dict()
+
+    def __init__(self, value):
+        self.typename = value.type_name
+        self.value = value
+        self.char_type = self.value.type.strip_typedefs().template_argument(0)
+
+    @classmethod
+    def resolve(cls, value, repr):
+        if value.type_name not in cls.type_cache:
+            # m_repr is a union of the short representation (a header with
+            # the is_short bit and the length, then the characters) and of
+            # raw storage for the long one (is_short, length, capacity, and
+            # pointer to the characters)
+            short = 's_aligner' if field_offset(repr.type, 's_aligner') != None else 's'
+            offset = field_offset(repr.type, short + '.data')
+            try:
+                long_type = lookup_type(str(value.basic_type) + '::long_t')
+            except gdb.error:
+                long_type = None
+            cls.type_cache[value.type_name] = (short, offset, long_type)
+        return cls.type_cache[value.type_name]
+
+    def to_string(self):
+        repr = self.value['members_']['m_repr']
+        short, offset, long_type = self.resolve(self.value, repr)
+        header = repr[short]['h']
+        if int(header['is_short']):
+            length = int(header['length'])
+            if repr.address != None:
+                return string_repr(intptr(repr.address) + offset, length, self.char_type)
+            buf = value_bytes(repr)
+            if buf == None:
+                return '<unavailable>'
+            size = self.char_type.sizeof
+            return decode_string(buf[offset:offset + length * size], self.char_type)
+        if long_type != None:
+            lrepr = value_at_offset(repr, 0, long_type)
+            if lrepr == None:
+                return '<unavailable>'
+            return string_repr(lrepr['start'], int(lrepr['length']), self.char_type)
+        # long_t cannot be looked up: size_type has the size of a pointer,
+        # the length follows the is_short bit
+        buf = value_bytes(repr)
+        if buf == None:
+            return '<unavailable>'
+        word = self.char_type.pointer().sizeof
+        fmt = '<' + {4: 'I', 8: 'Q'}[word]
+        length = struct.unpack_from(fmt, buf)[0] >> 1
+        start = struct.unpack_from(fmt, buf, 2 * word)[0]
+        return string_repr(start, length, self.char_type)
+
+    def display_hint(self):
+        return 'string'
 
 ##################################################
 # boost::container::flat_set                     #
@@ -354,30 +566,22 @@ class BoostContainerFlatSet:
     version = '1.52'
     template_name = 'boost::container::flat_set'
 
-    class Iterator:
-        def __init__(self, pointer, size):
-            self.pointer = pointer
-            self.size = size
-            self.count = 0
-
-        def __iter__(self):
-            return self
-
-        def __next__(self):
-            if self.count == self.size:
-                raise StopIteration
-            count = self.count
-            elt = self.pointer.dereference()
-            self.pointer = self.pointer + 1
-            self.count = self.count + 1
-            return ('[%d]' % count, elt)
-
-        def next(self):
-            return self.__next__()
-
     def __init__(self, value):
         self.val = value
         self.element_type = self.val.type.strip_typedefs().template_argument(0)
+        self.elem_type = self.get_pointer().type.strip_typedefs().target()
+        # sorted by the element itself, in a known order with std::less
+        compare_t = self.val.type.strip_typedefs().template_argument(1)
+        self.key_fields = [] if is_default_compare(compare_t, self.element_type) else None
+
+    def contiguous_range(self):
+        return Contiguous_Range.from_pointer(self.get_pointer(), int(self.get_size()))
+
+    def segments(self):
+        return self.contiguous_range().segments
+
+    def elem_addrs(self):
+        return self.contiguous_range().addrs()
 
     def get_pointer(self):
         return self.val["m_flat_tree"]["m_data"]["m_vect"]["members_"]["m_start"]
@@ -388,6 +592,9 @@ class BoostContainerFlatSet:
     def get_capacity(self):
         return self.val["m_flat_tree"]["m_data"]["m_vect"]["members_"]["m_capacity"]
 
+    def capacity(self):
+        return int(self.get_capacity())
+
     def has_elements(self):
         if self.get_pointer():
             return True
@@ -402,7 +609,10 @@ class BoostContainerFlatSet:
             return "empty boost::container::flat_set<%s>" % (self.element_type)
 
     def children (self):
-        return self.Iterator(self.get_pointer(), self.get_size())
+        return self.contiguous_range().children()
+
+    def display_children(self):
+        return self.contiguous_range().display_children()
 
     def display_hint(self):
         return 'array'
@@ -418,36 +628,23 @@ class BoostContainerFlatMap:
     version = '1.52'
     template_name = 'boost::container::flat_map'
 
-    class Iterator:
-        def __init__(self, pointer, size):
-            self.pointer = pointer
-            self.size = size
-            self.count = 0
-
-        def __iter__(self):
-            return self
-
-        def __next__(self):
-            if self.count == self.size * 2:
-                raise StopIteration
-
-            if self.count % 2 == 0:
-                item = self.pointer.dereference()["first"]
-            else:
-                item = self.pointer.dereference()["second"]
-                self.pointer = self.pointer + 1
-
-            count = self.count
-            self.count = self.count + 1
-            return ('[%d]' % count, item)
-
-        def next(self):
-            return self.__next__()
-
     def __init__(self, value):
         self.val = value
         self.key_type = self.val.type.strip_typedefs().template_argument(0)
         self.value_type = self.val.type.strip_typedefs().template_argument(1)
+        self.elem_type = self.get_pointer().type.strip_typedefs().target()
+        # sorted by the key of each pair, in a known order with std::less
+        compare_t = self.val.type.strip_typedefs().template_argument(2)
+        self.key_fields = ['first'] if is_default_compare(compare_t, self.key_type) else None
+
+    def contiguous_range(self):
+        return Contiguous_Range.from_pointer(self.get_pointer(), int(self.get_size()))
+
+    def segments(self):
+        return self.contiguous_range().segments
+
+    def elem_addrs(self):
+        return self.contiguous_range().addrs()
 
     def get_pointer(self):
         return self.val["m_flat_tree"]["m_data"]["m_vect"]["members_"]["m_start"]
@@ -458,6 +655,9 @@ class BoostContainerFlatMap:
     def get_capacity(self):
         return self.val["m_flat_tree"]["m_data"]["m_vect"]["members_"]["m_capacity"]
 
+    def capacity(self):
+        return int(self.get_capacity())
+
     def has_elements(self):
         if self.get_pointer():
             return True
@@ -473,7 +673,7 @@ class BoostContainerFlatMap:
                 self.key_type, self.value_type)
 
     def children (self):
-        return self.Iterator(self.get_pointer(), self.get_size())
+        return self.contiguous_range().children(['first', 'second'])
 
     def display_hint(self):
         return 'map'
@@ -509,20 +709,7 @@ class BoostGregorianDate:
 
     def to_string(self):
         n = int(self.value['days_'])
-        # Check for uninitialized case
-        if n==2**32-2:
-            return '(%s) uninitialized' % self.typename
-        # Convert date number to year-month-day
-        a = n + 32044
-        b = (4*a + 3) / 146097
-        c = a - (146097*b)/4
-        d = (4*c + 3)/1461
-        e = c - (1461*d)/4
-        m = (5*e + 2)/153
-        day = e + 1 - (153*m + 2)/5
-        month = m + 3 - 12*(m/10)
-        year = 100*b + d - 4800 + (m/10)
-        return '(%s) %4d-%02d-%02d' % (self.typename, year,month,day)
+        return '(%s) %s' % (self.typename, rawdata.format_gregorian_date(n))
 
 @add_printer
 class BoostPosixTimePTime:
@@ -537,16 +724,4 @@ class BoostPosixTimePTime:
 
     def to_string(self):
         n = int(self.value['time_']['time_count_']['value_'])
-        # Check for uninitialized case
-        if n==2**63-2:
-            return '(%s) uninitialized' % self.typename
-        # Check for boost::posix_time::pos_infin case
-        if n==2**63-1:
-            return '(%s) positive infinity' % self.typename
-        # Check for boost::posix_time::neg_infin case
-        if n==-2**63:
-            return '(%s) negative infinity' % self.typename
-        # Subtract the unix epoch from the timestamp and convert the resulting timestamp into something human readable
-        unix_epoch_time = (n-210866803200000000)/1000000.0
-        time_string = datetime.datetime.fromtimestamp(unix_epoch_time).strftime('%Y-%b-%d %H:%M:%S.%f')
-        return '(%s) %s' % (self.typename, time_string)
+        return '(%s) %s' % (self.typename, rawdata.format_ptime(n))
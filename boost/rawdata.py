@@ -0,0 +1,649 @@
+#
+# rawdata.py
+#
+# Decoding and formatting of raw element bytes, given a type layout
+# (see layout.py).
+#
+# NOTE: This module does not use the gdb API, so that it can run in worker
+# processes, or outside of gdb altogether. Values are formatted the way gdb
+# would print them, assuming a little endian target.
+#
+# Arrays of arithmetic values are decoded in bulk, with numpy if available,
+# otherwise with the array module.
+#
+
+import array
+import collections
+import datetime
+import multiprocessing
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_int_formats = {1: 'b', 2: 'h', 4: 'i', 8: 'q'}
+_float_formats = {4: 'f', 8: 'd'}
+_float_precision = {4: 9, 8: 17}
+
+_char_escapes = {7: '\\a', 8: '\\b', 9: '\\t', 10: '\\n', 11: '\\v', 12: '\\f', 13: '\\r',
+                 39: "\\'", 92: '\\\\'}
+
+def decode_int(buf, offset, size, signed):
+    """
+    Decode an integer of `size` bytes at `offset` in `buf`.
+    """
+    if size in _int_formats:
+        fmt = '<' + (_int_formats[size] if signed else _int_formats[size].upper())
+        return struct.unpack_from(fmt, buf, offset)[0]
+    res = 0
+    for i in range(size - 1, -1, -1):
+        res = (res << 8) | bytearray(buf[offset + i:offset + i + 1])[0]
+    if signed and res >= 1 << (8 * size - 1):
+        res -= 1 << (8 * size)
+    return res
+
+def decode_bits(buf, offset, bitpos, bitsize, signed):
+    """
+    Decode a bitfield starting `bitpos` bits after `offset` in `buf`.
+    """
+    start = offset + bitpos // 8
+    nbytes = (bitpos % 8 + bitsize + 7) // 8
+    res = (decode_int(buf, start, nbytes, False) >> (bitpos % 8)) & ((1 << bitsize) - 1)
+    if signed and res >= 1 << (bitsize - 1):
+        res -= 1 << bitsize
+    return res
+
+def is_arithmetic(layout):
+    """
+    Check if the layout is that of an arithmetic type that can be decoded in
+    bulk. Characters and enums are excluded, as they are not printed as numbers.
+    """
+    kind = layout['kind']
+    if kind == 'int':
+        return layout['size'] in _int_formats
+    if kind == 'bool':
+        return layout['size'] == 1
+    if kind == 'float':
+        return layout['size'] in _float_formats
+    return False
+
+def scalar_dtype(layout):
+    """
+    numpy dtype string of an arithmetic layout.
+    """
+    assert is_arithmetic(layout)
+    kind = layout['kind']
+    if kind == 'bool':
+        return '?'
+    if kind == 'float':
+        return '<f%d' % layout['size']
+    return '<%s%d' % ('i' if layout['signed'] else 'u', layout['size'])
+
+def _array_typecode(layout):
+    if layout['kind'] == 'float':
+        codes = 'fd'
+    elif layout['kind'] == 'int' and layout['signed']:
+        codes = 'bhilq'
+    else:
+        codes = 'BHILQ'
+    for c in codes:
+        try:
+            if array.array(c).itemsize == layout['size']:
+                return c
+        except ValueError:
+            # 'q' and 'Q' are missing in python2
+            pass
+    return None
+
+def decode_column(layout, buf, count, offset=0, stride=None):
+    """
+    Decode `count` arithmetic values of the given layout, the first one at
+    `offset` in `buf`, and the following ones every `stride` bytes (default:
+    the value size). Returns a list of python values.
+    """
+    size = layout['size']
+    if stride == None:
+        stride = size
+    if count == 0:
+        return list()
+    if numpy != None:
+        a = numpy.ndarray(shape=(count,), dtype=scalar_dtype(layout), buffer=buf,
+                          offset=offset, strides=(stride,))
+        return a.tolist()
+    if stride == size:
+        tc = _array_typecode(layout)
+        if tc != None:
+            a = array.array(tc)
+            a.frombytes(buf[offset:offset + count * size]) if hasattr(a, 'frombytes') \
+                else a.fromstring(buf[offset:offset + count * size])
+            if layout['kind'] == 'bool':
+                return [bool(v) for v in a]
+            return a.tolist()
+    if layout['kind'] == 'float':
+        fmt = '<' + _float_formats[size]
+    elif layout['kind'] == 'bool':
+        fmt = '<?'
+    else:
+        fmt = '<' + (_int_formats[size] if layout['signed'] else _int_formats[size].upper())
+    return [struct.unpack_from(fmt, buf, offset + i * stride)[0] for i in range(count)]
+
+def layout_descr(layout):
+    """
+    Describe the numpy dtype of the given layout, as a JSON-able object:
+    - a dtype string, for scalars (pointers are unsigned integers);
+    - a list [elem descr, [count]], for fixed size arrays;
+    - a dict with keys 'names', 'formats' (descrs), 'offsets' and 'itemsize',
+      for structs; base classes are fields named after their type.
+
+    Struct fields that cannot be described (bitfields, unions, long double, ...)
+    are left out; the offsets and itemsize still give the exact padding.
+    Returns None if the layout cannot be described at all.
+    """
+    kind = layout['kind']
+    size = layout['size']
+    if kind in ['int', 'char', 'enum']:
+        if size not in _int_formats:
+            return None
+        return '<%s%d' % ('i' if layout['signed'] else 'u', size)
+    if kind == 'bool':
+        return '?' if size == 1 else '<u%d' % size
+    if kind == 'float':
+        return '<f%d' % size if size in _float_formats else None
+    if kind == 'pointer':
+        return '<u%d' % size
+    if kind == 'array':
+        elem = layout_descr(layout['elem'])
+        if elem == None:
+            return None
+        return [elem, [layout['count']]]
+    if kind == 'struct':
+        res = {'names': [], 'formats': [], 'offsets': [], 'itemsize': size}
+        for f in layout['fields']:
+            if 'offset' not in f or not f['name'] or f['name'] in res['names']:
+                continue
+            d = layout_descr(f['layout'])
+            if d == None:
+                continue
+            res['names'].append(f['name'])
+            res['formats'].append(d)
+            res['offsets'].append(f['offset'])
+        if len(res['names']) == 0:
+            return None
+        return res
+    return None
+
+def descr_dtype(descr):
+    """
+    Build the numpy dtype described by `descr` (see layout_descr).
+    """
+    if isinstance(descr, dict):
+        return numpy.dtype({'names': descr['names'],
+                            'formats': [descr_dtype(f) for f in descr['formats']],
+                            'offsets': descr['offsets'],
+                            'itemsize': descr['itemsize']})
+    if isinstance(descr, list):
+        if len(descr) == 2 and isinstance(descr[1], list) \
+           and all([isinstance(n, int) for n in descr[1]]):
+            return numpy.dtype((descr_dtype(descr[0]), tuple(descr[1])))
+        # numpy's own list of (name, format) pairs
+        return numpy.dtype([tuple(d) for d in descr])
+    return numpy.dtype(str(descr))
+
+def layout_dtype(layout):
+    """
+    numpy structured dtype of the given layout, or None if numpy is not
+    available or the layout cannot be described.
+    """
+    if numpy == None:
+        return None
+    descr = layout_descr(layout)
+    if descr == None:
+        return None
+    return descr_dtype(descr)
+
+def run_lengths(buf, size):
+    """
+    Split `buf`, holding consecutive elements of `size` bytes, in runs of
+    elements with identical bytes. Returns a list of (first element, count)
+    pairs. With numpy, the elements are compared all at once.
+    """
+    k = len(buf) // size
+    if k == 0:
+        return list()
+    if numpy != None:
+        a = numpy.frombuffer(buf, dtype=numpy.uint8, count=k * size).reshape(k, size)
+        starts = [0] + (numpy.nonzero((a[1:] != a[:-1]).any(axis=1))[0] + 1).tolist()
+    else:
+        starts = [0] + [j for j in range(1, k)
+                        if buf[j * size:(j + 1) * size] != buf[(j - 1) * size:j * size]]
+    return [(j, end - j) for j, end in zip(starts, starts[1:] + [k])]
+
+def format_float(size, v):
+    """
+    Format a float of `size` bytes with the precision used by gdb.
+    """
+    return '%.*g' % (_float_precision[size], v)
+
+#
+# Formatting of Boost types from raw values.
+#
+# These are shared by the printers in printers.py and the raw formatters
+# below. Each function returns the text printed after the type name.
+#
+def format_gregorian_date(n):
+    """
+    Format boost::gregorian::date, given its day number.
+    """
+    # Check for uninitialized case
+    if n == 2**32 - 2:
+        return 'uninitialized'
+    # Convert date number to year-month-day
+    a = n + 32044
+    b = (4*a + 3) // 146097
+    c = a - (146097*b) // 4
+    d = (4*c + 3) // 1461
+    e = c - (1461*d) // 4
+    m = (5*e + 2) // 153
+    day = e + 1 - (153*m + 2) // 5
+    month = m + 3 - 12*(m // 10)
+    year = 100*b + d - 4800 + (m // 10)
+    return '%4d-%02d-%02d' % (year, month, day)
+
+def format_ptime(n):
+    """
+    Format boost::posix_time::ptime, given its tick count (microseconds).
+    """
+    # Check for uninitialized case
+    if n == 2**63 - 2:
+        return 'uninitialized'
+    # Check for boost::posix_time::pos_infin case
+    if n == 2**63 - 1:
+        return 'positive infinity'
+    # Check for boost::posix_time::neg_infin case
+    if n == -2**63:
+        return 'negative infinity'
+    # Subtract the unix epoch from the timestamp and convert the resulting timestamp into something human readable
+    unix_epoch_time = (n - 210866803200000000) / 1000000.0
+    return datetime.datetime.fromtimestamp(unix_epoch_time).strftime('%Y-%b-%d %H:%M:%S.%f')
+
+def format_uuid(data):
+    """
+    Format boost::uuids::uuid, given its 16 bytes.
+    """
+    return 'xxxx-xx-xx-xx-xxxxxx'.replace('x', '%02x') % tuple(bytearray(data))
+
+def format_tribool(state):
+    """
+    Format boost::logic::tribool, given its state.
+    """
+    if state == 0:
+        return 'false'
+    elif state == 1:
+        return 'true'
+    return 'indeterminate'
+
+#
+# Raw formatters
+#
+# key: str
+#   Type name or template name, stripped of typedefs.
+# value: (str, function)
+#   Dotted path of the field holding the state of the object, and function
+#   formatting the value of that field: an integer for integral fields, bytes
+#   for arrays.
+#
+# Values of these types are formatted as "(<type name>) <text>", as the
+# printers do, from raw element bytes alone: containers of such elements are
+# printed without building one gdb.Value per element.
+#
+raw_formatters = dict()
+raw_formatters['boost::gregorian::date'] = ('days_', format_gregorian_date)
+raw_formatters['boost::posix_time::ptime'] = ('time_.time_count_.value_', format_ptime)
+raw_formatters['boost::uuids::uuid'] = ('data', format_uuid)
+raw_formatters['boost::logic::tribool'] = ('value', format_tribool)
+
+_raw_formatter_cache = dict()
+
+def raw_formatter(layout):
+    """
+    Return a function formatting values of the given layout from raw bytes,
+    with arguments (`buf`, `offset`), or None if there is no raw formatter.
+    """
+    if layout['kind'] != 'struct':
+        return None
+    name = layout['name']
+    if name not in _raw_formatter_cache:
+        _raw_formatter_cache[name] = _make_raw_formatter(layout)
+    return _raw_formatter_cache[name]
+
+def _make_raw_formatter(layout):
+    name = layout['name']
+    key = name if name in raw_formatters else name.split('<')[0]
+    if key not in raw_formatters:
+        return None
+    path, f = raw_formatters[key]
+    fl = field_layout(layout, path)
+    if fl == None:
+        return None
+    foff, l = fl
+    prefix = '(' + name + ') '
+    if l['kind'] == 'array':
+        size = l['size']
+        return lambda buf, offset: prefix + f(buf[offset + foff:offset + foff + size])
+    if l['kind'] in ['int', 'char', 'enum', 'bool']:
+        size = l['size']
+        signed = l.get('signed', False)
+        return lambda buf, offset: prefix + f(decode_int(buf, offset + foff, size, signed))
+    return None
+
+def column_values(layout, buf, count, offset=0, stride=None):
+    """
+    Decode `count` values of the given layout, like decode_column, for use as
+    printer children: arithmetic values are returned as python numbers (to be
+    cast to their gdb.Type, so that gdb formats them), types with a raw
+    formatter as the strings gdb would print. Returns None if the layout
+    cannot be decoded in bulk.
+    """
+    if stride == None:
+        stride = layout['size']
+    if is_arithmetic(layout):
+        return decode_column(layout, buf, count, offset, stride)
+    f = raw_formatter(layout)
+    if f == None:
+        return None
+    return [f(buf, offset + i * stride) for i in range(count)]
+
+def can_format(layout, printed=False):
+    """
+    Check if values of this layout can be formatted from raw bytes alone.
+
+    With `printed`, also check that the result is what gdb prints: pointers
+    (gdb may add the pointed string or symbol) and structs with their own
+    pretty-printer (other than those in raw_formatters) are rejected.
+    """
+    if raw_formatter(layout) != None:
+        return True
+    kind = layout['kind']
+    if kind == 'opaque':
+        return False
+    if kind == 'pointer':
+        return not printed
+    if kind == 'array':
+        return can_format(layout['elem'], printed)
+    if kind == 'struct':
+        if printed and layout.get('printer', True):
+            return False
+        for f in layout['fields']:
+            if 'bitpos' in f and f['layout']['kind'] not in ['int', 'char', 'bool', 'enum']:
+                return False
+            if not can_format(f['layout'], printed):
+                return False
+        return True
+    if kind == 'float':
+        return layout['size'] in _float_formats
+    return True
+
+def has_printer(layout):
+    """
+    Check if gdb prints values of this layout, or any of their fields,
+    recursively, with a pretty-printer (see the 'printer' key of struct
+    layouts). Unions (opaque) are assumed to.
+    """
+    kind = layout['kind']
+    if kind == 'opaque':
+        return True
+    if kind == 'array':
+        return has_printer(layout['elem'])
+    if kind == 'struct':
+        return (layout.get('printer', True)
+                or any([has_printer(f['layout']) for f in layout['fields']]))
+    return False
+
+def _format_char(c):
+    if c < 0:
+        c_unsigned = c + 256
+    else:
+        c_unsigned = c
+    if c_unsigned in _char_escapes:
+        s = _char_escapes[c_unsigned]
+    elif 32 <= c_unsigned < 127:
+        s = chr(c_unsigned)
+    else:
+        s = '\\%03o' % c_unsigned
+    return "%d '%s'" % (c, s)
+
+def _format_scalar(layout, v):
+    kind = layout['kind']
+    if kind == 'bool':
+        return 'true' if v else 'false'
+    if kind == 'char':
+        return _format_char(v)
+    if kind == 'enum':
+        for val, name in layout['enumerators']:
+            if val == v:
+                return name
+        return '(unknown: %s)' % hex(v)
+    return str(v)
+
+def format_value(layout, buf, offset=0):
+    """
+    Format the value of the given layout stored at `offset` in `buf`.
+    """
+    kind = layout['kind']
+    size = layout['size']
+    if kind in ['int', 'char', 'enum']:
+        return _format_scalar(layout, decode_int(buf, offset, size, layout['signed']))
+    if kind == 'bool':
+        return _format_scalar(layout, decode_int(buf, offset, size, False))
+    if kind == 'float':
+        v = struct.unpack_from('<' + _float_formats[size], buf, offset)[0]
+        return format_float(size, v)
+    if kind == 'pointer':
+        return hex(decode_int(buf, offset, size, False))
+    if kind == 'array':
+        elem = layout['elem']
+        return '{' + ', '.join([format_value(elem, buf, offset + i * elem['size'])
+                                for i in range(layout['count'])]) + '}'
+    if kind == 'struct':
+        f = raw_formatter(layout)
+        if f != None:
+            return f(buf, offset)
+        items = list()
+        for f in layout['fields']:
+            if 'bitpos' in f:
+                v = decode_bits(buf, offset, f['bitpos'], f['bitsize'],
+                                f['layout'].get('signed', False))
+                s = _format_scalar(f['layout'], v)
+            else:
+                s = format_value(f['layout'], buf, offset + f['offset'])
+            if f['base']:
+                items.append('<' + f['layout']['name'] + '> = ' + s)
+            else:
+                items.append(f['name'] + ' = ' + s)
+        if len(items) == 0:
+            return '{<No data fields>}'
+        return '{' + ', '.join(items) + '}'
+    raise ValueError('cannot format layout of kind: ' + kind)
+
+def field_layout(layout, name):
+    """
+    Return (offset, layout) of the struct field `name`, or None.
+    Fields of nested structs can be given as a dotted path, e.g. 'second.price'.
+    """
+    offset = 0
+    for part in name.split('.'):
+        for f in layout.get('fields', []):
+            if f['name'] == part and 'offset' in f:
+                offset += f['offset']
+                layout = f['layout']
+                break
+        else:
+            return None
+    return (offset, layout)
+
+def leaf_fields(layout, prefix=''):
+    """
+    List the dotted names of the non-struct fields of a struct layout,
+    recursively, in memory order. Bitfields are left out.
+    """
+    res = list()
+    for f in layout.get('fields', []):
+        if 'offset' not in f or not f['name']:
+            continue
+        name = prefix + f['name']
+        if f['layout']['kind'] == 'struct':
+            res += leaf_fields(f['layout'], name + '.')
+        else:
+            res.append(name)
+    return res
+
+def enumerators(layout):
+    """
+    List the (name, value) pairs of the enumerators of all the enums found in
+    the given layout, recursively.
+    """
+    kind = layout['kind']
+    if kind == 'enum':
+        return [(name, val) for val, name in layout['enumerators']]
+    if kind == 'array':
+        return enumerators(layout['elem'])
+    res = list()
+    for f in layout.get('fields', []):
+        res += enumerators(f['layout'])
+    return res
+
+def _find_raw_field(layout, name):
+    # (offset, field) of the field `name`, looking into base classes
+    for f in layout.get('fields', []):
+        if f['name'] == name and not f['base']:
+            return (0, f)
+    for f in layout.get('fields', []):
+        if f['base'] and 'offset' in f:
+            r = _find_raw_field(f['layout'], name)
+            if r != None:
+                return (f['offset'] + r[0], r[1])
+    return None
+
+def raw_value(layout, buf, offset=0):
+    """
+    Decode the value of the given layout stored at `offset` in `buf`, as a
+    python value: int for integral types, enums and pointers, bool, float,
+    str for character arrays (up to the first null), list for other arrays,
+    and a Raw_Struct for structs. Other values are returned as raw bytes.
+    """
+    kind = layout['kind']
+    size = layout['size']
+    if kind in ['int', 'char', 'enum']:
+        return decode_int(buf, offset, size, layout['signed'])
+    if kind == 'bool':
+        return bool(decode_int(buf, offset, size, False))
+    if kind == 'float' and size in _float_formats:
+        return struct.unpack_from('<' + _float_formats[size], buf, offset)[0]
+    if kind == 'pointer':
+        return decode_int(buf, offset, size, False)
+    if kind == 'array':
+        elem = layout['elem']
+        if elem['kind'] == 'char' and elem['size'] == 1:
+            return bytes(buf[offset:offset + size]).split(b'\0')[0].decode('utf-8', 'replace')
+        return [raw_value(elem, buf, offset + i * elem['size']) for i in range(layout['count'])]
+    if kind == 'struct':
+        return Raw_Struct(layout, buf, offset)
+    return bytes(buf[offset:offset + size])
+
+class Raw_Struct(object):
+    """
+    Read-only view of a struct value stored in raw bytes. Fields, including
+    those of base classes, are decoded with raw_value when accessed, as
+    attributes or items: `e.second.price` or `e['second']['price']`. str()
+    formats the whole value, as gdb would print it.
+    """
+    __slots__ = ('_layout', '_buf', '_offset')
+
+    def __init__(self, layout, buf, offset=0):
+        self._layout = layout
+        self._buf = buf
+        self._offset = offset
+
+    def __getitem__(self, name):
+        r = _find_raw_field(self._layout, name)
+        if r == None:
+            raise KeyError(name)
+        offset, f = r
+        if 'bitpos' in f:
+            return decode_bits(self._buf, self._offset + offset, f['bitpos'], f['bitsize'],
+                               f['layout'].get('signed', False))
+        return raw_value(f['layout'], self._buf, self._offset + offset + f['offset'])
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __str__(self):
+        return format_value(self._layout, self._buf, self._offset)
+
+    __repr__ = __str__
+
+def format_chunk(args):
+    """
+    Format a chunk of elements.
+
+    Args: a tuple (`layout`, `buf`, `fields`), where `buf` contains consecutive
+    elements of the given layout. If `fields` is None, each element is
+    formatted as a whole; otherwise, it is a list of field names, and each
+    element produces a list of the formatted fields.
+
+    This is the unit of work of the worker processes.
+    """
+    layout, buf, fields = args
+    size = layout['size']
+    res = list()
+    if fields == None:
+        for off in range(0, len(buf), size):
+            res.append(format_value(layout, buf, off))
+    else:
+        fl = [field_layout(layout, f) for f in fields]
+        for off in range(0, len(buf), size):
+            res.append([format_value(l, buf, off + foff) for foff, l in fl])
+    return res
+
+class Format_Pool(object):
+    """
+    Pool of worker processes formatting chunks of raw elements.
+
+    The gdb process only reads memory; decoding and formatting run in the
+    workers. Results are produced in the order of the input chunks.
+    """
+    def __init__(self, jobs):
+        if hasattr(multiprocessing, 'get_context'):
+            # fork: the workers do not need to re-import anything
+            self.pool = multiprocessing.get_context('fork').Pool(jobs)
+        else:
+            self.pool = multiprocessing.Pool(jobs)
+        # chunks in flight; this bounds memory use
+        self.window = 2 * jobs
+
+    def imap(self, layout, chunks, fields=None):
+        """
+        Format each chunk of raw bytes in the iterable `chunks`.
+        Generates one list of formatted elements per chunk, in order.
+
+        NOTE: `chunks` is consumed in the calling thread, so it can use the
+        gdb API.
+        """
+        pending = collections.deque()
+        for buf in chunks:
+            pending.append(self.pool.apply_async(format_chunk, ((layout, buf, fields),)))
+            if len(pending) >= self.window:
+                yield pending.popleft().get()
+        while len(pending) > 0:
+            yield pending.popleft().get()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
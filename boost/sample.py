@@ -0,0 +1,131 @@
+#
+# sample.py
+#
+# Print a sample of the elements of a container, with their positions, for a
+# first look at containers too large to print.
+#
+# The sample is uniform (random positions) or strided (evenly spaced
+# positions). For random access containers (contiguous containers, see
+# segments(), and printers providing elem_addr(i), see utils.py), only the
+# sampled elements are read: O(M). For the others, the element addresses are
+# generated in one pass by elem_addrs(), without reading the elements, and a
+# uniform sample is kept by reservoir sampling; only the sampled elements are
+# then formatted, by gdb.
+#
+
+import bisect
+import random
+
+from boost import *
+
+def sample_positions(n, m, strided=False):
+    """
+    Sorted list of `m` positions out of `n` (all of them if `m` >= `n`).
+    """
+    if m >= n:
+        return list(xrange(n))
+    if strided:
+        return [i * n // m for i in xrange(m)]
+    return sorted(random.sample(xrange(n), m))
+
+def reservoir_sample(addrs, m):
+    """
+    Uniform sample of `m` elements out of the addresses generated by `addrs`,
+    in one pass (algorithm R). Returns the sorted list of (position, address)
+    pairs.
+    """
+    res = list()
+    for i, addr in enumerate(addrs):
+        if i < m:
+            res.append((i, addr))
+        else:
+            j = random.randint(0, i)
+            if j < m:
+                res[j] = (i, addr)
+    return sorted(res)
+
+def random_access_addrs(p, positions):
+    """
+    Addresses of the elements at sorted `positions` of the container printed
+    by `p`, without a traversal; None if the container is not random access.
+    """
+    if hasattr(p, 'segments'):
+        elem_size = p.elem_type.sizeof
+        segments = p.segments()
+        # first position of each segment
+        starts = list()
+        k = 0
+        for _, count in segments:
+            starts.append(k)
+            k += count
+        res = list()
+        for pos in positions:
+            s = bisect.bisect_right(starts, pos) - 1
+            res.append(segments[s][0] + (pos - starts[s]) * elem_size)
+        return res
+    if hasattr(p, 'elem_addr') and p.elem_addr(0) != None:
+        return [p.elem_addr(pos) for pos in positions]
+    return None
+
+def sample_elements(p, m, strided=False):
+    """
+    Sample `m` elements of the container printed by `p`. Returns the sorted
+    list of (position, address) pairs.
+    """
+    n = elem_count(p)
+    if n != None and (hasattr(p, 'segments') or hasattr(p, 'elem_addr')):
+        positions = sample_positions(n, m, strided)
+        addrs = random_access_addrs(p, positions) if n > 0 else []
+        if addrs != None:
+            return list(zip(positions, addrs))
+    if not strided:
+        return reservoir_sample(p.elem_addrs(), m)
+    if n == None:
+        # one pass to count the elements, without reading them
+        n = 0
+        for _ in p.elem_addrs():
+            n += 1
+    positions = sample_positions(n, m, True)
+    res = list()
+    if len(positions) == 0:
+        return res
+    for i, addr in enumerate(p.elem_addrs()):
+        if i == positions[len(res)]:
+            res.append((i, addr))
+            if len(res) == len(positions):
+                break
+    return res
+
+class sample_cmd(gdb.Command):
+    """
+    Print a sample of the elements of a container, with their positions.
+
+    Usage: boost-sample [--strided] <expr> <m>
+
+    Prints <m> elements at uniformly random positions, or, with --strided,
+    at evenly spaced positions. Random access containers (e.g. flat_map,
+    circular_buffer, multi_index random access indexes) are sampled in
+    O(<m>); the others with a single pass over the element addresses.
+    Works with every container printer providing elem_type and elem_addrs().
+    """
+    def __init__(self):
+        super(sample_cmd, self).__init__('boost-sample', gdb.COMMAND_DATA)
+
+    def invoke(self, arg, from_tty):
+        argv = gdb.string_to_argv(arg)
+        strided = False
+        if '--strided' in argv:
+            argv.remove('--strided')
+            strided = True
+        if len(argv) != 2:
+            raise gdb.GdbError('usage: boost-sample [--strided] <expr> <m>')
+        value = parse_and_eval(argv[0])
+        p = gdb.default_visualizer(value)
+        if p == None or not hasattr(p, 'elem_type') or not hasattr(p, 'elem_addrs'):
+            raise gdb.GdbError('boost-sample: no container printer with raw element access for type: '
+                               + str(value.type))
+        elem_ptr_t = p.elem_type.pointer()
+        for pos, addr in sample_elements(p, int(argv[1]), strided):
+            gdb.write('[%d] = %s\n' % (pos, str(gdb.Value(addr).cast(elem_ptr_t).dereference())))
+
+_sample = sample_cmd()
@@ -0,0 +1,209 @@
+#
+# snapfile.py
+#
+# Container snapshot files.
+#
+# NOTE: This module does not use the gdb API, so it can be used outside of gdb
+# for offline analysis, e.g.:
+#
+#   $ python -m boost.snapfile info core1.snap
+#   $ python -m boost.snapfile diff core1.snap core2.snap
+#
+# File format (all integers are little endian):
+#
+#   magic            8 bytes: b'\x93BSNAP\x01\x00' (the last 2 are the version)
+#   header length    4 bytes
+#   header           JSON object, padded with spaces so that the element data
+#                    starts at a multiple of 64
+#   element data     count * elem_size bytes, elements in printing order
+#   padding          up to a multiple of 8
+#   addresses        count * 8 bytes, the inferior address of each element
+#
+# The header contains the following keys: 'expr', 'type', 'addr', 'torn',
+# 'elem_type', 'elem_size', 'count', 'layout' (see layout.py), 'descr' (a numpy
+# dtype description of one element, see rawdata.layout_descr), 'data_offset',
+# and 'addrs_offset'. For elements that are structs, the descr is a structured
+# dtype, so that fields can be accessed by name, e.g. `s.records()['price']`.
+#
+# With numpy available, the element data is accessed through numpy.memmap,
+# so scanning thousands of snapshot files runs at file-scan speed.
+#
+
+from __future__ import print_function
+
+import json
+import mmap
+import struct
+import sys
+
+from boost import rawdata
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+magic = b'\x93BSNAP\x01\x00'
+_align = 64
+
+def write(path, header, data, addrs):
+    """
+    Write a snapshot file.
+
+    Args:
+      `path`: file name
+      `header`: dict with the header keys listed at the top of this file;
+        the keys 'count', 'data_offset' and 'addrs_offset' are filled in here
+      `data`: bytes of all elements
+      `addrs`: list of element addresses
+    """
+    header = dict(header)
+    header['count'] = len(addrs)
+    assert len(data) == header['count'] * header['elem_size']
+    if 'descr' not in header:
+        header['descr'] = '|V%d' % header['elem_size']
+    # the header length depends on the offsets, so iterate until stable
+    header['data_offset'] = 0
+    header['addrs_offset'] = 0
+    while True:
+        header_str = json.dumps(header, sort_keys=True).encode('utf-8')
+        prefix_len = len(magic) + 4 + len(header_str)
+        data_offset = (prefix_len + _align - 1) // _align * _align
+        addrs_offset = (data_offset + len(data) + 7) // 8 * 8
+        if header['data_offset'] == data_offset and header['addrs_offset'] == addrs_offset:
+            break
+        header['data_offset'] = data_offset
+        header['addrs_offset'] = addrs_offset
+    with open(path, 'wb') as f:
+        f.write(magic)
+        f.write(struct.pack('<I', data_offset - len(magic) - 4))
+        f.write(header_str + b' ' * (data_offset - prefix_len))
+        f.write(data)
+        f.write(b'\0' * (addrs_offset - data_offset - len(data)))
+        f.write(struct.pack('<%dQ' % len(addrs), *addrs))
+
+class Snapshot_File(object):
+    """
+    Read-only view of a snapshot file.
+
+    The header keys are available as attributes, e.g. `s.count`, `s.layout`.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            prefix = f.read(len(magic) + 4)
+            if len(prefix) < len(magic) + 4 or prefix[:len(magic)] != magic:
+                raise ValueError(path + ': not a snapshot file')
+            header_len = struct.unpack('<I', prefix[len(magic):])[0]
+            self.header = json.loads(f.read(header_len).decode('utf-8'))
+        self.__dict__.update(self.header)
+        self._mmap = None
+
+    def _get_mmap(self):
+        if self._mmap == None:
+            with open(self.path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def __len__(self):
+        return self.count
+
+    def records(self):
+        """
+        Element data: a numpy.memmap with one record per element if numpy is
+        available, otherwise a memoryview of the raw bytes.
+        """
+        if numpy != None:
+            if self.count == 0:
+                return numpy.zeros(0, dtype=self.dtype())
+            return numpy.memmap(self.path, dtype=self.dtype(), mode='r',
+                                offset=self.data_offset, shape=(self.count,))
+        return memoryview(self._get_mmap())[
+            self.data_offset:self.data_offset + self.count * self.elem_size]
+
+    def dtype(self):
+        """
+        numpy dtype of one element.
+        """
+        return rawdata.descr_dtype(self.descr)
+
+    def raw(self):
+        """
+        Element data as (count, elem_size) numpy.memmap of bytes if numpy is
+        available, otherwise as a memoryview.
+        """
+        if numpy != None:
+            if self.count == 0:
+                return numpy.zeros((0, self.elem_size), dtype=numpy.uint8)
+            return numpy.memmap(self.path, dtype=numpy.uint8, mode='r',
+                                offset=self.data_offset,
+                                shape=(self.count, self.elem_size))
+        return self.records()
+
+    def elem_bytes(self, i):
+        start = self.data_offset + i * self.elem_size
+        return self._get_mmap()[start:start + self.elem_size]
+
+    def addresses(self):
+        """
+        Inferior addresses of the elements.
+        """
+        if numpy != None:
+            if self.count == 0:
+                return numpy.zeros(0, dtype='<u8')
+            return numpy.memmap(self.path, dtype='<u8', mode='r',
+                                offset=self.addrs_offset, shape=(self.count,))
+        buf = self._get_mmap()[self.addrs_offset:self.addrs_offset + 8 * self.count]
+        return list(struct.unpack('<%dQ' % self.count, buf))
+
+def load(path):
+    """
+    Open snapshot file `path`.
+    """
+    return Snapshot_File(path)
+
+def diff(a, b):
+    """
+    Compare the elements of 2 snapshots position by position.
+
+    Returns the list of positions at which the element bytes differ. Positions
+    present in only one of the snapshots are included.
+    """
+    if not isinstance(a, Snapshot_File):
+        a = load(a)
+    if not isinstance(b, Snapshot_File):
+        b = load(b)
+    if a.elem_size != b.elem_size:
+        raise ValueError('element sizes differ: %d vs %d' % (a.elem_size, b.elem_size))
+    n = min(a.count, b.count)
+    if numpy != None:
+        changed = numpy.nonzero((a.raw()[:n] != b.raw()[:n]).any(axis=1))[0].tolist()
+    else:
+        changed = [i for i in range(n) if a.elem_bytes(i) != b.elem_bytes(i)]
+    return changed + list(range(n, max(a.count, b.count)))
+
+def _main(argv):
+    usage = 'usage: python -m boost.snapfile (info <file>... | diff <file_a> <file_b>)'
+    if len(argv) < 2 or argv[0] not in ['info', 'diff']:
+        print(usage)
+        return 1
+    if argv[0] == 'info':
+        for path in argv[1:]:
+            s = load(path)
+            print('%s: %s = %s, %d elements of %s (%d bytes)%s' % (
+                path, s.expr, s.type, s.count, s.elem_type, s.elem_size,
+                ' (torn)' if s.torn else ''))
+        return 0
+    if len(argv) != 3:
+        print(usage)
+        return 1
+    a = load(argv[1])
+    b = load(argv[2])
+    changed = diff(a, b)
+    for i in changed:
+        print('[%d] differs' % i)
+    print('%d/%d elements differ' % (len(changed), max(a.count, b.count)))
+    return 0 if len(changed) == 0 else 2
+
+if __name__ == '__main__':
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,263 @@
+#
+# stats.py
+#
+# Aggregate statistics of one numeric field over the elements of a container.
+#
+# The element bytes are read in chunks (see read_elem_chunks), the field is
+# decoded for a whole chunk at once, and the chunk is folded into running
+# aggregates: count, sum, min, max, mean and standard deviation are exact.
+# Quantiles and the histogram are computed from the values kept, i.e. all of
+# them up to options['stats_sample_size'], and a uniform sample of that size
+# (reservoir sampling) beyond. No gdb value and no string is built per element.
+#
+# With numpy, the aggregation is vectorized over each chunk; without it, the
+# same is done in pure python.
+#
+
+import math
+import random
+
+from boost import *
+from boost import layout
+from boost import rawdata
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_numeric_kinds = ['int', 'char', 'enum', 'bool', 'float']
+
+def numeric_field(elem_layout, field=None):
+    """
+    Return the (offset, layout) of the numeric `field` (dotted path) of the
+    elements; the element itself if `field` is None.
+    """
+    if field == None:
+        fl = (0, elem_layout)
+    else:
+        fl = rawdata.field_layout(elem_layout, field)
+        if fl == None:
+            message('stats: no field ' + field + ' in type ' + elem_layout['name'])
+            raise gdb.error
+    if fl[1]['kind'] not in _numeric_kinds or rawdata.layout_descr(fl[1]) == None:
+        message('stats: not a numeric type: ' + fl[1]['name'])
+        raise gdb.error
+    return fl
+
+def decode_numbers(l, buf, count, offset, stride):
+    """
+    Decode `count` values of numeric layout `l`, every `stride` bytes starting
+    at `offset` in `buf`: a numpy array if numpy is available, else a list.
+    """
+    if numpy != None:
+        return numpy.ndarray(shape=(count,), dtype=rawdata.descr_dtype(rawdata.layout_descr(l)),
+                             buffer=buf, offset=offset, strides=(stride,))
+    if rawdata.is_arithmetic(l):
+        return rawdata.decode_column(l, buf, count, offset, stride)
+    signed = l.get('signed', False)
+    return [rawdata.decode_int(buf, offset + i * stride, l['size'], signed) for i in xrange(count)]
+
+def _exact_sum(values):
+    # sum of the integer numpy array `values`, as an exact python int; 64 bit
+    # values are summed in 32 bit halves, so that no partial sum wraps around
+    # (for batches of less than 2**31 values)
+    if values.dtype.itemsize < 8:
+        return int(values.sum(dtype=numpy.int64))
+    signed = values.dtype.kind == 'i'
+    hi = (values >> 32).sum(dtype=numpy.int64 if signed else numpy.uint64)
+    lo = (values & 0xffffffff).sum(dtype=numpy.uint64)
+    return (int(hi) << 32) + int(lo)
+
+class Running_Stats(object):
+    """
+    Running aggregates over batches of numbers.
+
+    Attributes:
+      `count`, `sum`, `min`, `max`: exact aggregates
+      `sample`: values kept for quantiles (all of them, up to `sample_size`)
+    """
+    def __init__(self, sample_size, is_float=False):
+        self.sample_size = sample_size
+        self.is_float = is_float
+        self.count = 0
+        self.sum = 0.0 if is_float else 0
+        self.min = None
+        self.max = None
+        # running mean and sum of squared deviations (Chan et al.)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sample = numpy.zeros(0) if numpy != None else list()
+
+    def add(self, values):
+        """
+        Fold the batch `values` (numpy array or list) into the aggregates.
+        """
+        k = len(values)
+        if k == 0:
+            return
+        if numpy != None:
+            values = numpy.asarray(values)
+            if values.dtype == numpy.bool_:
+                values = values.astype(numpy.uint8)
+            if self.is_float:
+                batch_sum = float(values.sum(dtype=numpy.float64))
+            else:
+                batch_sum = _exact_sum(values)
+            batch_min = values.min().item()
+            batch_max = values.max().item()
+            fvalues = values.astype(numpy.float64)
+            batch_mean = float(fvalues.mean())
+            batch_m2 = float(((fvalues - batch_mean) ** 2).sum())
+        else:
+            batch_sum = sum(values)
+            batch_min = min(values)
+            batch_max = max(values)
+            batch_mean = float(batch_sum) / k
+            batch_m2 = sum([(v - batch_mean) ** 2 for v in values])
+        n = self.count
+        delta = batch_mean - self.mean
+        self.mean += delta * k / (n + k)
+        self.m2 += batch_m2 + delta * delta * n * k / (n + k)
+        self.count = n + k
+        self.sum += batch_sum
+        self.min = batch_min if self.min == None else min(self.min, batch_min)
+        self.max = batch_max if self.max == None else max(self.max, batch_max)
+        self._add_to_sample(values, n)
+
+    def _add_to_sample(self, values, n):
+        # reservoir sampling: value i (0-based, overall) replaces a random
+        # sample slot with probability sample_size / (i + 1)
+        k = len(values)
+        fill = max(0, min(k, self.sample_size - n))
+        if numpy != None:
+            if fill > 0:
+                self.sample = numpy.concatenate([self.sample, numpy.asarray(values[:fill], dtype=numpy.float64)])
+            if fill < k:
+                slots = (numpy.random.random_sample(k - fill) * numpy.arange(n + fill + 1, n + k + 1)).astype(numpy.int64)
+                keep = slots < self.sample_size
+                self.sample[slots[keep]] = values[fill:][keep]
+            return
+        self.sample.extend([float(v) for v in values[:fill]])
+        for i in xrange(fill, k):
+            j = random.randint(0, n + i)
+            if j < self.sample_size:
+                self.sample[j] = float(values[i])
+
+    def std(self):
+        return math.sqrt(self.m2 / self.count) if self.count > 0 else 0.0
+
+    def sampled(self):
+        return self.count > self.sample_size
+
+    def quantiles(self, qs):
+        """
+        Quantiles `qs` (fractions) of the values kept, with linear interpolation.
+        """
+        if self.count == 0:
+            return [None for q in qs]
+        if numpy != None:
+            return [float(v) for v in numpy.percentile(self.sample, [100.0 * q for q in qs])]
+        s = sorted(self.sample)
+        res = list()
+        for q in qs:
+            x = q * (len(s) - 1)
+            i = int(math.floor(x))
+            j = min(i + 1, len(s) - 1)
+            res.append(s[i] + (s[j] - s[i]) * (x - i))
+        return res
+
+    def histogram(self, bins):
+        """
+        Histogram of the values kept, in `bins` equal bins between the exact
+        min and max. Returns a list of (low, high, count) triples; counts are
+        scaled to the total count if the values are sampled.
+        """
+        if self.count == 0:
+            return list()
+        lo = float(self.min)
+        hi = float(self.max)
+        if hi == lo:
+            return [(lo, hi, self.count)]
+        if numpy != None:
+            counts, edges = numpy.histogram(self.sample, bins=bins, range=(lo, hi))
+            counts = counts.tolist()
+            edges = edges.tolist()
+        else:
+            counts = [0] * bins
+            width = (hi - lo) / bins
+            for v in self.sample:
+                counts[min(bins - 1, int((v - lo) / width))] += 1
+            edges = [lo + i * width for i in xrange(bins)] + [hi]
+        scale = float(self.count) / len(self.sample)
+        return [(edges[i], edges[i + 1], int(round(counts[i] * scale))) for i in xrange(bins)]
+
+def container_stats(p, field=None):
+    """
+    Aggregate the numeric `field` of the elements of the container printed by
+    `p` (the elements themselves if `field` is None). Returns a Running_Stats.
+    """
+    elem_size = p.elem_type.sizeof
+    offset, l = numeric_field(layout.type_layout(p.elem_type), field)
+    res = Running_Stats(options['stats_sample_size'], l['kind'] == 'float')
+    chunk_elems = max(1, options['bulk_read_size'] // elem_size)
+    for buf in read_elem_chunks(p, chunk_elems):
+        res.add(decode_numbers(l, buf, len(buf) // elem_size, offset, elem_size))
+    return res
+
+def _fmt(v):
+    if isinstance(v, float):
+        return '%.6g' % v
+    return str(v)
+
+def print_stats(s, bins=10):
+    rows = [('count', s.count), ('sum', s.sum), ('min', s.min), ('max', s.max),
+            ('mean', s.mean), ('std', s.std())]
+    qs = [0.5, 0.9, 0.99, 0.999]
+    for q, v in zip(qs, s.quantiles(qs)):
+        rows.append(('p%g' % (100 * q), v))
+    lines = ['%-6s %s' % (name, _fmt(v) if v != None else '-') for name, v in rows]
+    if s.sampled():
+        lines.append('(quantiles and histogram from a sample of %d values)' % len(s.sample))
+    hist = s.histogram(bins)
+    if len(hist) > 0:
+        top = max([c for _, _, c in hist])
+        lines.append('histogram:')
+        for lo, hi, c in hist:
+            bar = '#' * (int(round(40.0 * c / top)) if top > 0 else 0)
+            lines.append('  [%s, %s%s %10d %s' % (_fmt(lo), _fmt(hi), ']' if hi == hist[-1][1] else ')', c, bar))
+    gdb.write('\n'.join(lines) + '\n')
+
+class stats_of_cmd(gdb.Command):
+    """
+    Print statistics of a numeric field over the elements of a container.
+
+    Usage: boost-stats-of <expr> [<field>] [--bins <n>]
+
+    <field> is a dotted path in the element type, e.g. second.latency; without
+    it, the elements must be numbers. Prints count, sum, min, max, mean,
+    standard deviation, quantiles and a histogram in <n> bins (default: 10).
+    Works with every container printer providing elem_type and elem_addrs().
+    """
+    def __init__(self):
+        super(stats_of_cmd, self).__init__('boost-stats-of', gdb.COMMAND_DATA)
+
+    def invoke(self, arg, from_tty):
+        argv = gdb.string_to_argv(arg)
+        bins = 10
+        if '--bins' in argv:
+            i = argv.index('--bins')
+            if i + 1 >= len(argv):
+                raise gdb.GdbError('boost-stats-of: --bins needs a value')
+            bins = int(argv[i + 1])
+            argv = argv[:i] + argv[i + 2:]
+        if len(argv) < 1 or len(argv) > 2 or bins < 1:
+            raise gdb.GdbError('usage: boost-stats-of <expr> [<field>] [--bins <n>]')
+        value = parse_and_eval(argv[0])
+        p = gdb.default_visualizer(value)
+        if p == None or not hasattr(p, 'elem_type') or not hasattr(p, 'elem_addrs'):
+            raise gdb.GdbError('boost-stats-of: no container printer with raw element access for type: '
+                               + str(value.type))
+        print_stats(container_stats(p, argv[1] if len(argv) > 1 else None), bins)
+
+_stats_of = stats_of_cmd()
@@ -0,0 +1,185 @@
+#
+# table.py
+#
+# Columnar views of contiguous containers of plain structs.
+#
+# For containers whose printer provides segments() (see printers.py), the
+# element bytes are read in bulk, and the selected fields are decoded for a
+# whole chunk of elements at once, instead of going through the gdb struct
+# printer for every field of every element.
+#
+
+from boost import *
+from boost import layout
+from boost import rawdata
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def contiguous_printer(value):
+    """
+    Return the printer of container `value`, which must provide segments().
+    """
+    p = gdb.default_visualizer(value)
+    if p == None or not hasattr(p, 'segments') or not hasattr(p, 'elem_type'):
+        message('no contiguous container printer for type: ' + str(value.type))
+        raise gdb.error
+    return p
+
+def read_elements(p, start=0, count=None):
+    """
+    Read the raw bytes of the elements [`start`, `start` + `count`) of the
+    container printed by `p`; all the following ones if `count` is None.
+    """
+    elem_size = p.elem_type.sizeof
+    chunks = list()
+    for addr, n in p.segments():
+        if start >= n:
+            start -= n
+            continue
+        k = n - start if count == None else min(n - start, count)
+        chunks.append(read_memory(addr + start * elem_size, k * elem_size))
+        start = 0
+        if count != None:
+            count -= k
+            if count == 0:
+                break
+    return bytes().join(chunks)
+
+def records(p, start=0, count=None):
+    """
+    Elements of the container printed by `p`, as a numpy array with the
+    structured dtype of the element type (see layout.type_dtype).
+
+    The elements are read with one memory read per segment, and the array is a
+    view of the buffer read: nothing is decoded until fields are accessed, e.g.
+    `records(p)['second']['price'].sum()`.
+    """
+    if numpy == None:
+        message('records: numpy is not available')
+        raise gdb.error
+    dt = layout.type_dtype(p.elem_type)
+    if dt == None:
+        message('records: no numpy dtype for type: ' + str(p.elem_type))
+        raise gdb.error
+    return numpy.frombuffer(read_elements(p, start, count), dtype=dt)
+
+def table_columns(elem_layout, fields=None):
+    """
+    Resolve the table columns for elements of the given layout.
+
+    `fields` is a list of dotted field names; by default, all the non-struct
+    fields are used. Returns a list of (name, offset, layout) triples.
+    """
+    if elem_layout['kind'] != 'struct':
+        if fields:
+            message('table: elements of type ' + elem_layout['name'] + ' have no fields')
+            raise gdb.error
+        return [('value', 0, elem_layout)]
+    if not fields:
+        fields = rawdata.leaf_fields(elem_layout)
+    res = list()
+    for name in fields:
+        fl = rawdata.field_layout(elem_layout, name)
+        if fl == None or not rawdata.can_format(fl[1]):
+            message('table: cannot decode field: ' + name)
+            raise gdb.error
+        res.append((name, fl[0], fl[1]))
+    return res
+
+def format_column(l, buf, count, offset, stride):
+    """
+    Format the values of layout `l` found at `offset` in each of the `count`
+    elements of size `stride` in `buf`.
+    """
+    if rawdata.is_arithmetic(l):
+        col = rawdata.decode_column(l, buf, count, offset, stride)
+        if l['kind'] == 'float':
+            return [rawdata.format_float(l['size'], v) for v in col]
+        if l['kind'] == 'bool':
+            return ['true' if v else 'false' for v in col]
+        return [str(v) for v in col]
+    return [rawdata.format_value(l, buf, offset + i * stride) for i in xrange(count)]
+
+def fit(s, w):
+    """
+    Right-justify string `s` in a column of width `w`; a longer string is
+    cut, and ends with '~'.
+    """
+    if len(s) <= w:
+        return s.rjust(w)
+    return s[:w - 1] + '~'
+
+def print_table(p, fields=None, limit=None):
+    """
+    Print the `fields` of the first `limit` elements of the container printed
+    by `p`, one row per element.
+
+    The column widths are those of the first chunk of elements, so that the
+    rows are printed as their chunk is decoded; later values wider than their
+    column are cut (see fit).
+    """
+    elem_size = p.elem_type.sizeof
+    columns = table_columns(layout.type_layout(p.elem_type), fields)
+    chunk_elems = max(1, options['bulk_read_size'] // elem_size)
+    rows = elem_count(p) if limit == None else min(limit, elem_count(p))
+    widths = None
+    i = 0
+    for buf in read_elem_chunks(p, chunk_elems):
+        k = len(buf) // elem_size
+        if limit != None:
+            k = min(k, limit - i)
+        cols = [[str(j) for j in xrange(i, i + k)]]
+        for _, offset, l in columns:
+            cols.append(format_column(l, buf, k, offset, elem_size))
+        lines = list()
+        if widths == None:
+            names = ['index'] + [name for name, _, _ in columns]
+            widths = [max([len(name)] + [len(s) for s in col]) for name, col in zip(names, cols)]
+            # the last index is known: its column is never cut
+            widths[0] = max(widths[0], len(str(max(0, rows - 1))))
+            lines.append('  '.join([s.rjust(w) for s, w in zip(names, widths)]))
+        for row in zip(*cols):
+            lines.append('  '.join([fit(s, w) for s, w in zip(row, widths)]))
+        gdb.write('\n'.join(lines) + '\n')
+        i += k
+        if limit != None and i >= limit:
+            break
+    return i
+
+class table_cmd(gdb.Command):
+    """
+    Print fields of the elements of a contiguous container as a table.
+
+    Usage: boost-table <expr> [<field>[,<field>...]] [--limit <n>]
+
+    Fields are dotted paths in the element type, e.g. second.price for the
+    mapped values of a flat_map; by default, all fields are printed. At most
+    <n> elements are printed (default: the "print elements" limit; 0 for no limit).
+    """
+    def __init__(self):
+        super(table_cmd, self).__init__('boost-table', gdb.COMMAND_DATA)
+
+    def invoke(self, arg, from_tty):
+        argv = gdb.string_to_argv(arg)
+        limit = gdb.parameter('print elements')
+        if '--limit' in argv:
+            i = argv.index('--limit')
+            if i + 1 >= len(argv):
+                raise gdb.GdbError('boost-table: --limit needs a value')
+            limit = int(argv[i + 1])
+            argv = argv[:i] + argv[i + 2:]
+        if len(argv) < 1 or len(argv) > 2:
+            raise gdb.GdbError('usage: boost-table <expr> [<field>[,<field>...]] [--limit <n>]')
+        if not limit:
+            limit = None
+        fields = argv[1].split(',') if len(argv) > 1 else None
+        p = contiguous_printer(parse_and_eval(argv[0]))
+        n = print_table(p, fields, limit)
+        total = elem_count(p)
+        if n < total:
+            gdb.write('... (%d of %d elements)\n' % (n, total))
+
+_table = table_cmd()
@@ -0,0 +1,312 @@
+#
+# triage.py
+#
+# Headless triage: dump every Boost container found in global, static and
+# frame-local variables, under a global time budget.
+#
+# Inside gdb, use the command boost-triage. For batch processing of core files,
+# this file can be run directly as a gdb script:
+#
+#   BOOST_TRIAGE_OUTPUT=report.json \
+#     gdb -batch -nx -x PATH-TO-THE-REPO/boost/triage.py a.out core
+#
+# In that case, the following environment variables are used:
+#
+# - BOOST_TRIAGE_OUTPUT : report file name (default: print to stdout)
+# - BOOST_TRIAGE_ELEMENTS : number of elements to print per container (default: 10)
+# - BOOST_TRIAGE_BUDGET : time budget, in seconds (default: 60)
+# - BOOST_TRIAGE_PLAN_DIR : directory holding type plans, by build-id (optional)
+#
+# A type plan records which types are containers, and which global and static
+# variables hold containers. When a plan exists for the build-id of the
+# program, the (slow) enumeration of all global variables is skipped.
+#
+# The report is a JSON object with a list of containers; for each one, it
+# gives its scope and name, type, size, estimated footprint in bytes, and the
+# first elements.
+#
+
+import json
+import os
+import re
+import sys
+import time
+
+if __name__ == '__main__':
+    # run as a gdb script: load and register the latest printers first
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import boost.latest
+    boost.register_printers()
+
+from boost import *
+from boost.export import printer_records
+
+#
+# Type plan: for every type name seen, whether or not it is a container
+# handled by the boost printers.
+#
+type_plan = dict()
+
+class _Out_Of_Time(Exception):
+    pass
+
+def _container_printer(value):
+    """
+    Return the boost printer for `value` if it is a supported container, None otherwise.
+    """
+    t = get_basic_type(value.type)
+    if t.code != gdb.TYPE_CODE_STRUCT:
+        return None
+    tn = str(t)
+    if tn in type_plan and not type_plan[tn]:
+        return None
+    try:
+        p = full_printer(boost_printer_gen(value))
+    except Exception:
+        p = None
+    if p != None and not (hasattr(p, 'children') and hasattr(p, 'elem_type')):
+        p = None
+    type_plan[tn] = (p != None)
+    return p
+
+def _global_names():
+    """
+    Generate the names of all global and static variables with debug info,
+    as listed by "info variables".
+    """
+    out = gdb.execute('info variables', False, True)
+    name_re = re.compile(r'([A-Za-z_][\w:]*)\s*(?:\[[^\]]*\])*;$')
+    for line in out.splitlines():
+        if line.startswith('Non-debugging symbols:'):
+            break
+        m = name_re.search(line.strip())
+        if m:
+            yield m.group(1)
+
+def _global_symbols(names):
+    """
+    Generate (scope, symbol) pairs for the global and static variables in `names`.
+    """
+    for name in names:
+        sym = gdb.lookup_global_symbol(name)
+        if sym != None:
+            yield ('global', sym)
+            continue
+        if hasattr(gdb, 'lookup_static_symbol'):
+            sym = gdb.lookup_static_symbol(name)
+        else:
+            sym = gdb.lookup_symbol(name)[0]
+        if sym != None:
+            yield ('static', sym)
+
+def _frame_symbols(frame):
+    """
+    Generate the variables and arguments visible in `frame`.
+    """
+    try:
+        block = frame.block()
+    except RuntimeError:
+        return
+    while block != None:
+        for sym in block:
+            if sym.is_variable or sym.is_argument:
+                yield sym
+        if block.function != None:
+            break
+        block = block.superblock
+
+class Triage(object):
+    """
+    Collects the report of one triage run.
+    """
+    def __init__(self, max_elements=10, budget=60.0, global_names=None):
+        self.max_elements = max_elements
+        self.deadline = time.time() + budget
+        self.global_names = global_names
+        self.container_globals = list()
+        self.globals_complete = False
+        self.seen = set()
+        self.containers = list()
+
+    def check_time(self):
+        if time.time() > self.deadline:
+            raise _Out_Of_Time()
+
+    def add(self, value, entry):
+        """
+        Add `value` to the report if it is a container. `entry` is a dict
+        describing where the value was found.
+        """
+        self.check_time()
+        p = _container_printer(value)
+        if p == None:
+            return
+        key = (intptr(value.address) if value.address != None else None, str(value.type))
+        if key[0] != None and key in self.seen:
+            return
+        self.seen.add(key)
+        entry['type'] = str(value.type)
+        entry['address'] = hex(key[0]) if key[0] != None else None
+        self.containers.append(entry)
+        try:
+            size = elem_count(p)
+            if size == None:
+                size = 0
+                for _ in p.elem_addrs():
+                    size += 1
+                    if size % 1024 == 0:
+                        self.check_time()
+            entry['size'] = size
+            node_size = p.node_size if hasattr(p, 'node_size') else p.elem_type.sizeof
+            entry['footprint'] = value.type.sizeof + size * node_size
+            entry['elements'] = list()
+            entry['truncated'] = False
+            for i, label, val in printer_records(p):
+                if i >= self.max_elements:
+                    entry['truncated'] = True
+                    break
+                self.check_time()
+                entry['elements'].append([label, val])
+        except _Out_Of_Time:
+            entry['error'] = 'out of time'
+            raise
+        except Exception as e:
+            entry['error'] = str(e)
+
+    def run(self):
+        """
+        Walk globals, statics, and the frames of every thread.
+        Returns True if the walk completed within the time budget.
+        """
+        try:
+            names = self.global_names
+            if names == None:
+                names = _global_names()
+            for scope, sym in _global_symbols(names):
+                try:
+                    value = sym.value()
+                except Exception:
+                    continue
+                n = len(self.containers)
+                self.add(value, {'scope': scope, 'name': sym.name})
+                if len(self.containers) > n:
+                    self.container_globals.append(sym.name)
+            self.globals_complete = True
+            selected_thread = gdb.selected_thread()
+            for thread in gdb.selected_inferior().threads():
+                thread.switch()
+                frame = gdb.newest_frame()
+                level = 0
+                while frame != None:
+                    self.check_time()
+                    for sym in _frame_symbols(frame):
+                        try:
+                            value = sym.value(frame)
+                        except Exception:
+                            continue
+                        self.add(value, {'scope': 'local', 'name': sym.name,
+                                         'thread': thread.num, 'frame': level,
+                                         'function': str(frame.name())})
+                    frame = frame.older()
+                    level += 1
+            if selected_thread != None:
+                selected_thread.switch()
+        except _Out_Of_Time:
+            return False
+        return True
+
+def _build_id():
+    objfiles = gdb.objfiles()
+    if len(objfiles) == 0 or not hasattr(objfiles[0], 'build_id'):
+        return None
+    return objfiles[0].build_id
+
+def _load_plan(plan_dir, build_id):
+    """
+    Load the type plan for `build_id` into `type_plan`.
+    Returns the list of global names holding containers, or None if there is no plan.
+    """
+    path = os.path.join(plan_dir, build_id + '.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        plan = json.load(f)
+    type_plan.update(plan['types'])
+    return plan['globals']
+
+def _save_plan(plan_dir, build_id, global_names):
+    # write to a temporary file, then rename: other processes might be
+    # reading the plan concurrently
+    path = os.path.join(plan_dir, build_id + '.json')
+    tmp_path = path + '.' + str(os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump({'types': type_plan, 'globals': global_names}, f)
+    os.rename(tmp_path, path)
+
+def triage(max_elements=10, budget=60.0, plan_dir=None):
+    """
+    Run a triage, and return the report as a dict.
+
+    If `plan_dir` is given, the type plan for the program build-id is
+    loaded from it, or saved to it after the globals have been walked.
+    """
+    start = time.time()
+    build_id = _build_id()
+    global_names = None
+    if plan_dir and build_id:
+        global_names = _load_plan(plan_dir, build_id)
+    t = Triage(max_elements, budget, global_names)
+    complete = t.run()
+    if plan_dir and build_id and global_names == None and t.globals_complete:
+        _save_plan(plan_dir, build_id, t.container_globals)
+    report = dict()
+    objfiles = gdb.objfiles()
+    report['program'] = objfiles[0].filename if len(objfiles) > 0 else None
+    report['build_id'] = build_id
+    report['complete'] = complete
+    report['elapsed'] = time.time() - start
+    report['containers'] = t.containers
+    return report
+
+def write_report(report, path=None):
+    s = json.dumps(report, indent=1, sort_keys=True)
+    if path:
+        with open(path, 'w') as f:
+            f.write(s + '\n')
+    else:
+        gdb.write(s + '\n')
+
+def main():
+    """
+    Entry point when run as a gdb script. See the top of this file.
+    """
+    report = triage(int(os.environ.get('BOOST_TRIAGE_ELEMENTS', 10)),
+                    float(os.environ.get('BOOST_TRIAGE_BUDGET', 60)),
+                    os.environ.get('BOOST_TRIAGE_PLAN_DIR'))
+    write_report(report, os.environ.get('BOOST_TRIAGE_OUTPUT'))
+
+class triage_cmd(gdb.Command):
+    """
+    Dump every Boost container in global, static and frame-local variables.
+
+    Usage: boost-triage [<file> [<elements> [<budget>]]]
+
+    The JSON report is written to <file>, or printed if not given. At most
+    <elements> elements are listed per container (default: 10), and the walk
+    stops after <budget> seconds (default: 60).
+    """
+    def __init__(self):
+        super(triage_cmd, self).__init__('boost-triage', gdb.COMMAND_DATA)
+
+    def invoke(self, arg, from_tty):
+        argv = gdb.string_to_argv(arg)
+        path = argv[0] if len(argv) > 0 else None
+        max_elements = int(argv[1]) if len(argv) > 1 else 10
+        budget = float(argv[2]) if len(argv) > 2 else 60.0
+        write_report(triage(max_elements, budget), path)
+
+if __name__ == '__main__':
+    # the package copy of this module, imported by boost.latest, does the work
+    boost.triage.main()
+else:
+    _triage = triage_cmd()
@@ -4,7 +4,9 @@ import gdb
 import gdb.types
 import gdb.printing
 import re
+import struct
 import sys
+import zlib
 
 from boost import *
 
@@ -139,6 +141,79 @@ def template_name(t):
     else:
         return ''
 
+def is_default_compare(comp_t, key_t):
+    """
+    Check if comparator gdb.Type `comp_t` is std::less on gdb.Type `key_t`,
+    i.e. orders keys like Python does (see lookup.py). Not for pointers:
+    std::less orders them by address, lookups compare char pointers as
+    strings.
+    """
+    if key_t.strip_typedefs().code in [gdb.TYPE_CODE_PTR, gdb.TYPE_CODE_REF]:
+        return False
+    args = template_arguments(comp_t) if template_name(comp_t) == 'std::less' else None
+    return bool(args) and str(get_basic_type(args[0])) == str(get_basic_type(key_t))
+
+def template_arguments(t):
+    """
+    List the template arguments of gdb.Type `t` (types, or values for
+    non-type arguments). Returns None if gdb cannot provide them, e.g. when
+    the debug info does not describe the template parameters.
+    """
+    assert isinstance(t, gdb.Type)
+    bt = get_basic_type(t)
+    res = list()
+    while True:
+        try:
+            res.append(bt.template_argument(len(res)))
+        except RuntimeError:
+            break
+    if len(res) == 0 and '<' in str(bt):
+        return None
+    return res
+
+def _find_field(t, name):
+    for f in t.strip_typedefs().fields():
+        if not hasattr(f, 'bitpos') or f.type == None:
+            # static member
+            continue
+        if f.is_base_class or not f.name:
+            # look into base classes and anonymous unions/structs
+            r = _find_field(f.type, name)
+            if r != None:
+                return (f.bitpos // 8 + r[0], r[1])
+        elif f.name == name:
+            return (f.bitpos // 8, f.type)
+    return None
+
+def field_offset(t, path):
+    """
+    Byte offset of the field with dotted `path` (e.g. 'storage_.data_.buf')
+    in struct gdb.Type `t`, looking into base classes like value[...] does.
+    Returns None if there is no such field.
+    """
+    assert isinstance(t, gdb.Type)
+    offset = 0
+    for name in path.split('.'):
+        r = _find_field(t, name)
+        if r == None:
+            return None
+        offset += r[0]
+        t = r[1]
+    return offset
+
+def field_type(t, path):
+    """
+    gdb.Type of the field with dotted `path` in struct gdb.Type `t`, found
+    like field_offset does. Returns None if there is no such field.
+    """
+    assert isinstance(t, gdb.Type)
+    for name in path.split('.'):
+        r = _find_field(t, name)
+        if r == None:
+            return None
+        t = r[1]
+    return t
+
 class _aux_save_value_as_variable(gdb.Function):
     def __init__(self, v):
         super(_aux_save_value_as_variable, self).__init__('_aux_save_value_as_variable')
@@ -405,6 +480,626 @@ def print_ptr(p):
     else:
         return str(p)
 
+#
+# Raw memory access.
+#
+def read_memory(addr, size):
+    """
+    Read `size` bytes of inferior memory starting at address `addr`.
+
+    Returns a bytes object. Raises gdb.MemoryError if the memory cannot be read.
+    """
+    if size <= 0:
+        return bytes()
+    return bytes(gdb.selected_inferior().read_memory(intptr(addr), size))
+
+def read_pointers(addr, count):
+    """
+    Read an array of `count` pointers starting at address `addr`, with a
+    single memory read. Returns a list of integers.
+    """
+    ptr_size = gdb.lookup_type('void').pointer().sizeof
+    buf = read_memory(addr, count * ptr_size)
+    return list(struct.unpack('<%d%s' % (count, {4: 'I', 8: 'Q'}[ptr_size]), buf))
+
+def value_from_bytes(buf, t):
+    """
+    Construct a non-inferior gdb.Value of type `t` from the raw bytes `buf`.
+    """
+    assert isinstance(t, gdb.Type)
+    return gdb.Value(buf, t)
+
+def value_bytes(value):
+    """
+    Bytes of gdb.Value `value`: read from inferior memory if it is an lvalue,
+    otherwise taken from the value; None with a gdb that cannot provide them
+    (before 13).
+    """
+    if value.address != None:
+        return read_memory(value.address, value.type.sizeof)
+    return getattr(value, 'bytes', None)
+
+def value_at_offset(value, offset, t):
+    """
+    Value of gdb.Type `t` found at byte `offset` of gdb.Value `value`. If
+    `value` is an lvalue, so is the result; otherwise (e.g. an element of a
+    Contiguous_Range), the result is built from the bytes of `value`, and is
+    None with a gdb that cannot provide them (before 13).
+    """
+    if value.address != None:
+        return gdb.Value(intptr(value.address) + offset).cast(t.pointer()).dereference()
+    buf = value_bytes(value)
+    if buf == None:
+        return None
+    return value_from_bytes(buf[offset:offset + t.sizeof], t)
+
+def elem_count(p):
+    """
+    Number of elements of the container printed by printer `p`, or None if
+    it cannot be determined without a traversal.
+    """
+    if hasattr(p, 'elem_count'):
+        return p.elem_count()
+    if hasattr(p, 'segments'):
+        return sum([count for _, count in p.segments()])
+    return None
+
+def read_elem_chunks(p, chunk_elems):
+    """
+    Generate the raw bytes of the elements of the container printed by
+    printer `p`, in chunks of (at most) `chunk_elems` consecutive elements.
+    """
+    elem_size = p.elem_type.sizeof
+    if hasattr(p, 'segments'):
+        for start, count in p.segments():
+            for i in xrange(0, count, chunk_elems):
+                yield read_memory(start + i * elem_size, min(chunk_elems, count - i) * elem_size)
+        return
+    chunk = list()
+    for addr in p.elem_addrs():
+        chunk.append(read_memory(addr, elem_size))
+        if len(chunk) == chunk_elems:
+            yield bytes().join(chunk)
+            chunk = list()
+    if len(chunk) > 0:
+        yield bytes().join(chunk)
+
+def addrs_from_segments(segments, elem_size):
+    """
+    Generate the addresses of the elements in a list of contiguous segments,
+    each given as a pair (start address, element count).
+    """
+    for start, count in segments:
+        for i in xrange(count):
+            yield start + i * elem_size
+
+def bulk_columns(t, fields=None):
+    """
+    Check if elements of gdb.Type `t` can be decoded in bulk (see
+    Contiguous_Range.values).
+
+    If `fields` is None, `t` must be an arithmetic type (not a character type
+    nor an enum), or a type with a raw formatter (see rawdata.raw_formatters);
+    otherwise, it must be a struct, and all the named fields must be such types.
+
+    Returns a list of (offset, layout) pairs, one per value produced for each
+    element, or None.
+    """
+    # imported here: layout.py imports this module
+    from boost import layout, rawdata
+    l = layout.type_layout(t)
+    if fields == None:
+        columns = [(0, l)]
+    else:
+        columns = [rawdata.field_layout(l, f) for f in fields]
+        if None in columns:
+            return None
+    for _, fl in columns:
+        if not rawdata.is_arithmetic(fl) and rawdata.raw_formatter(fl) == None:
+            return None
+    return columns
+
+def is_char_type(t):
+    """
+    Check if gdb.Type `t` is a character type (char, signed/unsigned char,
+    wchar_t, char16_t, char32_t).
+    """
+    # imported here: layout.py imports this module
+    from boost import layout
+    return layout.type_layout(t)['kind'] == 'char'
+
+def decode_string(buf, char_type):
+    """
+    Decode the characters of gdb.Type `char_type` in bytes `buf`: characters
+    of 1 byte with options['string_encoding'], wider ones as UTF-16 or UTF-32.
+    """
+    encoding = {1: options['string_encoding'], 2: 'utf-16-le', 4: 'utf-32-le'}[char_type.sizeof]
+    if sys.version_info >= (3, 5):
+        errors = 'backslashreplace'
+    else:
+        errors = 'replace'
+    return buf.decode(encoding, errors)
+
+def read_string(addr, length, char_type):
+    """
+    Read the string of `length` characters of gdb.Type `char_type` at address
+    `addr`, with a single memory read, and decode it (see decode_string).
+
+    At most options['string_max_length'] characters are read (by default,
+    the "print elements" limit). Returns the pair (string, truncated), where
+    `truncated` tells whether the string was longer.
+    """
+    max_length = options['string_max_length']
+    if max_length == None:
+        max_length = gdb.parameter('print elements')
+    length = max(0, int(length))
+    truncated = max_length != None and length > max_length
+    if truncated:
+        length = max_length
+    buf = read_memory(addr, length * char_type.sizeof)
+    return (decode_string(buf, char_type), truncated)
+
+def string_repr(addr, length, char_type):
+    """
+    Printer to_string() result for the string of `length` characters of
+    gdb.Type `char_type` at address `addr`, read with read_string(). A
+    truncated string is handed to gdb as a lazy string instead: gdb prints
+    it up to the "print elements" limit, with the ellipsis after the closing
+    quote, like its own strings; a string ending in '...' stays distinct.
+    """
+    res, truncated = read_string(addr, length, char_type)
+    if not truncated:
+        return res
+    encoding = options['string_encoding'] if char_type.sizeof == 1 else None
+    ptr = gdb.Value(intptr(addr)).cast(char_type.pointer())
+    return ptr.lazy_string(encoding, int(length))
+
+class Contiguous_Range(object):
+    """
+    Elements stored in one or more contiguous segments of inferior memory.
+
+    This is the engine behind the printers of contiguous containers. Memory is
+    read in chunks of options['bulk_read_size'] bytes, only as the elements are
+    consumed, so printing the first elements of a large container only reads
+    those. Element values are built from the bytes read, without further
+    memory accesses; they are not lvalues. Arithmetic elements, and elements
+    with a raw formatter, are decoded a whole chunk at a time (see
+    rawdata.column_values); arithmetic values are then cast to their type one
+    at a time, as they are produced, so that gdb formats them (e.g. with
+    'p/x'). Elements printed
+    with a pretty-printer, or with fields (at any depth) printed with one,
+    are the exception: printers may need their address (e.g. boost::optional,
+    std::list), so they are lvalues, read again by gdb.
+
+    Attributes:
+      `segments`: list of (address, count) pairs, as integers
+      `elem_type`: gdb.Type of the elements
+      `start`: index of the first element in the whole container (for slices)
+    """
+    def __init__(self, segments, elem_type, start=0):
+        assert isinstance(elem_type, gdb.Type)
+        self.segments = [(intptr(addr), int(count)) for addr, count in segments if int(count) > 0]
+        self.elem_type = elem_type
+        self.elem_size = elem_type.sizeof
+        self.start = start
+        # whether to build elements as lvalues; set on first use
+        self.lvalues = None
+
+    @classmethod
+    def from_pointer(cls, ptr, count):
+        """
+        Range of `count` elements starting at pointer `ptr`.
+        """
+        return cls([(ptr, count)], ptr.type.strip_typedefs().target())
+
+    @classmethod
+    def from_ring(cls, buff, end, first, size):
+        """
+        Range of `size` elements stored in the ring buffer [`buff`, `end`),
+        starting at `first` and wrapping around at `end`. All arguments but
+        `size` are pointers.
+        """
+        size = int(size)
+        tail = min(size, int(end - first))
+        return cls([(first, tail), (buff, size - tail)], buff.type.strip_typedefs().target())
+
+    def __len__(self):
+        return sum([count for _, count in self.segments])
+
+    def __getitem__(self, key):
+        """
+        With a slice (without step), return the Contiguous_Range of the
+        selected elements. With an integer, return the value of that element.
+        """
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            assert step == 1, 'Contiguous_Range: slices with a step are not supported'
+            segments = list()
+            skip = start
+            left = max(0, stop - start)
+            for addr, count in self.segments:
+                if skip >= count:
+                    skip -= count
+                    continue
+                k = min(count - skip, left)
+                segments.append((addr + skip * self.elem_size, k))
+                skip = 0
+                left -= k
+                if left == 0:
+                    break
+            return Contiguous_Range(segments, self.elem_type, self.start + start)
+        if key < 0:
+            key += len(self)
+        if key < 0 or key >= len(self):
+            raise IndexError('Contiguous_Range index out of range')
+        return next(self[key:key + 1].values())
+
+    def addrs(self):
+        """
+        Generate the element addresses.
+        """
+        return addrs_from_segments(self.segments, self.elem_size)
+
+    def chunks(self):
+        """
+        Generate (address, bytes) pairs, covering consecutive elements.
+        """
+        chunk_elems = max(1, options['bulk_read_size'] // self.elem_size)
+        for addr, count in self.segments:
+            for i in xrange(0, count, chunk_elems):
+                k = min(chunk_elems, count - i)
+                chunk_addr = addr + i * self.elem_size
+                yield (chunk_addr, read_memory(chunk_addr, k * self.elem_size))
+
+    def _value(self, buf, offset, addr):
+        if self.lvalues == None:
+            # imported here: layout.py imports this module
+            from boost import layout
+            from boost import rawdata
+            self.lvalues = rawdata.has_printer(layout.type_layout(self.elem_type))
+        if not self.lvalues:
+            try:
+                return value_from_bytes(buf[offset:offset + self.elem_size], self.elem_type)
+            except TypeError:
+                # gdb before 8.3 cannot build values from bytes
+                self.lvalues = True
+        return gdb.Value(addr + offset).cast(self.elem_type.pointer()).dereference()
+
+    def _column_types(self, columns, fields):
+        # for each bulk column, the gdb.Type its values are cast to, or None
+        # for the strings of raw formatters
+        from boost import rawdata
+        types = [self.elem_type] if fields == None else [field_type(self.elem_type, f) for f in fields]
+        return [t if rawdata.is_arithmetic(l) else None for t, (_, l) in zip(types, columns)]
+
+    @staticmethod
+    def _typed(v, t):
+        return gdb.Value(v).cast(t) if t != None else v
+
+    def values(self, fields=None):
+        """
+        Generate the element values. If `fields` is a list of field names,
+        generate instead the values of these fields of each element, one
+        after the other.
+        """
+        from boost import rawdata
+        columns = bulk_columns(self.elem_type, fields)
+        if columns != None:
+            types = self._column_types(columns, fields)
+        size = self.elem_size
+        for addr, buf in self.chunks():
+            k = len(buf) // size
+            if columns != None:
+                cols = [rawdata.column_values(l, buf, k, offset, size) for offset, l in columns]
+                for j in xrange(k):
+                    for col, t in zip(cols, types):
+                        yield self._typed(col[j], t)
+            else:
+                for j in xrange(k):
+                    v = self._value(buf, j * size, addr)
+                    if fields == None:
+                        yield v
+                    else:
+                        for f in fields:
+                            yield v[f]
+
+    def children(self, fields=None):
+        """
+        Generate printer children ('[i]', value), with the values of
+        `values()`: one child per element (or per field).
+        """
+        i = self.start * (len(fields) if fields != None else 1)
+        for v in self.values(fields):
+            yield ('[%d]' % i, v)
+            i += 1
+
+    def display_children(self):
+        """
+        Same as `children()`, for display by gdb: runs of more than "print
+        repeats" elements with identical bytes are collapsed into one child,
+        printed like gdb does for plain arrays: '<value> <repeats N times>'.
+        """
+        threshold = gdb.parameter('print repeats')
+        if not threshold:
+            return self.children()
+        return self._rle_children(threshold)
+
+    def _rle_children(self, threshold):
+        from boost import rawdata
+        columns = bulk_columns(self.elem_type)
+        if columns != None:
+            t = self._column_types(columns, None)[0]
+        size = self.elem_size
+        i = self.start
+        # current run: [element bytes, value, count]; runs can span chunks
+        run = None
+        for addr, buf in self.chunks():
+            k = len(buf) // size
+            if columns != None and rawdata.is_arithmetic(columns[0][1]):
+                col = rawdata.column_values(columns[0][1], buf, k, 0, size)
+            for j, n in rawdata.run_lengths(buf, size):
+                elem = buf[j * size:(j + 1) * size]
+                if run != None and run[0] == elem:
+                    run[2] += n
+                    continue
+                if run != None:
+                    for child in self._run_children(i, run[1], run[2], threshold):
+                        yield child
+                    i += run[2]
+                if columns == None:
+                    v = self._value(buf, j * size, addr)
+                elif rawdata.is_arithmetic(columns[0][1]):
+                    v = self._typed(col[j], t)
+                else:
+                    # only the first element of each run is formatted
+                    v = rawdata.column_values(columns[0][1], buf, 1, j * size, size)[0]
+                run = [elem, v, n]
+        if run != None:
+            for child in self._run_children(i, run[1], run[2], threshold):
+                yield child
+
+    def _run_children(self, i, v, count, threshold):
+        # like gdb, collapse runs longer than the threshold
+        if count > threshold:
+            yield ('[%d]' % i, '%s <repeats %d times>' % (str(v), count))
+            return
+        for j in xrange(count):
+            yield ('[%d]' % (i + j), v)
+
+class Ordered_Tree(object):
+    """
+    Binary search tree in inferior memory, with raw node pointers, as used by
+    ordered containers (intrusive trees, multi_index ordered indexes). Each
+    link is read with one small memory read, so descending the tree to find
+    a key reads O(log n) nodes.
+
+    Attributes:
+      `root`: address of the root node, 0 if the tree is empty
+      `offsets`: offsets of the parent, left and right pointers in a node
+      `parent_mask`: mask applied to parent pointers, whose low bits may hold
+        the node color or balance
+      `value_offset`: offset of the node in the element, i.e. the element
+        address is the node address minus `value_offset`
+    """
+    def __init__(self, root, offsets, parent_mask=~0, value_offset=0):
+        self.root = intptr(root)
+        self.offsets = offsets
+        self.parent_mask = parent_mask
+        self.value_offset = value_offset
+
+    def parent(self, n):
+        return read_pointers(n + self.offsets[0], 1)[0] & self.parent_mask
+
+    def left(self, n):
+        return read_pointers(n + self.offsets[1], 1)[0]
+
+    def right(self, n):
+        return read_pointers(n + self.offsets[2], 1)[0]
+
+    def value_addr(self, n):
+        return n - self.value_offset
+
+    def leftmost(self, n):
+        while True:
+            l = self.left(n)
+            if l == 0:
+                return n
+            n = l
+
+    def rightmost(self, n):
+        while True:
+            r = self.right(n)
+            if r == 0:
+                return n
+            n = r
+
+    def successor(self, n):
+        """
+        Node following `n` in order. `n` must not be the last node.
+        """
+        r = self.right(n)
+        if r != 0:
+            return self.leftmost(r)
+        while True:
+            p = self.parent(n)
+            if self.left(p) == n:
+                return p
+            n = p
+
+    def predecessor(self, n):
+        """
+        Node preceding `n` in order. `n` must not be the first node.
+        """
+        l = self.left(n)
+        if l != 0:
+            return self.rightmost(l)
+        while True:
+            p = self.parent(n)
+            if self.right(p) == n:
+                return p
+            n = p
+
+class Hash_Buckets(object):
+    """
+    Bucket array of a hashed container in inferior memory, as used by
+    multi_index hashed indexes and intrusive unordered sets: each bucket holds
+    a pointer to the first node of its chain, and each node a pointer to the
+    next one. A chain ends when it comes back to its bucket (circular chains),
+    or at a null pointer; an empty bucket points to itself, or is null.
+
+    The bucket array is read with a single memory read.
+
+    Attributes:
+      `addr`: address of the bucket array
+      `count`: number of buckets
+      `bucket_size`: size of a bucket, in bytes
+      `next_offset`: offset of the next pointer, in buckets and in nodes
+      `value_offset`: offset of the node in the element, i.e. the element
+        address is the node address minus `value_offset`
+    """
+    def __init__(self, addr, count, bucket_size=None, next_offset=0, value_offset=0):
+        self.addr = intptr(addr)
+        self.count = int(count)
+        self.bucket_size = bucket_size or gdb.lookup_type('void').pointer().sizeof
+        self.next_offset = next_offset
+        self.value_offset = value_offset
+
+    def bucket_addr(self, i):
+        return self.addr + i * self.bucket_size
+
+    def heads(self):
+        """
+        List the first pointer of every bucket.
+        """
+        ptr_size = gdb.lookup_type('void').pointer().sizeof
+        if self.bucket_size == ptr_size and self.next_offset == 0:
+            return read_pointers(self.addr, self.count)
+        buf = read_memory(self.addr, self.count * self.bucket_size)
+        fmt = '<' + {4: 'I', 8: 'Q'}[ptr_size]
+        return [struct.unpack_from(fmt, buf, i * self.bucket_size + self.next_offset)[0]
+                for i in xrange(self.count)]
+
+    def is_empty(self, i, head):
+        return head == 0 or head == self.bucket_addr(i)
+
+    def chain(self, i, head, max_length=None):
+        """
+        Generate the node addresses in the chain of bucket `i`, whose first
+        pointer is `head`. Stops after `max_length` nodes, if given.
+        """
+        bucket = self.bucket_addr(i)
+        n = head
+        k = 0
+        while n != 0 and n != bucket:
+            if max_length != None and k >= max_length:
+                return
+            yield n
+            k += 1
+            n = read_pointers(n + self.next_offset, 1)[0]
+
+    def value_addr(self, n):
+        return n - self.value_offset
+
+def _is_self_contained(l):
+    # no pointer outside of intrusive hooks, i.e. the rendering of an element
+    # of layout `l` only depends on its own bytes
+    if l['kind'] in ['pointer', 'opaque']:
+        return False
+    if l['kind'] == 'array':
+        return _is_self_contained(l['elem'])
+    if l['kind'] == 'struct':
+        return all([_is_self_contained(f['layout']) for f in l['fields']
+                    if not f['layout']['name'].startswith('boost::intrusive::')])
+    return True
+
+def _leaf_count(l):
+    # number of scalar values printed for an element of layout `l`, intrusive
+    # hooks aside
+    if l['kind'] == 'array':
+        return l['count'] * _leaf_count(l['elem'])
+    if l['kind'] == 'struct':
+        return sum([_leaf_count(f['layout']) for f in l['fields']
+                    if not f['layout']['name'].startswith('boost::intrusive::')])
+    return 1
+
+#
+# gdb settings changing how values are printed; part of the Render_Cache keys.
+#
+_render_parameters = ['print pretty', 'print elements', 'print repeats', 'print union',
+                      'print static-members', 'print address', 'print symbol',
+                      'output-radix']
+
+def _render_settings():
+    res = list()
+    for name in _render_parameters:
+        try:
+            res.append(gdb.parameter(name))
+        except RuntimeError:
+            # not a parameter of this gdb
+            res.append(None)
+    return tuple(res)
+
+#
+# Strings rendered at the previous print of node-based containers.
+#
+# key: (int, str, bool, tuple)
+#   Container address, type name, options['hide_intrusive_hooks'], and the
+#   values of the gdb print settings (see _render_parameters).
+# value: dict
+#   key: int, element address
+#   value: (crc32 of the element bytes, rendered string)
+#
+render_cache = dict()
+
+class Render_Cache(object):
+    """
+    Rendering of the elements of one container during one traversal, reusing
+    the strings rendered at the previous print for the elements whose raw
+    bytes did not change: repeated prints cost a read of each element, plus
+    the rendering of the changed ones. Only the elements rendered by the
+    current traversal are kept for the next one.
+
+    Only used for elements without pointers (intrusive hooks aside), whose
+    rendering depends on their own bytes only, and with enough fields that
+    rendering costs more than the read and checksum of a hit: rendering an
+    element with a couple of scalar fields is about as cheap as reading it;
+    see options['render_cache'] and options['render_cache_min_fields'].
+    """
+    def __init__(self, value, elem_type):
+        # imported here: layout.py imports this module
+        from boost import layout
+        l = layout.type_layout(elem_type)
+        self.enabled = (options['render_cache'] and value.address != None
+                        and _is_self_contained(l)
+                        and _leaf_count(l) >= options['render_cache_min_fields'])
+        if not self.enabled:
+            return
+        key = (intptr(value.address), str(value.type), options['hide_intrusive_hooks'],
+               _render_settings())
+        self.old = render_cache.get(key, dict())
+        self.new = dict()
+        if key not in render_cache and len(render_cache) >= options['render_cache_containers']:
+            render_cache.clear()
+        render_cache[key] = self.new
+        self.elem_size = elem_type.sizeof
+
+    def render(self, addr, f):
+        """
+        Rendered string of the element at address `addr`: the cached one if
+        its bytes did not change, else the result of `f()`.
+        """
+        if not self.enabled:
+            return f()
+        try:
+            crc = zlib.crc32(read_memory(addr, self.elem_size)) & 0xffffffff
+        except gdb.MemoryError:
+            return f()
+        entry = self.old.get(addr)
+        if entry == None or entry[0] != crc:
+            entry = (crc, f())
+        self.new[addr] = entry
+        return entry[1]
+
 #
 # Null value checker
 #
@@ -467,7 +1162,7 @@ class at_func(gdb.Function):
         super(at_func, self).__init__('at')
     def invoke(self, cont, idx=0):
         assert isinstance(cont, gdb.Value)
-        p = gdb.default_visualizer(cont)
+        p = full_printer(gdb.default_visualizer(cont))
         assert p, 'no printer for type [' + str(cont.type) + ']'
         assert hasattr(p, 'children'), 'printer for type [' + str(cont.type) + '] has no children() function'
         it = iter(p.children())
@@ -480,6 +1175,189 @@ class at_func(gdb.Function):
 
 _at = at_func()
 
+def tail_addrs(p, k):
+    """
+    Addresses of the last `k` elements of the container printed by `p`, in
+    order, reached without traversing the other elements: by pointer
+    arithmetic, from the rightmost tree node, from the last buckets, or with
+    the printer's own tail_addrs() (e.g. following prev links). Returns None
+    if the printer provides no such access.
+    """
+    if hasattr(p, 'tail_addrs'):
+        res = p.tail_addrs(k)
+        if res != None:
+            return res
+    if hasattr(p, 'segments'):
+        elem_size = p.elem_type.sizeof
+        res = list()
+        for start, count in reversed(p.segments()):
+            m = min(count, k - len(res))
+            res = [start + (count - m + i) * elem_size for i in xrange(m)] + res
+            if len(res) == k:
+                break
+        return res
+    tree = p.search_tree() if hasattr(p, 'search_tree') else None
+    if tree != None:
+        res = list()
+        if tree.root != 0 and k > 0:
+            n = tree.rightmost(tree.root)
+            res.append(tree.value_addr(n))
+            while len(res) < k:
+                n = tree.predecessor(n)
+                res.append(tree.value_addr(n))
+        return list(reversed(res))
+    buckets = p.hash_buckets() if hasattr(p, 'hash_buckets') else None
+    if buckets != None:
+        res = list()
+        heads = buckets.heads()
+        for i in xrange(buckets.count - 1, -1, -1):
+            if len(res) >= k:
+                break
+            if not buckets.is_empty(i, heads[i]):
+                res = [buckets.value_addr(n) for n in buckets.chain(i, heads[i])] + res
+        return res[-k:] if k > 0 else []
+    return None
+
+class Summary_Printer(object):
+    """
+    Summary rendering of a container with more than
+    options['summary_threshold'] elements: its size, capacity and footprint,
+    and its first and last options['summary_elements'] elements. The
+    elements in the middle are not traversed.
+
+    All the other attributes are those of the full printer, `full`, so the
+    commands working on raw container memory are not affected.
+    """
+    def __init__(self, value, full, count):
+        self.value = value
+        self.full = full
+        self.count = count
+
+    def __getattr__(self, name):
+        return getattr(self.full, name)
+
+    def to_string(self):
+        s = self.full.to_string() if hasattr(self.full, 'to_string') else None
+        res = str(s) if s != None else str(self.value.type)
+        res += ' [summary: size %d' % self.count
+        if hasattr(self.full, 'capacity'):
+            res += ', capacity %d' % self.full.capacity()
+        node_size = self.full.node_size if hasattr(self.full, 'node_size') else self.full.elem_type.sizeof
+        res += ', footprint %d bytes' % (self.value.type.sizeof + self.count * node_size)
+        return res + '; boost-print-full for all elements]'
+
+    def children(self):
+        # children are labelled by element position, '[i]' (for maps, both
+        # the key and the value), and the omitted elements by their range of
+        # positions, '[first..last]'; with display hint 'map', gdb shows the
+        # key child instead, '...'
+        k = options['summary_elements']
+        is_map = hasattr(self.full, 'display_hint') and self.full.display_hint() == 'map'
+        it = iter(self.full.children())
+        for i in xrange(k):
+            label = '[%d]' % i
+            try:
+                if is_map:
+                    key = next(it)[1]
+                    yield (label, key)
+                yield (label, next(it)[1])
+            except StopIteration:
+                return
+        tail = tail_addrs(self.full, k)
+        if tail == None:
+            tail = []
+        first = k
+        last = self.count - len(tail) - 1
+        label = '[%d..%d]' % (first, last)
+        if is_map:
+            yield (label, '...')
+        yield (label, '<%d elements omitted>' % (last - first + 1))
+        elem_ptr_t = self.full.elem_type.pointer()
+        for i, addr in enumerate(tail):
+            label = '[%d]' % (last + 1 + i)
+            val = gdb.Value(addr).cast(elem_ptr_t).dereference()
+            if is_map:
+                yield (label, val['first'])
+                yield (label, val['second'])
+            else:
+                yield (label, val)
+
+_print_full = False
+
+def summary_printer(value, p):
+    """
+    Return a Summary_Printer for printer `p` of `value` if it prints a
+    container with more than options['summary_threshold'] elements, whose
+    size is known without a traversal; `p` itself otherwise.
+    """
+    threshold = options['summary_threshold']
+    if (threshold == None or _print_full
+        or not hasattr(p, 'children') or not hasattr(p, 'elem_type')):
+        return p
+    try:
+        count = elem_count(p)
+    except gdb.error:
+        return p
+    if count == None or count <= threshold or count <= 2 * options['summary_elements']:
+        return p
+    return Summary_Printer(value, p, count)
+
+class Display_Printer(object):
+    """
+    Printer used by gdb to display a container whose printer, `full`,
+    provides display_children() (e.g. collapsing runs of identical
+    elements). All the other attributes are those of `full`, whose
+    children() still produce one child per element.
+    """
+    def __init__(self, full):
+        self.full = full
+
+    def __getattr__(self, name):
+        return getattr(self.full, name)
+
+    def children(self):
+        return self.full.display_children()
+
+def display_printer(value, p):
+    """
+    Return the printer used by gdb to display `value`, given its printer
+    `p`: a Summary_Printer for large containers, a Display_Printer if `p`
+    provides display_children(), `p` itself otherwise.
+    """
+    res = summary_printer(value, p)
+    if res is p and hasattr(p, 'display_children'):
+        res = Display_Printer(p)
+    return res
+
+def full_printer(p):
+    """
+    The printer of all the elements, one child per element, if `p` is a
+    Summary_Printer or a Display_Printer.
+    """
+    return p.full if isinstance(p, (Summary_Printer, Display_Printer)) else p
+
+class print_full_cmd(gdb.Command):
+    """
+    Print an expression without summarizing large containers.
+
+    Usage: boost-print-full <expr>
+
+    Same as print, with all the elements of containers larger than
+    boost.options['summary_threshold'] (up to the "print elements" limit).
+    """
+    def __init__(self):
+        super(print_full_cmd, self).__init__('boost-print-full', gdb.COMMAND_DATA)
+
+    def invoke(self, arg, from_tty):
+        global _print_full
+        _print_full = True
+        try:
+            gdb.execute('print ' + arg, from_tty)
+        finally:
+            _print_full = False
+
+_print_full_cmd = print_full_cmd()
+
 #
 # GDB_Value_Wrapper: Wrapper class for gdb.Value
 #
@@ -520,6 +1398,64 @@ elif have_python_2:
 ###     (Either supports() or template_name is required.)
 ### - '__init__' : Its only argument is a GDB_Value_Wrapper.
 ###
+### Container printers can also provide the following, which are used by the
+### commands that work on raw container memory (e.g. boost-capture):
+###
+### - 'elem_type' : gdb.Type of the container elements.
+### - 'elem_addrs()' : Generator of the element addresses (as integers), in
+###     printing order, without reading the elements themselves.
+### - 'segments()' : Only for containers storing their elements contiguously.
+###     List of (address, count) pairs covering the elements in order.
+### - 'contiguous_range()' : Same, as a Contiguous_Range (see utils.py), which
+###     reads and decodes the elements in chunks; printers of contiguous
+###     containers build their children and segments from it.
+### - 'display_children()' : Children displayed by gdb, if different from
+###     'children()' (e.g. runs of identical elements collapsed, see
+###     Contiguous_Range.display_children). 'children()' must still produce
+###     one child per element, for the commands (see full_printer).
+### - 'elem_count()' : Number of elements, if known without a traversal.
+###     Not needed if 'segments()' exists.
+### - 'node_size' : Bytes allocated by the container per element, if different
+###     from the element size (e.g. the nodes of node-based containers).
+###
+### Ordered containers can also provide the following, which are used by the
+### key lookups (see lookup.py):
+###
+### - 'key_fields' : List of the dotted field paths of the element that make
+###     up its sort key ([] if the key is the element itself), or None if the
+###     key cannot be determined (see lookup.key_extractor).
+### - 'search_tree()' : Only for node-based containers. The tree of the
+###     elements, as an Ordered_Tree (see utils.py), or None if unavailable.
+###     Without it, the elements must be sorted in 'segments()'.
+###
+### Hashed containers can also provide:
+###
+### - 'hash_buckets()' : The bucket array, as a Hash_Buckets (see utils.py),
+###     or None if unavailable. Used by boost-buckets (see buckets.py).
+###
+### The memory accounting of boost-memusage (see memusage.py) also uses:
+###
+### - 'capacity()' : Only for contiguous containers with spare room. Number of
+###     element slots allocated.
+### - 'owns_elements' : False if the elements are not allocated by the
+###     container (e.g. intrusive containers, ranges). Default: True.
+### - 'hook_size()' : Only for intrusive containers. Bytes of the hook in each
+###     element, or None if unknown.
+### - 'node_fields' : List of (name, bytes) pairs of the fields added to each
+###     element in its node, when 'node_size' is given.
+### - 'extra_blocks()' : List of (name, bytes) pairs of the other memory
+###     allocated by the container (e.g. bucket arrays).
+###
+### The summary of large containers (see Summary_Printer) also uses:
+###
+### - 'tail_addrs(k)' : Addresses of the last k elements, in order, reached
+###     without a traversal (e.g. through prev links), or None. Not needed if
+###     'segments()', 'search_tree()' or 'hash_buckets()' provide them.
+###
+### - 'elem_addr(i)' : Address of the i-th element, in constant time, or None
+###     if the container is not random access. Not needed if 'segments()'
+###     exists. Used by boost-sample (see sample.py).
+###
 
 class Printer_Gen(object):
     """
@@ -608,25 +1544,105 @@ class Printer_Gen(object):
         for subprinter_gen in l:
             printer = subprinter_gen(v)
             if printer != None:
-                return printer
+                return display_printer(v, printer)
         return None
 
 boost_printer_gen = Printer_Gen('boost')
 trivial_printer_gen = Printer_Gen('trivial')
 
-class Type_Printer_Gen:
+class _Type_Printer_Entry(object):
     """
-    Top-level type printer generator.
+    Type printer registered with gdb for one type recognizer, so that it is
+    listed by "info type-printers" and can be disabled by name. It recognizes
+    nothing itself: the recognizer is run by its top-level type printer
+    (Type_Recognizer_Gen), which skips it while this entry is disabled.
     """
     def __init__(self, Type_Recognizer):
         self.name = Type_Recognizer.name
-        self.enabled = Type_Recognizer.enabled
-        self.Type_Recognizer = Type_Recognizer
+        self.enabled = getattr(Type_Recognizer, 'enabled', True)
+        self.recognizer = Type_Recognizer()
 
     def instantiate(self):
-        return self.Type_Recognizer()
+        return None
+
+class Type_Recognizer_Gen(object):
+    """
+    Top-level type printer, dispatching to individual type recognizers.
+
+    Like Printer_Gen does for values, recognizers are looked up by the template
+    name of the type; recognizers without a 'template_name' are tried on
+    types matched by no other recognizer. Results, including rejections, are
+    memoized by type name, and forgotten when new object files are loaded, or
+    when recognizers are enabled or disabled. Each recognizer is also
+    registered with gdb under its own name (see _Type_Printer_Entry).
+    """
+    def __init__(self, name):
+        self.name = name
+        self.enabled = True
+        self.entries = list()
+        self.template_name_dict = dict()
+        self.no_template_name_list = list()
+        self.cache = dict()
+        self.cache_state = None
+        # object files (None: global) the type printers are registered with
+        self.objs = list()
+        if hasattr(gdb, 'events') and hasattr(gdb.events, 'new_objfile'):
+            gdb.events.new_objfile.connect(lambda event: self.cache.clear())
+
+    def add(self, Type_Recognizer):
+        e = _Type_Printer_Entry(Type_Recognizer)
+        self.entries.append(e)
+        if not hasattr(Type_Recognizer, 'template_name'):
+            self.no_template_name_list.append(e)
+        elif type(Type_Recognizer.template_name) == str:
+            self.template_name_dict.setdefault(Type_Recognizer.template_name, list()).append(e)
+        else:
+            for n in Type_Recognizer.template_name:
+                self.template_name_dict.setdefault(n, list()).append(e)
+        self.cache.clear()
+        for obj in self.objs:
+            gdb.types.register_type_printer(obj, e)
+
+    def register(self, obj=None):
+        """
+        Register this type printer, and the entries of its recognizers, with
+        objfile `obj` (globally if None), unless already done.
+        """
+        if obj in self.objs:
+            return
+        self.objs.append(obj)
+        for e in self.entries:
+            gdb.types.register_type_printer(obj, e)
+        gdb.types.register_type_printer(obj, self)
 
-type_printer_list = list()
+    def instantiate(self):
+        state = [e.enabled for e in self.entries]
+        if state != self.cache_state:
+            self.cache.clear()
+            self.cache_state = state
+        return self
+
+    def recognize(self, t):
+        key = str(t)
+        if key in self.cache:
+            return self.cache[key]
+        tn = template_name(t)
+        if tn in self.template_name_dict:
+            l = self.template_name_dict[tn]
+        else:
+            l = self.no_template_name_list
+        res = None
+        for e in l:
+            if not e.enabled:
+                continue
+            res = e.recognizer.recognize(t)
+            if res != None:
+                break
+        self.cache[key] = res
+        return res
+
+boost_type_printer_gen = Type_Recognizer_Gen('boost')
+trivial_type_printer_gen = Type_Recognizer_Gen('trivial')
 
 #
 # This function registers the top-level Printer generator with gdb.
@@ -634,7 +1650,8 @@ type_printer_list = list()
 #
 def register_printers(obj=None):
     """
-    Register top-level printers 'boost' and 'trivial' with objfile `obj`.
+    Register top-level printers 'boost' and 'trivial', and the top-level type
+    printers 'boost' and 'trivial' with their recognizers, with objfile `obj`.
     """
     message('registering top-level printers:' +
             ' (name="' + boost_printer_gen.name + '" id=' + str(id(boost_printer_gen)) + ')' +
@@ -642,8 +1659,8 @@ def register_printers(obj=None):
             ' with objfile=' + str(obj))
     gdb.printing.register_pretty_printer(obj, boost_printer_gen, replace=True)
     gdb.printing.register_pretty_printer(obj, trivial_printer_gen, replace=True)
-    for tp in type_printer_list:
-        gdb.types.register_type_printer(obj, tp)
+    boost_type_printer_gen.register(obj)
+    trivial_type_printer_gen.register(obj)
 
 def add_printer(p):
     """
@@ -670,16 +1687,16 @@ def cond_add_printer(cond, msg):
 
 def add_type_recognizer(r):
     """
-    Add a type recognizer.
+    Decorator that adds the given type recognizer `r` to the top-level 'boost' type printer.
     """
-    type_printer_list.append(Type_Printer_Gen(r))
+    boost_type_printer_gen.add(r)
     return r
 
 class _cant_add_type_recognizer:
     def __init__(self, msg):
         self.msg = msg
     def __call__(self, p):
-        message('type recognizer [' + p.printer_name + '] not supported: ' + self.msg)
+        message('type recognizer [' + p.name + '] not supported: ' + self.msg)
         return p
 
 def cond_add_type_recognizer(cond, msg):
@@ -724,26 +1741,24 @@ def add_trivial_type_printer(tn, f, **kwargs):
 
     For a type t with template name matching `tn`, print it by invoking `f`(t).
 
-    NOTE: The function automatically registers the type printer with gdb by invoking
-    gdb.types.register_type_printer(). This is necessary because unlike the case of
-    value printers, there is no top-level type printer to intermediate the process.
-    The optional keyword argument `obj` specifies the object file for which to do
-    the registration. (If not specified, the type printer will be global.)
+    NOTE: The recognizer is added to the top-level 'trivial' type printer, and
+    listed by "info type-printers" under the name `tn`. That type printer is
+    registered by register_printers(); if this is called before, it is
+    registered here, with the object file given by the optional keyword
+    argument `obj` (if not specified, the type printer will be global).
     """
     assert type(tn) == str and tn != ''
     assert callable(f)
     class _Type_Recognizer:
         name = tn
         enabled = True
+        template_name = tn
         transform = staticmethod(f)
         def recognize(self, t):
-            _tn = template_name(t)
-            if _tn != self.name:
-                return None
             return self.transform(t)
-    if 'obj' not in kwargs:
-        kwargs['obj'] = None
-    gdb.types.register_type_printer(kwargs['obj'], Type_Printer_Gen(_Type_Recognizer))
+    trivial_type_printer_gen.add(_Type_Recognizer)
+    if len(trivial_type_printer_gen.objs) == 0:
+        trivial_type_printer_gen.register(kwargs.get('obj'))
 
 #
 # To specify which index to use for printing for a specific container
@@ -763,3 +1778,46 @@ multi_index_selector = dict()
 #
 options = dict()
 options['hide_intrusive_hooks'] = False
+
+#
+# Number of records buffered by boost-export before they are written out.
+#
+options['export_chunk_size'] = 1024
+
+#
+# Bytes read at once by printers of contiguous containers
+# (see Contiguous_Range).
+#
+options['bulk_read_size'] = 65536
+
+#
+# Decoding of strings read in bulk (see read_string): encoding of 1 byte
+# characters, and maximum number of characters read (None: use the
+# "print elements" limit).
+#
+options['string_encoding'] = 'utf-8'
+options['string_max_length'] = None
+
+#
+# Number of values kept by boost-stats-of for quantiles and histograms; beyond
+# that, a uniform sample of this many values is kept.
+#
+options['stats_sample_size'] = 1000000
+
+#
+# Containers with more elements than this are printed in summary (see
+# Summary_Printer): their first and last 'summary_elements' elements only.
+# None: always print all the elements (up to the "print elements" limit).
+#
+options['summary_threshold'] = 100000
+options['summary_elements'] = 10
+
+#
+# Reuse the strings rendered for the elements of intrusive containers whose
+# bytes did not change since the previous print (see Render_Cache), for at
+# most 'render_cache_containers' containers, and for elements of at least
+# 'render_cache_min_fields' scalar fields (hooks aside).
+#
+options['render_cache'] = True
+options['render_cache_containers'] = 64
+options['render_cache_min_fields'] = 4
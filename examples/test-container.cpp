@@ -27,6 +27,10 @@ void test_flat_map() {
   FlatMapInt2Double::iterator itr = fmap.find(2);
   FlatMapInt2Double::const_iterator empty_itr;
   break_here();
+  for (int i = 3; i <= 8; ++i) {
+    fmap[i] = i;
+  }
+  break_here();
 }
 
 int main()
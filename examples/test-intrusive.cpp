@@ -1,5 +1,6 @@
 #include <boost/intrusive/set.hpp>
 #include <boost/intrusive/list.hpp>
+#include <boost/intrusive/unordered_set.hpp>
 
 void break_here() {
     while (false) {}
@@ -141,9 +142,50 @@ void test_intrusive_set() {
   }
 }
 
+struct IntHashElement : public boost::intrusive::unordered_set_base_hook<> {
+  IntHashElement(int i) : int_(i) {}
+
+  bool operator==(const IntHashElement& rhs) const { return int_ == rhs.int_; }
+  int int_;
+  boost::intrusive::unordered_set_member_hook<> member_hook_;
+};
+
+std::size_t hash_value(const IntHashElement& e) { return e.int_; }
+
+typedef boost::intrusive::member_hook<
+  IntHashElement,
+  boost::intrusive::unordered_set_member_hook<>,
+  &IntHashElement::member_hook_>
+HashMemberOption;
+
+typedef boost::intrusive::unordered_set<IntHashElement> BaseHashSet;
+typedef boost::intrusive::unordered_multiset<IntHashElement, HashMemberOption> MemberHashSet;
+
+void test_intrusive_unordered_set() {
+  BaseHashSet::bucket_type bbuckets[7];
+  BaseHashSet bhset(BaseHashSet::bucket_traits(bbuckets, 7));
+  MemberHashSet::bucket_type mbuckets[5];
+  MemberHashSet mhset(MemberHashSet::bucket_traits(mbuckets, 5));
+  break_here();
+  IntHashElement elem1(1);
+  IntHashElement elem2(8);
+  IntHashElement elem3(3);
+  IntHashElement elem4(3);
+  bhset.insert(elem1);
+  bhset.insert(elem2);
+  bhset.insert(elem3);
+  mhset.insert(elem3);
+  mhset.insert(elem4);
+  break_here();
+
+  bhset.clear();
+  mhset.clear();
+}
+
 int main(int argc, char* argv[])
 {
   test_intrusive_list();
   test_intrusive_set();
+  test_intrusive_unordered_set();
   return argc + (char)argv[0][0];
 }
@@ -14,6 +14,7 @@
 #include <boost/uuid/string_generator.hpp>
 #include <boost/intrusive/set.hpp>
 #include <boost/intrusive/list.hpp>
+#include <boost/container/flat_set.hpp>
 #include "boost/date_time/gregorian/gregorian.hpp"
 #include "boost/date_time/posix_time/posix_time.hpp"
 
@@ -38,6 +39,8 @@ boost::shared_ptr<int> v_shared_ptr_2(new int(9));
 
 boost::circular_buffer<int> v_circular_buffer_1;
 boost::circular_buffer<int> v_circular_buffer_2(3);
+boost::circular_buffer<int> v_circular_buffer_3(2);
+boost::circular_buffer<bool> v_circular_buffer_of_bool(2);
 
 boost::array<int*, 3> v_array_1;
 boost::array<short, 5> v_array_2 = {{0, 1, 2}};
@@ -45,6 +48,19 @@ boost::array<short, 5> v_array_2 = {{0, 1, 2}};
 boost::variant<int, std::string> v_variant_1;
 boost::variant<char*, int> v_variant_2(x);
 
+// elements with their own printers, inside contiguous containers
+boost::container::flat_set<boost::optional<int> > v_flat_set_of_optional;
+boost::circular_buffer<boost::variant<int, double> > v_circular_buffer_of_variant(3);
+
+// elements whose fields have their own printers
+struct Holder
+{
+    int id;
+    boost::optional<int> opt;
+    boost::container::flat_set<int> set;
+};
+boost::circular_buffer<Holder> v_circular_buffer_of_struct(2);
+
 boost::uuids::uuid v_uuid_1;
 boost::uuids::string_generator gen;
 boost::uuids::uuid v_uuid_2 = gen("{01234567-89ab-cdef-0123-456789abcdef}");
@@ -105,6 +121,20 @@ int main(int argc, char* argv[])
 {
     v_circular_buffer_2.push_back(1);
     v_circular_buffer_2.push_back(4);
+    v_circular_buffer_3.push_back(-1);
+    v_circular_buffer_3.push_back(-2);
+    v_circular_buffer_of_bool.push_back(true);
+    v_circular_buffer_of_bool.push_back(false);
+
+    v_flat_set_of_optional.insert(boost::optional<int>());
+    v_flat_set_of_optional.insert(boost::optional<int>(5));
+    v_circular_buffer_of_variant.push_back(1);
+    v_circular_buffer_of_variant.push_back(2.5);
+    Holder holder;
+    holder.id = 1;
+    holder.opt = 7;
+    holder.set.insert(3);
+    v_circular_buffer_of_struct.push_back(holder);
 
     MyClass tmp(x);
     v_intrusive_set_2.insert(tmp);